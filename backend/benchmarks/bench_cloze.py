@@ -0,0 +1,129 @@
+"""
+Cloze 挖空效能與準確度測試
+
+產生 N 個單字的合成語料（每個單字兩句例句，單字以原形或屈折變化出現，
+另有干擾句：單字只出現在其他單字之中），比較：
+- 舊版：每個單字每個例句 re.compile(re.escape(word), re.IGNORECASE) 做子字串取代
+- 目前：libs.cloze.cloze_text（預先編譯的 token 比對 + 每個單字快取的變化形集合）
+
+輸出每秒處理的 note 數，以及「挖到正確的字」與「挖到其他單字的一部分」的比例。
+
+用法（在 backend/ 目錄下）：
+    python benchmarks/bench_cloze.py [--notes 10000] [--rounds 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs import cloze  # noqa: E402
+
+_CONSONANTS = "bcdfghklmnprstv"
+_VOWELS = "aeiou"
+
+
+def make_lemma(rng: random.Random) -> str:
+    syllables = rng.randint(2, 4)
+    return "".join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(syllables)) + rng.choice(_CONSONANTS)
+
+
+def build_corpus(count: int, seed: int = 0) -> list[dict]:
+    """回傳 [{word, ex1_ori, ex2_ori, expected}]，expected 為應該被挖空的字（None 表示不應挖空）"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        lemma = make_lemma(rng)
+        kind = rng.random()
+        if kind < 0.4:
+            form = lemma
+        elif kind < 0.9:
+            form = lemma + rng.choice(["s", "ed", "ing", "er"])
+        else:
+            form = None  # 干擾：只出現在其他單字之中
+        if form:
+            ex1 = f"Yesterday the {form.capitalize() if rng.random() < 0.2 else form} was here."
+        else:
+            ex1 = f"The un{lemma}able idea was here."
+        ex2 = f"We talked about {lemma} again."
+        corpus.append({"word": lemma, "ex1_ori": ex1, "ex2_ori": ex2, "expected": form})
+    return corpus
+
+
+def legacy_cloze_text(word, ex1_ori, ex1_trans, ex2_ori, ex2_trans):
+    cloze_ex1 = ex1_ori
+    if word and ex1_ori:
+        pattern = re.compile(re.escape(word), re.IGNORECASE)
+        cloze_ex1 = pattern.sub(f"{{{{c1::{word}}}}}", ex1_ori, count=1)
+    cloze_ex2 = ex2_ori
+    if word and ex2_ori:
+        pattern = re.compile(re.escape(word), re.IGNORECASE)
+        cloze_ex2 = pattern.sub(f"{{{{c1::{word}}}}}", ex2_ori, count=1)
+    return f"{cloze_ex1}\n{ex1_trans}\n\n{cloze_ex2}\n{ex2_trans}" if cloze_ex2 else f"{cloze_ex1}\n{ex1_trans}"
+
+
+def run(fn, corpus) -> list[str]:
+    return [fn(v["word"], v["ex1_ori"], "", v["ex2_ori"], "") for v in corpus]
+
+
+def accuracy(corpus, outputs) -> tuple[float, float]:
+    """(應挖空的句子中，完整挖到該字的比例, 干擾句中誤挖的比例)"""
+    hits = expected_total = false_masks = decoys = 0
+    for v, out in zip(corpus, outputs):
+        first_sentence = out.split("\n", 1)[0]
+        if v["expected"]:
+            expected_total += 1
+            masked = re.search(r"\{\{c1::(.+?)\}\}", first_sentence)
+            hits += bool(masked and masked.group(1).lower() == v["expected"].lower()
+                         and first_sentence.replace(masked.group(0), masked.group(1)) == v["ex1_ori"])
+        else:
+            decoys += 1
+            false_masks += "{{c1::" in first_sentence
+    return hits / max(expected_total, 1), false_masks / max(decoys, 1)
+
+
+def best_of(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.notes)
+
+    def current():
+        # 每輪清空快取，量測的是第一次打包整份語料的成本
+        cloze.inflections.cache_clear()
+        cloze._substring_pattern.cache_clear()
+        return run(cloze.cloze_text, corpus)
+
+    def legacy():
+        re.purge()
+        return run(legacy_cloze_text, corpus)
+
+    results = []
+    for name, fn in (("legacy", legacy), ("current", current)):
+        seconds = best_of(fn, args.rounds)
+        hit_rate, false_rate = accuracy(corpus, fn())
+        results.append((name, seconds, hit_rate, false_rate))
+
+    print(f"{args.notes} notes")
+    baseline = results[0][1]
+    for name, seconds, hit_rate, false_rate in results:
+        print(f"{name:<8} {args.notes / seconds:>10.0f} notes/s  ({baseline / seconds:>4.1f}x)"
+              f"  masked correctly {hit_rate:6.1%}  masked inside other words {false_rate:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
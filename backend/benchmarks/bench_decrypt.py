@@ -0,0 +1,68 @@
+"""
+API Key 解密效能測試
+
+比較三種情況下 decrypt_api_key 的單次耗時：
+- 冷啟動：每次都重新派生金鑰（PBKDF2 100,000 次）並解密
+- 金鑰快取：派生金鑰已快取，每次仍做 AES-GCM 解密
+- 完整快取：同一個密文直接命中已解密快取
+
+用法（在 backend/ 目錄下）：
+    python benchmarks/bench_decrypt.py [--rounds 200]
+"""
+import argparse
+import base64
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # noqa: E402
+
+from libs import decrypt  # noqa: E402
+
+
+def encrypt(api_key: str, domain: str) -> str:
+    """以與前端相同的方式加密（IV 12 bytes + 密文，base64）"""
+    iv = os.urandom(12)
+    return base64.b64encode(iv + AESGCM(decrypt.derive_key(domain)).encrypt(iv, api_key.encode(), None)).decode()
+
+
+def per_call_us(fn, rounds: int) -> float:
+    return timeit.timeit(fn, number=rounds) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    domain = "localhost"
+    ciphertext = encrypt("sk-bench-" + "x" * 40, domain)
+
+    def cold():
+        decrypt.derive_key.cache_clear()
+        decrypt._decrypted_key_cache.clear()
+        decrypt.decrypt_api_key(ciphertext, domain)
+
+    def derived_key_cached():
+        decrypt._decrypted_key_cache.clear()
+        decrypt.decrypt_api_key(ciphertext, domain)
+
+    def fully_cached():
+        decrypt.decrypt_api_key(ciphertext, domain)
+
+    cold_rounds = max(1, args.rounds // 20)
+    results = [
+        ("cold (PBKDF2 + AES-GCM)", per_call_us(cold, cold_rounds)),
+        ("derived key cached", per_call_us(derived_key_cached, args.rounds)),
+        ("decrypted key cached", per_call_us(fully_cached, args.rounds * 10)),
+    ]
+
+    baseline = results[0][1]
+    for name, us in results:
+        print(f"{name:<26} {us:>12.1f} µs/call  ({baseline / us:>8.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+後端冷啟動匯入時間測試
+
+以 `python -X importtime -c "import main"` 在全新的子行程中匯入 FastAPI app，解析 stderr 的
+「import time: self | cumulative | name」輸出，回報總匯入時間、最慢的頂層模組，
+並確認較慢的第三方套件（openai、pandas、fitz、docx、gtts、genanki）沒有在啟動時被匯入，
+而是在第一次使用時才載入。
+
+用法（在 backend/ 目錄下）：
+    python benchmarks/bench_import_time.py [--module main] [--rounds 5] [--top 15] [--check]
+
+--check：啟動時匯入了上述任一套件就以非零狀態結束（可放進 CI）。
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 應延遲到第一次使用時才匯入的套件
+LAZY_MODULES = ("openai", "pandas", "fitz", "docx", "gtts", "genanki")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str) -> list[tuple[str, int, int, int]]:
+    """
+    在子行程中匯入 module 一次
+
+    Returns:
+        list: 依輸出順序的 (模組名稱, 自身微秒, 累計微秒, 巢狀深度)；子模組排在匯入它的模組之前
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def direct_imports(entries: list, module: str) -> list[tuple[str, int]]:
+    """module 直接匯入的模組與其累計微秒（module 那一行之前、上一個頂層模組之後的第一層項目）"""
+    children = []
+    for name, _, cumulative, depth in entries:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.rounds))]
+    totals = [next(cumulative for name, _, cumulative, depth in run if depth == 0 and name == args.module)
+              for run in runs]
+    # 第一輪可能包含 .pyc 編譯，以中位數為準
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.0f} ms"
+          f"  (min {min(totals) / 1000:.0f} ms, max {max(totals) / 1000:.0f} ms, {len(runs)} rounds)")
+
+    last = runs[-1]
+    print(f"\nslowest imports under {args.module}:")
+    for name, cumulative in sorted(direct_imports(last, args.module), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    imported = {name for name, *_ in last}
+    loaded = [name for name in LAZY_MODULES if name in imported]
+    print(f"\nlazy modules loaded at startup: {', '.join(loaded) if loaded else 'none'}")
+    if args.check and loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Word 單字本解析效能測試
+
+產生含 N 個段落的合成單字本（單字段落 + 兩行的項目符號例句），比較：
+- 舊版：每個段落三次未編譯的 re.search / re.match、XPath 找 numPr、每段都組 DEBUG 訊息
+- 目前：Parser.parse_word_paragraphs（預先編譯的合併比對、直接讀 pPr.numPr、延遲日誌）
+
+只計算解析段落的時間，不含讀取 .docx。
+
+用法（在 backend/ 目錄下）：
+    python benchmarks/bench_parse_word.py [--paragraphs 10000] [--rounds 3]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from docx.oxml import OxmlElement  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+
+from libs.logger import LogLevel, get_logger  # noqa: E402
+from libs.parser import Parser  # noqa: E402
+
+logger = get_logger()
+
+
+def build_paragraphs(count: int):
+    """每個單字 1 個單字段落 + 2 個例句段落"""
+    doc = Document()
+    for i in range(count // 3):
+        doc.add_paragraph(f"{i + 1}. word{i}  中文：單字{i}  詞性：n.")
+        for j in range(2):
+            para = doc.add_paragraph(f"This is example {j} of word{i}.\n這是 word{i} 的例句 {j}。")
+            num_pr = OxmlElement("w:numPr")
+            num_id = OxmlElement("w:numId")
+            num_id.set(qn("w:val"), "1")
+            num_pr.append(num_id)
+            para._p.get_or_add_pPr().append(num_pr)
+    return doc.paragraphs
+
+
+def legacy_parse(paragraphs):
+    """舊版 parse_word 的段落迴圈"""
+    current_word, word_data, all_words = None, {}, []
+    for para in paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        logger.log(LogLevel.DEBUG, f"\n =====> 原始段落: {text}")
+        logger.log(LogLevel.DISPLAY, "-" * 80)
+        word_match = re.match(r'^(\d+)\.\s+(\w+)', text)
+        if word_match:
+            if current_word and word_data:
+                all_words.append(word_data)
+            current_word = word_match.group(2)
+            word_data = {"word": current_word, "chinese": "", "pos": "", "examples": []}
+            chinese_match = re.search(r'中文：(.+)', text)
+            if chinese_match:
+                word_data["chinese"] = chinese_match.group(1).strip()
+            pos_match = re.search(r'詞性：(.+)', text)
+            if pos_match:
+                word_data["pos"] = pos_match.group(1).strip()
+        if para._element.xpath(".//w:numPr"):
+            lines = [line.strip() for line in para.text.splitlines() if line.strip()]
+            if len(lines) == 2 and word_data:
+                word_data["examples"].append({"en": lines[0], "zh": lines[1]})
+    if current_word and word_data:
+        all_words.append(word_data)
+    return all_words
+
+
+def best_of(fn, rounds: int) -> tuple[float, list]:
+    best, result = float("inf"), None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    paragraphs = build_paragraphs(args.paragraphs)
+    # 與正式環境相同：過濾 DEBUG，並略過每個單字的 INFO 輸出
+    logger.set_min_level(LogLevel.WARNING)
+    logger.register_callback(lambda level, msg: None)
+
+    legacy_s, expected = best_of(lambda: legacy_parse(paragraphs), args.rounds)
+    current_s, result = best_of(lambda: Parser().parse_word_paragraphs(paragraphs), args.rounds)
+    assert result == expected, "解析結果與舊版不同"
+
+    print(f"{len(paragraphs)} paragraphs, {len(result)} words")
+    print(f"{'legacy':<10} {legacy_s * 1000:>10.1f} ms")
+    print(f"{'current':<10} {current_s * 1000:>10.1f} ms  ({legacy_s / current_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Session 檔案查詢效能測試
+
+產生一個合成 session 目錄（N 個語音檔 + 數個卡片 JSON / .apkg），比較每個請求的查詢成本：
+- 舊版：列出檔案以 rglob + stat，最新卡片以 glob('*.json') + 依 mtime 排序
+- 目前：libs.session_index（索引已建立，直接查 SQLite）
+
+用法（在 backend/ 目錄下）：
+    python benchmarks/bench_session_index.py [--voices 5000] [--rounds 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.logger import LogLevel, get_logger  # noqa: E402
+from libs.session_index import INDEX_FILENAME, SessionIndex  # noqa: E402
+
+
+def build_session(root: Path, voices: int):
+    voice_dir = root / "orig" / "voice"
+    voice_dir.mkdir(parents=True)
+    (root / "source").mkdir()
+    (root / "edited").mkdir()
+    for i in range(voices):
+        (voice_dir / f"word{i}.mp3").write_bytes(b"\xff" * 512)
+    for i in range(5):
+        (root / "orig" / f"cards-{i}.json").write_text("[]")
+        (root / "edited" / f"deck-{i}.apkg").write_bytes(b"PK")
+
+
+def legacy_list(root: Path) -> list:
+    return [
+        {'path': str(p.relative_to(root)), 'size': p.stat().st_size}
+        for p in root.rglob('*') if p.is_file() and not p.name.startswith(INDEX_FILENAME)
+    ]
+
+
+def legacy_latest_json(root: Path) -> Path:
+    return sorted((root / "orig").glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)[0]
+
+
+def per_call(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voices", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    get_logger().set_min_level(LogLevel.WARNING)
+    root = Path(tempfile.mkdtemp(prefix="bench_index_"))
+    try:
+        build_session(root, args.voices)
+        start = time.perf_counter()
+        index = SessionIndex(root)
+        rebuild_s = time.perf_counter() - start
+
+        assert len(index.list()) == len(legacy_list(root))
+        assert index.latest("orig", (".json",)).name == legacy_latest_json(root).name
+
+        rows = [
+            ("list files", per_call(lambda: legacy_list(root), args.rounds), per_call(index.list, args.rounds)),
+            ("latest json", per_call(lambda: legacy_latest_json(root), args.rounds),
+             per_call(lambda: index.latest("orig", (".json",)), args.rounds)),
+        ]
+        index.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"{args.voices} voice files (one-time index rebuild {rebuild_s * 1000:.0f} ms)")
+    for name, legacy_s, current_s in rows:
+        print(f"{name:<12} legacy {legacy_s * 1000:>8.2f} ms  current {current_s * 1000:>8.2f} ms"
+              f"  ({legacy_s / current_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Session ZIP 下載效能測試
+
+產生一個合成 session 目錄（N 個 .mp3 語音檔 + .apkg + JSON 卡片），比較：
+- 舊版：先以 ZIP_DEFLATED 壓縮整個目錄到 NamedTemporaryFile，再以 8 KB 區塊讀出
+- 目前：helpers.zip_stream.stream_dir_zip（邊讀邊產生區塊，已壓縮格式以 ZIP_STORED 存入）
+
+輸出第一個位元組的時間、總時間與 ZIP 大小。
+
+用法（在 backend/ 目錄下）：
+    python benchmarks/bench_zip_stream.py [--voices 2000] [--rounds 3]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.zip_stream import stream_dir_zip  # noqa: E402
+
+
+def build_session(root: Path, voices: int):
+    voice_dir = root / "orig" / "voice"
+    voice_dir.mkdir(parents=True)
+    for i in range(voices):
+        # 語音檔本身已壓縮：以隨機位元組模擬
+        (voice_dir / f"word{i}.mp3").write_bytes(os.urandom(16 * 1024))
+    (root / "orig" / "deck.apkg").write_bytes(os.urandom(voices * 1024))
+    (root / "orig" / "cards.json").write_text('{"word": "example", "meaning": "例子"}\n' * voices)
+
+
+def legacy_zip(session_dir: Path):
+    temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
+    temp_zip_path = temp_zip.name
+    temp_zip.close()
+    with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file_path in session_dir.rglob('*'):
+            if file_path.is_file():
+                zipf.write(file_path, file_path.relative_to(session_dir))
+
+    def generate():
+        try:
+            with open(temp_zip_path, 'rb') as f:
+                while chunk := f.read(8192):
+                    yield chunk
+        finally:
+            Path(temp_zip_path).unlink()
+    return generate()
+
+
+def measure(make_stream) -> tuple[float, float, int]:
+    """(第一個區塊的秒數, 總秒數, 輸出位元組數)"""
+    start = time.perf_counter()
+    first, size = None, 0
+    for chunk in make_stream():
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voices", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_zip_"))
+    try:
+        build_session(root, args.voices)
+        results = []
+        for name, make_stream in (("legacy", lambda: legacy_zip(root)), ("current", lambda: stream_dir_zip(root))):
+            runs = [measure(make_stream) for _ in range(args.rounds)]
+            results.append((name, min(r[0] for r in runs), min(r[1] for r in runs), runs[0][2]))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"{args.voices} voice files")
+    baseline = results[0][2]
+    for name, first, total, size in results:
+        print(f"{name:<8} first byte {first * 1000:>8.1f} ms  total {total * 1000:>8.1f} ms"
+              f"  ({baseline / total:>4.1f}x)  {size / 1024 / 1024:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
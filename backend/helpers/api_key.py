@@ -1,7 +1,6 @@
 """
 API Key 驗證和管理相關工具函數
 """
-import os
 from libs.config import OPENAI_API_KEY
 import logging
 
@@ -29,13 +28,13 @@ def validate_and_get_api_key(settings: dict = None) -> str:
         # 檢查是否為掩碼值（前端可能傳送掩碼後的 key）
         if not provided_key.startswith('sk-***'):
             api_key = provided_key
-            os.environ['OPENAI_API_KEY'] = api_key
             logger.info("Using API Key from frontend settings")
     
     # 如果沒有從前端獲取，使用環境變數中的
     if not api_key and OPENAI_API_KEY:
         api_key = OPENAI_API_KEY
     
+    # 不寫入 os.environ（避免併發請求互相覆蓋），由呼叫端以 api_key 參數一路傳給 GPTClient
     return api_key
 
 
@@ -1,9 +1,15 @@
 """
 Session 管理相關工具函數
 """
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterable
 from nanoid import generate
 from libs.config import OUTPUTS_DIR
+from libs.session_index import get_session_index
+from libs.storage import ensure_local_session
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,19 +24,123 @@ def create_session_dir() -> Path:
     return session_dir
 
 
-def get_or_create_session_dir(session_id: str = None) -> Path:
+def touch_session_dir(session_dir: Path):
+    """更新 session 目錄的修改時間，作為最後存取時間（背景清理依此判斷是否過期）"""
+    try:
+        os.utime(session_dir)
+    except OSError:
+        pass
+
+
+# 請求處理中的 session（session ID -> 持有數量），背景清理不會刪除
+_in_use: dict[str, int] = {}
+_in_use_lock = threading.Lock()
+
+
+class SessionHold:
+    """
+    請求期間持有的 session，釋放前背景清理不會刪除（以 session_in_use 取得）
+
+    建立新 session 的請求在取得 session ID 後以 add 加入。
+    """
+
+    def __init__(self):
+        self._session_ids: list[str] = []
+
+    def add(self, session_id: str | None):
+        if not session_id or session_id in self._session_ids:
+            return
+        with _in_use_lock:
+            _in_use[session_id] = _in_use.get(session_id, 0) + 1
+        self._session_ids.append(session_id)
+
+    def release(self):
+        with _in_use_lock:
+            for session_id in self._session_ids:
+                count = _in_use.get(session_id, 0) - 1
+                if count > 0:
+                    _in_use[session_id] = count
+                else:
+                    _in_use.pop(session_id, None)
+        self._session_ids = []
+
+
+@contextmanager
+def session_in_use(session_id: str | None = None):
+    """在 with 區塊中持有 session（session_id 為 None 時可稍後以 hold.add 加入新建立的 session）"""
+    hold = SessionHold()
+    hold.add(session_id)
+    try:
+        yield hold
+    finally:
+        hold.release()
+
+
+def in_use_session_ids() -> set[str]:
+    """取得請求處理中的 session"""
+    with _in_use_lock:
+        return set(_in_use)
+
+
+def sync_session_dir(session_id: str, required: Iterable[str] = ()) -> list[Path]:
+    """
+    本機沒有 session 目錄，或缺少 required 中的檔案時，依儲存後端的清單補齊本機副本
+
+    本機副本完整時不呼叫儲存後端（避免每個請求都列出整個 session）。
+    需要同步時以 session 索引中記錄的物件版本判斷後端的檔案是否已被其他副本改寫。
+    會呼叫儲存後端，請勿在 event loop 上直接執行。新取回的檔案會加入 session 索引。
+
+    Args:
+        session_id: session ID
+        required: 此請求需要的檔案或目錄（相對於 session 目錄，例如 "orig/voice"）
+
+    Returns:
+        list[Path]: 新取回的檔案（本機儲存後端、不需要同步或沒有缺少的檔案時為空）
+    """
+    session_dir = Path(OUTPUTS_DIR) / session_id
+    if session_dir.exists() and all((session_dir / rel_path).exists() for rel_path in required):
+        return []
+    known_etags = get_session_index(session_dir).etags() if session_dir.exists() else {}
+    downloaded = ensure_local_session(session_id, known_etags)
+    if downloaded:
+        index = get_session_index(session_dir)
+        index.record(downloaded)
+        index.set_etags({path: etag for path, etag in downloaded.items() if etag is not None})
+    return list(downloaded)
+
+
+def find_session_dir(session_id: str, required: Iterable[str] = ()) -> Path | None:
+    """
+    取得已存在的 session 目錄（本機沒有或缺少 required 中的檔案時先從儲存後端補齊）
+
+    Returns:
+        Path | None: session 目錄；本機與儲存後端都沒有時回傳 None
+    """
+    session_dir = Path(OUTPUTS_DIR) / session_id
+    sync_session_dir(session_id, required)
+    if not session_dir.exists():
+        return None
+    touch_session_dir(session_dir)
+    return session_dir
+
+
+def get_or_create_session_dir(session_id: str = None, required: Iterable[str] = ()) -> Path:
     """
     獲取或創建會話目錄
     
     Args:
         session_id: 可選的會話 ID，如果提供則使用現有目錄，否則創建新目錄
+        required: 此請求需要的檔案或目錄（相對於 session 目錄），本機缺少時從儲存後端補齊
         
     Returns:
         Path: 會話目錄路徑
     """
     if session_id:
         session_dir = Path(OUTPUTS_DIR) / session_id
+        # 其他副本建立或寫入過的 session：本機沒有或缺少需要的檔案時從儲存後端補齊
+        sync_session_dir(session_id, required)
         session_dir.mkdir(parents=True, exist_ok=True)
+        touch_session_dir(session_dir)
         logger.info(f"Using existing session directory: {session_dir}")
         return session_dir
     else:
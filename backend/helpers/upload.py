@@ -0,0 +1,218 @@
+"""
+上傳檔案相關工具函數
+
+multipart 表單直接從 request.stream() 邊收邊解析，不經過 Starlette 的 UploadFile
+（UploadFile 會在路由執行前先把整個 body 暫存到磁碟，大小上限要等收完才檢查，檔案也會寫入兩次）：
+- Content-Length 超過上限時，讀取 body 之前就拒絕
+- 檔案欄位在接收時寫入 OUTPUTS_DIR/.uploads 的暫存檔並計算 SHA-256，超過上限立即中止
+- 確定 session 後以 os.replace 搬到 session 目錄（同一個檔案系統，不再複製）
+"""
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from libs.config import OUTPUTS_DIR, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+# 上傳中的暫存目錄（與 session 目錄在同一個檔案系統，完成後直接改名）
+UPLOAD_TMP_DIR = Path(OUTPUTS_DIR) / ".uploads"
+
+# 非檔案欄位（settings、sessionId 等）的總大小上限
+MAX_FORM_FIELD_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """上傳檔案超過大小上限"""
+
+
+class UploadFormError(ValueError):
+    """multipart 表單格式錯誤"""
+
+
+class StreamedUpload:
+    """
+    串流接收的上傳檔案
+
+    Attributes:
+        filename: 用戶端提供的檔名（未經處理）
+        size: 檔案大小
+        sha256: 檔案內容的 SHA-256
+        fields: 其他表單欄位
+    """
+
+    def __init__(self, filename: str, tmp_path: Path, size: int, sha256: str, fields: dict[str, str]):
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.fields = fields
+        self._tmp_path = tmp_path
+
+    def move_to(self, dest: Path) -> Path:
+        """將暫存檔搬到 dest"""
+        os.replace(self._tmp_path, dest)
+        self._tmp_path = None
+        return dest
+
+    def discard(self):
+        """刪除尚未搬走的暫存檔"""
+        if self._tmp_path is not None:
+            self._tmp_path.unlink(missing_ok=True)
+            self._tmp_path = None
+
+
+class _FormReceiver:
+    """multipart 解析器的回呼：檔案欄位寫入暫存檔，其他欄位保留在記憶體"""
+
+    def __init__(self, file_field: str, max_bytes: int):
+        self.file_field = file_field
+        self.max_bytes = max_bytes
+        self.fields: dict[str, str] = {}
+        self.filename = None
+        self.tmp_path = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self._file = None
+        self._field_bytes = 0
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part_name = None
+        self._part_data = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._part_name = None
+        self._part_data = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        from python_multipart.multipart import parse_options_header
+
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is not None and name == self.file_field and self._file is None and self.filename is None:
+            self.filename = filename.decode("utf-8", "replace")
+            UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+            self.tmp_path = UPLOAD_TMP_DIR / f"{uuid.uuid4().hex}.{threading.get_ident()}.part"
+            self._file = open(self.tmp_path, "wb")
+        elif filename is None:
+            self._part_name = name
+            self._part_data = bytearray()
+        # 其他檔案欄位直接略過
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if self._file is not None:
+            self.size += len(chunk)
+            if self.max_bytes and self.size > self.max_bytes:
+                raise UploadTooLargeError(f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+            self.digest.update(chunk)
+            self._file.write(chunk)
+        elif self._part_data is not None:
+            self._field_bytes += len(chunk)
+            if self._field_bytes > MAX_FORM_FIELD_BYTES:
+                raise UploadFormError("Form fields are too large")
+            self._part_data += chunk
+
+    def _on_part_end(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._part_data is not None:
+            self.fields[self._part_name] = self._part_data.decode("utf-8", "replace")
+            self._part_data = None
+
+    @property
+    def complete(self) -> bool:
+        """是否已完整收到檔案欄位"""
+        return self.filename is not None and self._file is None
+
+    def cleanup(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.tmp_path is not None:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+async def receive_multipart_upload(request: Request, file_field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES,
+                                   chunk_size: int = UPLOAD_CHUNK_SIZE) -> StreamedUpload:
+    """
+    從 request.stream() 串流解析 multipart 表單，檔案欄位邊收邊寫入暫存檔並計算 SHA-256
+
+    記憶體用量只與網路區塊大小有關，與檔案大小無關；超過 max_bytes 時立即中止並刪除已寫入的部分。
+
+    Args:
+        request: FastAPI 請求
+        file_field: 檔案欄位名稱
+        max_bytes: 檔案大小上限（0 表示不限制）
+        chunk_size: 累積到這個大小才交給解析器（減少切換執行緒的次數）
+
+    Returns:
+        StreamedUpload: 暫存的上傳檔案與其他表單欄位（呼叫端負責 move_to 或 discard）
+
+    Raises:
+        UploadTooLargeError: Content-Length 或實際收到的檔案超過 max_bytes
+        UploadFormError: 不是 multipart 表單、缺少檔案欄位或格式錯誤
+    """
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadFormError("Expected a multipart/form-data request")
+
+    content_length = request.headers.get("content-length")
+    if max_bytes and content_length and content_length.isdigit() \
+            and int(content_length) > max_bytes + MAX_FORM_FIELD_BYTES:
+        raise UploadTooLargeError(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+    receiver = _FormReceiver(file_field, max_bytes)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    try:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= chunk_size:
+                # 解析與寫檔在執行緒中進行，不阻塞 event loop
+                await run_in_threadpool(parser.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(parser.write, bytes(buffer))
+        await run_in_threadpool(parser.finalize)
+        if not receiver.complete:
+            raise UploadFormError(f"Missing or incomplete '{file_field}' file field")
+    except MultipartParseError as e:
+        receiver.cleanup()
+        raise UploadFormError(f"Malformed multipart body: {e}") from e
+    except BaseException:
+        receiver.cleanup()
+        raise
+    return StreamedUpload(receiver.filename, receiver.tmp_path, receiver.size, receiver.digest.hexdigest(), receiver.fields)
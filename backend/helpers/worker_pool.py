@@ -0,0 +1,113 @@
+"""
+生成流程執行池相關工具函數
+
+GPT + TTS + genanki 的流程是同步且耗時的，直接在 async handler 中呼叫會卡住整個
+uvicorn worker。這裡提供一個有上限的執行池，把流程移到背景執行，並以佇列深度做背壓。
+"""
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+
+from libs.config import PIPELINE_EXECUTOR, PIPELINE_MAX_WORKERS, PIPELINE_MAX_QUEUE
+
+logger = logging.getLogger(__name__)
+
+
+class PoolFullError(RuntimeError):
+    """執行池已滿（執行中與等待中的流程數量達到上限）"""
+
+
+class PipelinePool:
+    """
+    有上限的流程執行池
+
+    - max_workers: 同時執行的流程數量
+    - max_queue: 額外允許排隊等待的流程數量，超過時 submit 會拋出 PoolFullError
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, executor_type: str = "thread"):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unknown executor type: {executor_type}")
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.executor_type = executor_type
+        self._capacity = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+        self._in_flight = 0
+
+    @property
+    def executor(self) -> Executor:
+        """延遲建立執行器，避免在 import 時就啟動執行緒或子行程"""
+        with self._lock:
+            if self._executor is None:
+                if self.executor_type == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="pipeline"
+                    )
+                logger.info(f"Started {self.executor_type} pipeline pool: workers={self.max_workers}, queue={self.max_queue}")
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        提交流程到執行池
+
+        Raises:
+            PoolFullError: 執行中與等待中的流程數量已達上限
+        """
+        if not self._capacity.acquire(blocking=False):
+            raise PoolFullError(
+                f"Server is busy: {self.max_workers} pipelines running and {self.max_queue} queued"
+            )
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._capacity.release()
+            raise
+
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """在執行池中執行流程並等待結果（不阻塞 event loop）"""
+        future = self.submit(fn, *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, _future: Future):
+        with self._lock:
+            self._in_flight -= 1
+        self._capacity.release()
+
+    def stats(self) -> dict:
+        """取得執行池狀態"""
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            'executor': self.executor_type,
+            'maxWorkers': self.max_workers,
+            'maxQueue': self.max_queue,
+            'running': min(in_flight, self.max_workers),
+            'queued': max(0, in_flight - self.max_workers),
+        }
+
+    def shutdown(self, wait: bool = True):
+        """關閉執行池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# 全域執行池實例
+_pipeline_pool = PipelinePool(PIPELINE_MAX_WORKERS, PIPELINE_MAX_QUEUE, PIPELINE_EXECUTOR)
+
+
+def get_pipeline_pool() -> PipelinePool:
+    """取得全域流程執行池"""
+    return _pipeline_pool
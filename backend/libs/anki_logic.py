@@ -1,28 +1,195 @@
-import genanki
 from .config import *
-from typing import List, Optional
-import random
+from typing import TYPE_CHECKING, List, Optional
+import hashlib
+import itertools
 import json
 import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
 from .logger import LogLevel, get_logger
+from .session_index import record_artifact
+
+if TYPE_CHECKING:
+    import genanki
 
 logger = get_logger()
 
+# 串流寫入時每個 note 序列可使用的 id 範圍（note 與 card id 皆由此配發）
+STREAM_ID_SPAN = 10**8
+
+
+def stable_id(*parts) -> int:
+    """由名稱等字串穩定地雜湊出 deck / model id（與 genanki 建議的 9~10 位數範圍相同）"""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return 10**9 + int(digest[:15], 16) % (9 * 10**9)
+
+
+def apkg_path(deck_name: str, output_dir: str = None, filename_suffix: str = None) -> str:
+    """.apkg 輸出路徑（{deck}[_{suffix}].apkg，未指定 output_dir 時放在 OUTPUTS_DIR/apkg）"""
+    from helpers.file_utils import slugify
+    # 構建檔案名稱（使用 slugify 確保安全）
+    safe_deck_name = slugify(deck_name)
+    if filename_suffix:
+        safe_suffix = slugify(filename_suffix)
+        apkg_filename = f'{safe_deck_name}_{safe_suffix}.apkg'
+    else:
+        apkg_filename = f'{safe_deck_name}.apkg'
+
+    # 如果提供了 output_dir，使用它；否則使用默認的 APKG_DIR
+    if output_dir:
+        output_path = os.path.join(output_dir, apkg_filename)
+        os.makedirs(output_dir, exist_ok=True)
+    else:
+        # 確保 APKG_DIR 目錄存在
+        APKG_DIR = str(OUTPUTS_DIR / "apkg")
+        os.makedirs(APKG_DIR, exist_ok=True)
+        output_path = os.path.join(APKG_DIR, apkg_filename)
+    return output_path
+
+
+def write_apkg_zip(output_path: str, db_path: str, media_paths: list[str], timestamp: float):
+    """
+    將 collection 與媒體檔打包成 .apkg
+
+    檔案順序與 zip 內的時間戳記都是固定的，相同輸入會得到完全相同的檔案。
+    先寫入暫存檔再搬到目的路徑，中途失敗不會留下不完整的 .apkg。
+    """
+    date_time = time.gmtime(max(int(timestamp), 315532800))[:6]  # zip 不支援 1980 年以前的時間
+
+    def _entry(name: str) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        return info
+
+    tmp_path = f"{output_path}.part"
+    try:
+        with zipfile.ZipFile(tmp_path, "w") as outzip:
+            with open(db_path, "rb") as src, outzip.open(_entry("collection.anki2"), "w") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            media_json = {idx: os.path.basename(path) for idx, path in enumerate(media_paths)}
+            outzip.writestr(_entry("media"), json.dumps(media_json))
+            for idx, path in enumerate(media_paths):
+                with open(path, "rb") as src, outzip.open(_entry(str(idx)), "w") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    record_artifact(output_path)
+
+
+class ApkgStreamWriter:
+    """
+    分批將 notes 寫入 .apkg
+
+    與 genanki.Package.write_to_file 產生相同的檔案結構，但 notes 一批批寫入暫存的
+    SQLite collection，寫完即可釋放，記憶體用量只與單批大小有關。
+
+    同一次打包中的不同卡片類型可使用不同的 stream：每個 stream 有獨立的 id 區段，
+    分批交錯寫入時，匯入 Anki 後仍依 stream 順序排列（例如先 Basic 後 Cloze）。
+    """
+
+    def __init__(self, deck: "genanki.Deck", output_path: str, timestamp: float = None):
+        self.deck = deck
+        self.output_path = output_path
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.note_count = 0
+        self._media: dict[str, str] = {}  # basename -> 絕對路徑
+        self._id_gens: dict[int, itertools.count] = {}
+
+        fd, self._db_path = tempfile.mkstemp(prefix=".", suffix=".anki2", dir=os.path.dirname(output_path) or None)
+        os.close(fd)
+        self._conn = sqlite3.connect(self._db_path)
+        self._cursor = self._conn.cursor()
+        from genanki.apkg_col import APKG_COL
+        from genanki.apkg_schema import APKG_SCHEMA
+
+        self._cursor.executescript(APKG_SCHEMA)
+        self._cursor.executescript(APKG_COL)
+
+    def _id_gen(self, stream: int):
+        if stream not in self._id_gens:
+            self._id_gens[stream] = itertools.count(int(self.timestamp * 1000) + stream * STREAM_ID_SPAN)
+        return self._id_gens[stream]
+
+    def write_notes(self, notes: list, stream: int = 0):
+        """寫入一批 notes"""
+        if not notes:
+            return
+        self.deck.notes = notes
+        try:
+            self.deck.write_to_db(self._cursor, self.timestamp, self._id_gen(stream))
+        finally:
+            self.deck.notes = []
+        self._conn.commit()
+        self.note_count += len(notes)
+
+    def add_media(self, media_files: list[str]):
+        """登記媒體檔（相同檔名只收錄一次，不存在的檔案略過）"""
+        for media_file in media_files:
+            abs_path = os.path.abspath(media_file)
+            if os.path.basename(abs_path) in self._media:
+                continue
+            if os.path.exists(abs_path):
+                self._media[os.path.basename(abs_path)] = abs_path
+            else:
+                logger.log(LogLevel.WARNING, f"Media file not found, skipping: {abs_path}")
+
+    def close(self):
+        """完成 collection 並打包成 .apkg（先寫入暫存檔再搬到目的路徑）"""
+        self._conn.close()
+        try:
+            write_apkg_zip(self.output_path, self._db_path, list(self._media.values()), self.timestamp)
+        finally:
+            os.remove(self._db_path)
+        logger.log(LogLevel.SUCCESS, f"Exported: {self.output_path}（{self.note_count} notes）")
+
+    def abort(self):
+        """放棄打包並清除暫存檔"""
+        self._conn.close()
+        if os.path.exists(self._db_path):
+            os.remove(self._db_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
 
 class AnkiLogic:
-    def __init__(self, deck_name: str = "MyTestDeck"):
+    def __init__(self, deck_name: str = "MyTestDeck", timestamp: float = None):
+        """
+        Args:
+            deck_name: deck 名稱
+            timestamp: 寫入 notes / cards 的修改時間（秒）；指定後相同輸入會打包出完全相同的 .apkg，
+                       未指定時使用打包當下的時間
+        """
         self.deck_name = deck_name
-        
-        # 不再连接本地 Anki 数据库，直接生成随机 deck_id
-        deck_id = random.randint(10**9, 10**10)   # genanki 需要 9~10 digit random int
+        self.timestamp = timestamp
+
+        # deck_id 由 deck 名稱雜湊而來，同名 deck 重新匯入時會合併到同一個 deck
+        deck_id = stable_id("deck", deck_name)
         logger.log(LogLevel.INFO, f"Creating new deck '{deck_name}' with id: {deck_id}")
 
         self.deck_id = deck_id
         logger.log(LogLevel.SUCCESS, f"✅ Using Deck '{deck_name}' with id: {self.deck_id}")
 
         # ---- genanki Deck 用同 id ----
+        # genanki 在建立 deck 時才匯入，不拖慢伺服器啟動
+        import genanki
+
         self.deck = genanki.Deck(self.deck_id, deck_name)
         self.media_files = []
+        self._guid_counts: dict[str, int] = {}
     
     def execute(self, *args, **kwargs):
         if kwargs.get("execute_type") == "import_vocab":
@@ -45,8 +212,13 @@ class AnkiLogic:
         ex2_trans: str,
         audio: str = "",
         hint: str = "",
+        register_media: bool = True,
     ):
-        """建立 Anki note"""
+        """
+        建立 Anki note
+
+        register_media=False 時不檢查與登記語音檔（由呼叫端統一處理，例如 NoteBuilder）
+        """
         audio_filename = os.path.basename(audio) if audio else ""
 
         fields = [
@@ -62,13 +234,16 @@ class AnkiLogic:
             hint,
         ]
 
+        import genanki
+
         note = genanki.Note(
             model=model,
-            fields=fields
+            fields=fields,
+            guid=self.note_guid("basic", word, pos)
         )
 
         # 如果提供了 audio，加入 media_files（只添加存在的文件，使用绝对路径）
-        if audio:
+        if audio and register_media:
             audio_path = os.path.abspath(audio) if not os.path.isabs(audio) else audio
             if os.path.exists(audio_path):
                 self.media_files.append(audio_path)
@@ -77,11 +252,25 @@ class AnkiLogic:
 
         return note
         
-    def create_anki_card(self, note: genanki.Note):
+    def create_anki_card(self, note: "genanki.Note"):
         """將 note 加入到 deck 中"""
         self.deck.add_note(note)
         logger.log(LogLevel.SUCCESS, f"✅ Added note: {note.fields[0]}")
 
+    def note_guid(self, kind: str, word: str, pos: str) -> str:
+        """
+        由 deck、卡片類型、單字與詞性產生 note GUID
+
+        重新匯入時 Anki 依 GUID 更新既有的 note，而不是新增一份。
+        同一次打包中重複出現的 (單字, 詞性) 依出現順序加上序號，避免互相覆蓋。
+        """
+        import genanki
+
+        base = genanki.guid_for(self.deck_name, kind, word.strip(), pos.strip())
+        count = self._guid_counts.get(base, 0)
+        self._guid_counts[base] = count + 1
+        return base if count == 0 else genanki.guid_for(base, count)
+
     # ---------------- Anki Collection utils (已移除本地数据库连接) ----------------
     
     def find_decks_id(self, deck_name: str):
@@ -103,6 +292,8 @@ class AnkiLogic:
     
     def create_basic_model(self, id: int):
         """建立 basic model"""
+        import genanki
+
         return genanki.Model(
             id,
             f"{self.deck_name}_basic",
@@ -113,6 +304,8 @@ class AnkiLogic:
 
     def create_cloze_model(self, id: int):
         """建立 cloze model"""
+        import genanki
+
         return genanki.Model(
             id,
             f"{self.deck_name}_cloze",
@@ -136,6 +329,7 @@ class AnkiLogic:
         ex2_trans: str = "",
         audio: str = "",
         hint: str = "",
+        register_media: bool = True,
     ):
         """
         建立 Cloze 類型的 Anki note（可輸入單字版本）
@@ -153,6 +347,7 @@ class AnkiLogic:
             ex2_trans: 第二句例句翻譯（目標語言）
             audio: 語音檔案路徑
             hint: 提示
+            register_media: 是否檢查並登記語音檔（False 時由呼叫端統一處理）
         """
         audio_filename = os.path.basename(audio) if audio else ""
         
@@ -170,13 +365,16 @@ class AnkiLogic:
             hint,
         ]
         
+        import genanki
+
         note = genanki.Note(
             model=model,
-            fields=fields
+            fields=fields,
+            guid=self.note_guid("cloze", word, pos)
         )
         
         # 如果提供了 audio，加入 media_files（只添加存在的文件，使用绝对路径）
-        if audio:
+        if audio and register_media:
             audio_path = os.path.abspath(audio) if not os.path.isabs(audio) else audio
             if os.path.exists(audio_path):
                 self.media_files.append(audio_path)
@@ -185,29 +383,14 @@ class AnkiLogic:
         
         return note
     
+    def pack_path(self, output_dir: str = None, filename_suffix: str = None) -> str:
+        """.apkg 輸出路徑（{deck}[_{suffix}].apkg，未指定 output_dir 時放在 OUTPUTS_DIR/apkg）"""
+        return apkg_path(self.deck_name, output_dir, filename_suffix)
+
     def to_pack(self, output_dir: str = None, filename_suffix: str = None):
         """將 deck 打包成 .apkg 檔案"""
-        import os
-        from helpers.file_utils import slugify
-        # 構建檔案名稱（使用 slugify 確保安全）
-        safe_deck_name = slugify(self.deck_name)
-        if filename_suffix:
-            safe_suffix = slugify(filename_suffix)
-            apkg_filename = f'{safe_deck_name}_{safe_suffix}.apkg'
-        else:
-            apkg_filename = f'{safe_deck_name}.apkg'
-        
-        # 如果提供了 output_dir，使用它；否則使用默認的 APKG_DIR
-        if output_dir:
-            output_path = os.path.join(output_dir, apkg_filename)
-            os.makedirs(output_dir, exist_ok=True)
-        else:
-            # 確保 APKG_DIR 目錄存在
-            from .config import OUTPUTS_DIR
-            APKG_DIR = str(OUTPUTS_DIR / "apkg")
-            os.makedirs(APKG_DIR, exist_ok=True)
-            output_path = os.path.join(APKG_DIR, apkg_filename)
-        
+        output_path = self.pack_path(output_dir, filename_suffix)
+
         # 過濾並轉換 media_files 為絕對路徑，只保留存在的文件
         valid_media_files = []
         for media_file in self.media_files:
@@ -218,14 +401,35 @@ class AnkiLogic:
             else:
                 logger.log(LogLevel.WARNING, f"Media file not found, skipping: {abs_path}")
         
-        pkg = genanki.Package(self.deck)
-        pkg.media_files = valid_media_files
-        pkg.write_to_file(output_path)
+        # 與 genanki.Package.write_to_file 相同的 collection，但以固定順序與時間戳記打包
+        timestamp = self.pack_timestamp()
+        fd, db_path = tempfile.mkstemp(prefix=".", suffix=".anki2", dir=os.path.dirname(output_path))
+        os.close(fd)
+        try:
+            import genanki
+
+            conn = sqlite3.connect(db_path)
+            try:
+                genanki.Package(self.deck).write_to_db(conn.cursor(), timestamp, itertools.count(int(timestamp * 1000)))
+                conn.commit()
+            finally:
+                conn.close()
+            write_apkg_zip(output_path, db_path, list(dict.fromkeys(valid_media_files)), timestamp)
+        finally:
+            os.remove(db_path)
         logger.log(LogLevel.SUCCESS, f"Exported: {output_path}")
 
-    def random_model_id(self):
-        """產生隨機的 model ID"""
-        return random.randint(10**9, 10**10)
+    def pack_timestamp(self) -> float:
+        """打包使用的時間戳記（未指定時為目前時間，取整秒）"""
+        return float(int(self.timestamp if self.timestamp is not None else time.time()))
+
+    def open_stream(self, output_dir: str = None, filename_suffix: str = None) -> ApkgStreamWriter:
+        """開啟分批寫入的 .apkg"""
+        return ApkgStreamWriter(self.deck, self.pack_path(output_dir, filename_suffix), timestamp=self.pack_timestamp())
+
+    def stable_model_id(self, kind: str) -> int:
+        """由 deck 名稱、卡片類型與模板版本產生固定的 model ID（模板改版時才會變成新的 note type）"""
+        return stable_id("model", self.deck_name, kind, ANKI_TEMPLATE_VERSION)
 
     def read_vocab_json(self, json_path: str):
         """讀取單字 JSON 檔案"""
@@ -297,19 +501,19 @@ class AnkiLogic:
 
     def get_or_create_basic_model(self):
         """
-        建立新的 basic model（已移除本地数据库连接，总是创建新 model）。
+        建立 basic model（ID 固定，重新匯入時沿用同一個 note type）。
         """
         model_name = f"{self.deck_name}_basic"
-        model_id = self.random_model_id()
+        model_id = self.stable_model_id("basic")
         logger.log(LogLevel.INFO, f"創建新的 Basic model '{model_name}' (ID: {model_id})")
         return self.create_basic_model(model_id)
 
     def get_or_create_cloze_model(self):
         """
-        建立新的 cloze model（已移除本地数据库连接，总是创建新 model）。
+        建立 cloze model（ID 固定，重新匯入時沿用同一個 note type）。
         """
         model_name = f"{self.deck_name}_cloze"
-        model_id = self.random_model_id()
+        model_id = self.stable_model_id("cloze")
         logger.log(LogLevel.INFO, f"創建新的 Cloze model '{model_name}' (ID: {model_id})")
         return self.create_cloze_model(model_id)
 
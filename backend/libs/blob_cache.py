@@ -0,0 +1,200 @@
+"""
+跨會話共用的檔案快取
+
+以內容 key（由呼叫端組合，例如 TTS 的文字 + 模型 + 聲音 + 語言）保存檔案，
+會話需要時以硬連結（不支援時改為複製）放到自己的目錄，不必重新生成。
+SQLite 索引記錄每個項目的大小與最後使用時間，查詢不需掃描目錄，
+總大小超過配額時淘汰最久未使用的項目。
+"""
+import filecmp
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import weakref
+
+from .config import (
+    AUDIO_CACHE_ENABLED, AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES,
+    APKG_CACHE_ENABLED, APKG_CACHE_DIR, APKG_CACHE_MAX_BYTES,
+)
+from .logger import LogLevel, get_logger
+
+logger = get_logger()
+
+
+class BlobCache:
+    """
+    檔案快取（內容存放於 root/xx/key，索引存放於 root/index.sqlite3）
+
+    - max_bytes: 總大小上限，超過時淘汰最久未使用的項目（0 表示不限制）
+    """
+
+    def __init__(self, root: str, max_bytes: int = 0, suffix: str = ""):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._key_locks: weakref.WeakValueDictionary[str, threading.Lock] = weakref.WeakValueDictionary()
+
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(root, "index.sqlite3"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_accessed ON blobs(accessed_at)")
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+
+    def key_lock(self, key: str) -> threading.Lock:
+        """
+        取得此 key 專用的鎖
+
+        同一個 key 同時只讓一個請求生成內容，其他請求等待後直接命中快取。
+        鎖在沒有人持有引用時自動釋放。
+        """
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM blobs WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """
+        將快取項目放到 dest（硬連結優先，失敗時複製）
+
+        :return: 是否命中
+        """
+        # 連結在鎖內完成，避免同一行程中的淘汰在查詢與連結之間刪掉檔案
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM blobs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            blob_path = self._blob_path(key)
+            try:
+                _link_or_copy(blob_path, dest)
+            except FileNotFoundError:
+                # 索引與檔案不一致（手動刪除，或其他行程共用快取目錄時已淘汰），視為未命中
+                self._conn.execute("DELETE FROM blobs WHERE key = ?", (key,))
+                return False
+            self._conn.execute("UPDATE blobs SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return True
+
+    def matches(self, key: str, path: str) -> bool:
+        """path 是否就是此快取項目（同一個硬連結，或內容完全相同）"""
+        if not self.contains(key) or not os.path.exists(path):
+            return False
+        blob_path = self._blob_path(key)
+        try:
+            same = os.path.samefile(blob_path, path) or filecmp.cmp(blob_path, path, shallow=False)
+        except FileNotFoundError:
+            return False
+        if same:
+            with self._lock:
+                self._conn.execute("UPDATE blobs SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return same
+
+    def put(self, key: str, src: str):
+        """將 src 檔案加入快取（src 保持不動）"""
+        blob_path = self._blob_path(key)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        tmp_path = f"{blob_path}.{threading.get_ident()}.part"
+        try:
+            _link_or_copy(src, tmp_path)
+            os.replace(tmp_path, blob_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (key, size, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, os.path.getsize(blob_path), now, now)
+            )
+            if self.max_bytes:
+                self._evict_locked()
+
+    def evict(self) -> int:
+        """淘汰超出大小上限的項目，回傳刪除數量"""
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        total, = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        if not self.max_bytes or total <= self.max_bytes:
+            return 0
+
+        deleted = 0
+        rows = self._conn.execute("SELECT key, size FROM blobs ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._blob_path(key))
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM blobs WHERE key = ?", (key,))
+            total -= size
+            deleted += 1
+        if deleted:
+            logger.log(LogLevel.INFO, f"檔案快取 {self.root} 淘汰 {deleted} 筆")
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {'entries': count, 'bytes': total, 'maxBytes': self.max_bytes}
+
+
+def _link_or_copy(src: str, dest: str):
+    """建立硬連結（跨檔案系統或不支援時改為複製）"""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+_caches: dict[str, BlobCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(name: str, enabled: bool, root: str, max_bytes: int, suffix: str) -> BlobCache | None:
+    """延遲開啟具名的全域快取（停用或無法開啟時回傳 None）"""
+    if not enabled:
+        return None
+    with _caches_lock:
+        if name not in _caches:
+            try:
+                _caches[name] = BlobCache(root, max_bytes, suffix=suffix)
+            except (OSError, sqlite3.Error) as e:
+                logger.log(LogLevel.WARNING, f"無法開啟{name}快取 {root}：{e}")
+                return None
+        return _caches[name]
+
+
+def get_audio_cache() -> BlobCache | None:
+    """取得全域語音快取（停用或無法開啟時回傳 None）"""
+    return _get_cache("語音", AUDIO_CACHE_ENABLED, AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, ".mp3")
+
+
+def get_apkg_cache() -> BlobCache | None:
+    """取得全域 .apkg 打包快取（停用或無法開啟時回傳 None）"""
+    return _get_cache("打包", APKG_CACHE_ENABLED, APKG_CACHE_DIR, APKG_CACHE_MAX_BYTES, ".apkg")
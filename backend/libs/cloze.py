@@ -0,0 +1,195 @@
+"""
+Cloze 挖空
+
+在例句中找出單字（含屈折變化：abandon -> abandons / abandoned / abandoning）並轉成 {{c1::...}}。
+
+- 例句先以預先編譯的 token 正規表示式切出完整單字，再比對單字的變化形集合，
+  不會挖到其他單字的一部分（cat 不會挖到 category）
+- 每個單字的變化形集合以 lru_cache 快取，整批例句不需要為每個單字編譯正規表示式
+- 片語（give up）以快取的正規表示式比對，第一個字允許屈折變化
+- 非拉丁字母的單字（中日韓等沒有空白分詞的語言）改用不分大小寫的子字串比對
+"""
+import re
+from functools import lru_cache
+
+# 完整單字（只含字母；數字、底線、撇號與連字號都視為分隔）
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+_LATIN_WORD_RE = re.compile(r"[A-Za-z]+")
+_LATIN_PHRASE_RE = re.compile(r"[A-Za-z]+(?:[\s-]+[A-Za-z]+)+")
+
+_VOWELS = frozenset("aeiou")
+
+# 常見不規則變化（原形 -> 變化形）
+_IRREGULAR = {
+    "be": ("am", "is", "are", "was", "were", "been", "being"),
+    "have": ("has", "had", "having"),
+    "do": ("does", "did", "done", "doing"),
+    "go": ("goes", "went", "gone", "going"),
+    "begin": ("began", "begun"),
+    "break": ("broke", "broken"),
+    "bring": ("brought",),
+    "build": ("built",),
+    "buy": ("bought",),
+    "catch": ("caught",),
+    "choose": ("chose", "chosen"),
+    "come": ("came",),
+    "draw": ("drew", "drawn"),
+    "drink": ("drank", "drunk"),
+    "drive": ("drove", "driven"),
+    "eat": ("ate", "eaten"),
+    "fall": ("fell", "fallen"),
+    "feel": ("felt",),
+    "fight": ("fought",),
+    "find": ("found",),
+    "fly": ("flew", "flown", "flies"),
+    "forget": ("forgot", "forgotten"),
+    "get": ("got", "gotten"),
+    "give": ("gave", "given"),
+    "grow": ("grew", "grown"),
+    "hold": ("held",),
+    "keep": ("kept",),
+    "know": ("knew", "known"),
+    "lay": ("laid",),
+    "lead": ("led",),
+    "leave": ("left",),
+    "lend": ("lent",),
+    "lie": ("lay", "lain", "lying"),
+    "lose": ("lost",),
+    "make": ("made",),
+    "mean": ("meant",),
+    "meet": ("met",),
+    "pay": ("paid",),
+    "ride": ("rode", "ridden"),
+    "rise": ("rose", "risen"),
+    "run": ("ran",),
+    "say": ("said",),
+    "see": ("saw", "seen"),
+    "seek": ("sought",),
+    "sell": ("sold",),
+    "send": ("sent",),
+    "shake": ("shook", "shaken"),
+    "shine": ("shone",),
+    "sing": ("sang", "sung"),
+    "sit": ("sat",),
+    "sleep": ("slept",),
+    "speak": ("spoke", "spoken"),
+    "spend": ("spent",),
+    "stand": ("stood",),
+    "steal": ("stole", "stolen"),
+    "strike": ("struck",),
+    "swim": ("swam", "swum"),
+    "take": ("took", "taken"),
+    "teach": ("taught",),
+    "tear": ("tore", "torn"),
+    "tell": ("told",),
+    "think": ("thought",),
+    "throw": ("threw", "thrown"),
+    "understand": ("understood",),
+    "wake": ("woke", "woken"),
+    "wear": ("wore", "worn"),
+    "win": ("won",),
+    "write": ("wrote", "written"),
+    "child": ("children",),
+    "man": ("men",),
+    "woman": ("women",),
+    "person": ("people",),
+    "foot": ("feet",),
+    "tooth": ("teeth",),
+    "mouse": ("mice",),
+    "good": ("better", "best"),
+    "bad": ("worse", "worst"),
+}
+
+
+def _is_doubling(w: str) -> bool:
+    """子音 + 母音 + 子音結尾的短字（stop -> stopped）"""
+    return (
+        len(w) >= 3
+        and w[-1] not in _VOWELS and w[-1] not in "wxy"
+        and w[-2] in _VOWELS
+        and w[-3] not in _VOWELS
+    )
+
+
+@lru_cache(maxsize=8192)
+def inflections(lemma: str) -> frozenset[str]:
+    """英文單字的常見變化形（小寫）：複數 / 第三人稱、過去式、進行式、比較級與最高級"""
+    w = lemma.lower()
+    forms = {w, w + "s", w + "es", w + "ed", w + "ing", w + "er", w + "est"}
+
+    if w.endswith("e"):
+        forms.update({w + "d", w + "r", w + "st", w[:-1] + "ing"})
+        if w.endswith("ie"):
+            forms.add(w[:-2] + "ying")
+    if len(w) > 1 and w.endswith("y") and w[-2] not in _VOWELS:
+        stem = w[:-1]
+        forms.update({stem + "ies", stem + "ied", stem + "ier", stem + "iest"})
+    if w.endswith("f"):
+        forms.add(w[:-1] + "ves")
+    elif w.endswith("fe"):
+        forms.add(w[:-2] + "ves")
+    if len(w) > 3 and w.endswith("is"):
+        # 希臘 / 拉丁字源的 -is → -es（analysis → analyses、thesis → theses、crisis → crises）
+        forms.add(w[:-2] + "es")
+    if _is_doubling(w):
+        forms.update(w + w[-1] + suffix for suffix in ("ed", "ing", "er", "est"))
+    if w.endswith("c"):
+        forms.update({w + "ked", w + "king"})
+
+    forms.update(_IRREGULAR.get(w, ()))
+    return frozenset(forms)
+
+
+@lru_cache(maxsize=2048)
+def _phrase_pattern(phrase: str) -> re.Pattern:
+    """片語：第一個字允許屈折變化，字與字之間允許任意空白或連字號"""
+    first, *rest = re.split(r"[\s-]+", phrase.strip())
+    head = "|".join(re.escape(f) for f in sorted(inflections(first), key=len, reverse=True))
+    tail = "".join(r"[\s-]+" + re.escape(t) for t in rest)
+    return re.compile(rf"(?<!\w)(?:{head}){tail}(?!\w)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def _substring_pattern(word: str) -> re.Pattern:
+    return re.compile(re.escape(word), re.IGNORECASE)
+
+
+def find_word(word: str, sentence: str) -> tuple[int, int] | None:
+    """回傳單字（或其變化形）在例句中第一次出現的位置 (start, end)，找不到時回傳 None"""
+    word = word.strip()
+    if not word or not sentence:
+        return None
+
+    if _LATIN_WORD_RE.fullmatch(word):
+        forms = inflections(word)
+        for m in _TOKEN_RE.finditer(sentence):
+            if m.group().lower() in forms:
+                return m.span()
+        return None
+    if _LATIN_PHRASE_RE.fullmatch(word):
+        m = _phrase_pattern(word).search(sentence)
+        return m.span() if m else None
+
+    # 非拉丁字母（沒有空白分詞）或含數字等符號：不分大小寫的子字串比對
+    m = _substring_pattern(word).search(sentence)
+    return m.span() if m else None
+
+
+def mask_sentence(word: str, sentence: str) -> str:
+    """將例句中第一個出現的單字（保留原本的變化形與大小寫）轉成 {{c1::...}}"""
+    span = find_word(word, sentence)
+    if span is None:
+        return sentence
+    start, end = span
+    return f"{sentence[:start]}{{{{c1::{sentence[start:end]}}}}}{sentence[end:]}"
+
+
+def mask_sentences(word: str, sentences: list[str]) -> list[str]:
+    """以同一個單字批次挖空多個例句"""
+    return [mask_sentence(word, s) if s else s for s in sentences]
+
+
+def cloze_text(word: str, ex1_ori: str, ex1_trans: str, ex2_ori: str, ex2_trans: str) -> str:
+    """將兩個例句中的單字轉換為 Cloze 格式，並與翻譯組合成 Text 欄位"""
+    cloze_ex1, cloze_ex2 = mask_sentences(word, [ex1_ori, ex2_ori])
+    return f"{cloze_ex1}\n{ex1_trans}\n\n{cloze_ex2}\n{ex2_trans}" if cloze_ex2 else f"{cloze_ex1}\n{ex1_trans}"
@@ -85,6 +85,8 @@ VOICE_DIR: str = str(_get("VOICE_DIR", str(OUTPUTS_DIR / "voice")))
 PASSAGE_IMAGE_DIR: str = str(_get("PASSAGE_IMAGE_DIR", str(OUTPUTS_DIR / "passage_images")))
 TRANSED_VOCAB_DIR: str = str(_get("TRANSED_VOCAB_DIR", str(OUTPUTS_DIR / "transed_vocab")))
 CONFIG_DIR: str = str(_get("CONFIG_DIR", str(ROOT_DIR / "config")))
+# 跨會話共用的快取資料夾（不隨 session 清理）
+CACHE_DIR: str = str(_get("CACHE_DIR", str(ROOT_DIR / "cache")))
 
 # Anki 資料庫路徑
 _DEFAULT_ANKI_DB = "/Users/taieeuu/Library/Application Support/Anki2/使用者 1/collection.anki2"
@@ -94,10 +96,158 @@ ANKI_DB_PATH: str = _get("ANKI_DB_PATH", _DEFAULT_ANKI_DB)
 OPENAI_API_KEY: str = _get("OPENAI_API_KEY", "")
 
 
+# =========================
+# API Key Settings
+# =========================
+
+# 已解密 API Key 的內存快取存活秒數（0 表示停用）
+API_KEY_CACHE_TTL: int = int(_get("API_KEY_CACHE_TTL", "600"))
+# 已解密 API Key 的快取項目上限
+API_KEY_CACHE_MAX_ENTRIES: int = int(_get("API_KEY_CACHE_MAX_ENTRIES", "1024"))
+# 行程內共用的 OpenAI 客戶端數量上限（依 API Key 區分）
+OPENAI_CLIENT_MAX: int = int(_get("OPENAI_CLIENT_MAX", "64"))
+# OpenAI 客戶端閒置超過此秒數即移除
+OPENAI_CLIENT_IDLE_TIMEOUT: int = int(_get("OPENAI_CLIENT_IDLE_TIMEOUT", "900"))
+
+# =========================
+# Upload Settings
+# =========================
+
+# 單一上傳檔案大小上限（位元組，預設 200 MB），串流寫入時即檢查
+MAX_UPLOAD_BYTES: int = int(_get("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+# 串流寫入的區塊大小（位元組）
+UPLOAD_CHUNK_SIZE: int = int(_get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# =========================
+# Worker Pool Settings
+# =========================
+
+# 生成流程執行器類型："thread" 或 "process"
+PIPELINE_EXECUTOR: str = _get("PIPELINE_EXECUTOR", "thread")
+# 同時執行的生成流程數量上限
+PIPELINE_MAX_WORKERS: int = int(_get("PIPELINE_MAX_WORKERS", "4"))
+# 等待執行的流程數量上限，超過時回傳 429
+PIPELINE_MAX_QUEUE: int = int(_get("PIPELINE_MAX_QUEUE", "16"))
+# 背景任務完成後保留結果的秒數
+JOB_RESULT_TTL: int = int(_get("JOB_RESULT_TTL", "3600"))
+
+
+# =========================
+# GPT Request Settings
+# =========================
+
+# 單字清單每批送給 GPT 的單字數量
+GPT_BATCH_SIZE: int = int(_get("GPT_BATCH_SIZE", "25"))
+# 同時進行中的 GPT 請求數量上限
+GPT_MAX_CONCURRENCY: int = int(_get("GPT_MAX_CONCURRENCY", "4"))
+# 單一批次失敗時的重試次數
+GPT_MAX_RETRIES: int = int(_get("GPT_MAX_RETRIES", "3"))
+# 重試的基礎等待秒數（指數退避）
+GPT_RETRY_BACKOFF: float = float(_get("GPT_RETRY_BACKOFF", "1.0"))
+
+# 語音合成（TTS）設定
+TTS_MODEL: str = _get("TTS_MODEL", "gpt-4o-mini-tts")
+# 可換: 'alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer', 'coral', 'verse', 'ballad', 'ash', 'sage', 'marin', and 'cedar'
+TTS_VOICE: str = _get("TTS_VOICE", "alloy")
+# 同時進行中的 TTS 請求數量上限
+TTS_MAX_CONCURRENCY: int = int(_get("TTS_MAX_CONCURRENCY", "8"))
+
+# GPT 詞彙結果快取（SQLite）
+VOCAB_CACHE_ENABLED: bool = _get("VOCAB_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+VOCAB_CACHE_PATH: str = str(_get("VOCAB_CACHE_PATH", str(Path(CACHE_DIR) / "vocab_cache.sqlite3")))
+# 快取項目存活秒數（預設 30 天）
+VOCAB_CACHE_TTL: int = int(_get("VOCAB_CACHE_TTL", str(30 * 24 * 3600)))
+# 快取項目數量上限，超過時淘汰最久未使用的項目
+VOCAB_CACHE_MAX_ENTRIES: int = int(_get("VOCAB_CACHE_MAX_ENTRIES", "200000"))
+
+
+# 跨會話共用的語音快取（以文字 + 模型 + 聲音 + 語言為 key）
+AUDIO_CACHE_ENABLED: bool = _get("AUDIO_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+AUDIO_CACHE_DIR: str = str(_get("AUDIO_CACHE_DIR", str(Path(CACHE_DIR) / "audio")))
+# 語音快取大小上限（位元組，預設 2 GB），超過時淘汰最久未使用的檔案
+AUDIO_CACHE_MAX_BYTES: int = int(_get("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# 文章圖片前處理（送進 vision 模型前縮圖、轉灰階並重新壓縮）
+IMAGE_MAX_EDGE: int = int(_get("IMAGE_MAX_EDGE", "1600"))
+IMAGE_GRAYSCALE: bool = _get("IMAGE_GRAYSCALE", "true").lower() in ("1", "true", "yes")
+IMAGE_JPEG_QUALITY: int = int(_get("IMAGE_JPEG_QUALITY", "80"))
+# 記憶體中保留的已編碼圖片數量
+IMAGE_CACHE_SIZE: int = int(_get("IMAGE_CACHE_SIZE", "64"))
+
+
+# =========================
+# PDF Parsing Settings
+# =========================
+
+# PDF 文字層字數達到此值才視為文字 PDF（直接送文字給 GPT，不抽圖片）
+PDF_TEXT_MIN_CHARS: int = int(_get("PDF_TEXT_MIN_CHARS", "200"))
+# 擷取圖片的子行程數量（1 表示不併發）
+PDF_IMAGE_WORKERS: int = int(_get("PDF_IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 頁數達到此值才以子行程併發擷取（小檔案啟動子行程反而較慢）
+PDF_IMAGE_PARALLEL_MIN_PAGES: int = int(_get("PDF_IMAGE_PARALLEL_MIN_PAGES", "8"))
+# 略過最短邊小於此像素或檔案小於此位元組的圖片（logo、分隔線等裝飾圖）
+PDF_IMAGE_MIN_EDGE: int = int(_get("PDF_IMAGE_MIN_EDGE", "64"))
+PDF_IMAGE_MIN_BYTES: int = int(_get("PDF_IMAGE_MIN_BYTES", "2048"))
+
+
+# =========================
+# Excel Import Settings
+# =========================
+
+# 分批讀取 Excel / CSV 詞彙表時每批的列數
+EXCEL_CHUNK_ROWS: int = int(_get("EXCEL_CHUNK_ROWS", "5000"))
+
+# =========================
+# Package Cache Settings
+# =========================
+
+# 是否快取打包好的 .apkg（內容相同時直接沿用，不重新打包）
+APKG_CACHE_ENABLED: bool = _get("APKG_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# .apkg 快取資料夾
+APKG_CACHE_DIR: str = str(_get("APKG_CACHE_DIR", str(Path(CACHE_DIR) / "apkg")))
+# .apkg 快取大小上限（位元組，預設 1 GB），超過時淘汰最久未使用的檔案
+APKG_CACHE_MAX_BYTES: int = int(_get("APKG_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# =========================
+# Session GC Settings
+# =========================
+
+# 是否在背景定期清理 outputs/ 下的 session 目錄
+SESSION_GC_ENABLED: bool = _get("SESSION_GC_ENABLED", "true").lower() in ("1", "true", "yes")
+# session 最後一次存取後保留的秒數（預設 24 小時，0 表示不依時間清理）
+SESSION_TTL: int = int(_get("SESSION_TTL", str(24 * 3600)))
+# outputs/ 中所有 session 的總大小上限（位元組，預設 10 GB，0 表示不限制），超過時淘汰最久未存取的 session
+OUTPUTS_MAX_BYTES: int = int(_get("OUTPUTS_MAX_BYTES", str(10 * 1024 ** 3)))
+# 兩次清理之間的秒數
+SESSION_GC_INTERVAL: int = int(_get("SESSION_GC_INTERVAL", "300"))
+# 為了配額淘汰時，最近這麼多秒內存取過的 session 不會被刪除
+SESSION_GC_MIN_AGE: int = int(_get("SESSION_GC_MIN_AGE", "3600"))
+# 每次清理最多刪除的 session 數量（其餘留到下一輪，避免單次清理佔用太久）
+SESSION_GC_BATCH: int = int(_get("SESSION_GC_BATCH", "50"))
+
+# =========================
+# Artifact Storage Settings
+# =========================
+
+# session 產出的儲存後端："local"（只存在 OUTPUTS_DIR）或 "s3"（同時上傳到 S3 相容的物件儲存，多個副本共用）
+ARTIFACT_STORE: str = _get("ARTIFACT_STORE", "local").lower()
+# S3 bucket 與物件 key 前綴（key 為 {prefix}{session_id}/{相對路徑}）
+S3_BUCKET: str = _get("S3_BUCKET", "")
+S3_PREFIX: str = _get("S3_PREFIX", "sessions/")
+# S3 相容服務的端點（MinIO 等；使用 AWS S3 時留空）與區域，認證沿用 boto3 的環境變數
+S3_ENDPOINT_URL: str = _get("S3_ENDPOINT_URL", "")
+S3_REGION: str = _get("S3_REGION", "")
+# 串流讀寫的區塊大小（位元組）
+ARTIFACT_CHUNK_SIZE: int = int(_get("ARTIFACT_CHUNK_SIZE", str(1024 * 1024)))
+
 # =========================
 # Anki Settings
 # =========================
 
+# 卡片模板版本：修改 fields / templates / CSS 時請遞增，
+# model ID 由 deck 名稱與此版本雜湊而來，改版後才會在 Anki 中建立新的 note type
+ANKI_TEMPLATE_VERSION = "1"
+
 BASIC_FIELDS = [
     {'name': 'Word'}, 
     {'name': 'Pos'},
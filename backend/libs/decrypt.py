@@ -3,15 +3,22 @@
 使用与前端相同的加密方式（AES-GCM）
 """
 import base64
+import hashlib
 import os
+import threading
+import time
+from functools import lru_cache
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 
+from .config import API_KEY_CACHE_TTL, API_KEY_CACHE_MAX_ENTRIES
 
+
+@lru_cache(maxsize=32)
 def derive_key(domain: str = "localhost") -> bytes:
-    """派生加密密钥（与前端逻辑一致）"""
+    """派生加密密钥（与前端逻辑一致；每个域名只计算一次 PBKDF2）"""
     # 使用域名 + 固定字符串作为密钥材料
     key_material = f"{domain}anki-generator-secret-key-2024".encode()
     salt = b'anki-generator-salt'
@@ -27,14 +34,69 @@ def derive_key(domain: str = "localhost") -> bytes:
     return kdf.derive(key_material)
 
 
+class _DecryptedKeyCache:
+    """
+    已解密 API Key 的内存缓存
+
+    以 (域名, 密文) 的哈希为 key，超过 ttl 秒的项目视为过期，
+    项目数超过 max_entries 时先清除过期项目，仍超过则清除最早写入的项目。
+    """
+
+    def __init__(self, ttl: int = API_KEY_CACHE_TTL, max_entries: int = API_KEY_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(encrypted_text: str, domain: str) -> str:
+        return hashlib.sha256(f"{domain}\0{encrypted_text}".encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] >= now}
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (value, now + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_decrypted_key_cache = _DecryptedKeyCache()
+
+
 def decrypt_api_key(encrypted_text: str, domain: str = "localhost") -> str:
     """
     解密前端传来的加密 API Key
+
+    相同的密文在 API_KEY_CACHE_TTL 秒内直接使用缓存结果，不重复解密。
     
     :param encrypted_text: 加密的 base64 字符串
     :param domain: 域名（用于派生密钥）
     :return: 解密后的 API Key
     """
+    cache_key = _DecryptedKeyCache.make_key(encrypted_text, domain)
+    cached = _decrypted_key_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         # 解码 base64
         combined = base64.b64decode(encrypted_text)
@@ -48,9 +110,10 @@ def decrypt_api_key(encrypted_text: str, domain: str = "localhost") -> str:
         
         # 解密
         aesgcm = AESGCM(key)
-        decrypted = aesgcm.decrypt(iv, encrypted_data, None)
-        
-        return decrypted.decode('utf-8')
+        decrypted = aesgcm.decrypt(iv, encrypted_data, None).decode('utf-8')
     except Exception as e:
         raise ValueError(f"Failed to decrypt API Key: {str(e)}")
 
+    _decrypted_key_cache.set(cache_key, decrypted)
+    return decrypted
+
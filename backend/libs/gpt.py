@@ -1,36 +1,102 @@
-from openai import OpenAI
-import base64
 from typing import List, Dict
 import json
 import os
 import glob
+import hashlib
+import random
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from .config import PROMPT_EN_PASSAGE_VOCAB_QUESTIONS, WORD_SCHEMA, TRANSED_VOCAB_DIR, PROMPT_EN_VOCAB, PROMPT_AI_GENERATE
 from datetime import datetime
-from .config import VOICE_DIR, AI_MODEL, OPENAI_API_KEY
+from .config import VOICE_DIR, AI_MODEL, OPENAI_API_KEY, SOURCE_LANG, TARGET_LANG
+from .config import GPT_BATCH_SIZE, GPT_MAX_CONCURRENCY, GPT_MAX_RETRIES, GPT_RETRY_BACKOFF
+from .config import TTS_MODEL, TTS_VOICE, TTS_MAX_CONCURRENCY
 from helpers.file_utils import slugify
 from .logger import LogLevel, get_logger
+from .vocab_cache import get_vocab_cache, make_cache_key, prompt_version
+from .blob_cache import get_audio_cache
+from .image_prep import get_image_preprocessor
+from .openai_pool import RateLimitGate, get_openai_registry
+from .session_index import record_artifact
 
 logger = get_logger()
 
 
+@lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    """可重試的錯誤：限流、逾時、連線問題、伺服器錯誤，以及模型偶發的非法 JSON（第一次呼叫時才匯入 openai）"""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        json.JSONDecodeError,
+    )
+
+
+# 單字行末的詞性提示，例如 "abandon (v.)"、"record（n.）"
+_POS_HINT_RE = re.compile(r"^(.*?)\s*[(（]([^()（）]+)[)）]\s*$")
+
+
+def _split_pos_hint(line: str) -> tuple[str, str]:
+    """將單字行拆成 (單字, 詞性提示)"""
+    match = _POS_HINT_RE.match(line)
+    if match and match.group(1):
+        return match.group(1).strip(), match.group(2).strip()
+    return line.strip(), ""
+
+
+def _retry_after_seconds(error: Exception) -> float | None:
+    """從 429 回應的 Retry-After / retry-after-ms 標頭取得建議等待秒數"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value:
+            try:
+                seconds = float(value)
+            except ValueError:
+                continue
+            return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+def _normalize_tts_text(text: str) -> str:
+    """正規化 TTS 輸入文字（Unicode NFC、合併空白），作為語音快取 key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _file_digest(path: str) -> str:
+    """計算檔案內容的 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 class GPTClient:
     def __init__(self, model: str = None, session_dir: str = None, api_key: str = None):
         """
         初始化 GPT 客戶端。
         :param model: 預設使用 AI_MODEL，可視需要改成其他模型。
         :param session_dir: 會話目錄路徑，如果提供則將文件保存到此目錄
-        :param api_key: OpenAI API Key（優先使用此參數，如果未提供則從環境變數讀取）
+        :param api_key: OpenAI API Key（優先使用此參數，如果未提供則使用環境變數）
         """
         # 優先順序：參數 -> 環境變數
-        if api_key:
-            final_api_key = api_key
-        else:
-            final_api_key = os.getenv("OPENAI_API_KEY") or OPENAI_API_KEY
+        final_api_key = api_key or OPENAI_API_KEY
         
         if not final_api_key:
             raise RuntimeError("未設定 OPENAI_API_KEY，請在參數或環境變數中配置。")
         
-        self.client = OpenAI(api_key=final_api_key)
+        # 同一個 API Key 共用客戶端、連線池與限流閘門
+        self.client, self.rate_limit_gate = get_openai_registry().get_with_gate(final_api_key)
         # 優先使用環境變數中的模型，否則使用參數或預設值
         self.model = model
 
@@ -41,30 +107,26 @@ class GPTClient:
         else:
             self.voice_output_path = VOICE_DIR
             self.transed_vocab_path = TRANSED_VOCAB_DIR
-
-        for p in (self.voice_output_path, self.transed_vocab_path):
-            os.makedirs(p, exist_ok=True)
         
     def _encode_image(self, image_path: str) -> str:
         """
-        將圖片轉成 Base64
+        將圖片前處理（縮圖、灰階、重新壓縮）後轉成 data URL
         """
-        with open(image_path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+        return get_image_preprocessor().data_url(image_path)
 
-    def passage_with_question(self, passage_image_folder: str = None, question: str = PROMPT_EN_PASSAGE_VOCAB_QUESTIONS, image_paths: list[str] = None):
+    def passage_with_question(self, passage_image_folder: str = None, question: str = PROMPT_EN_PASSAGE_VOCAB_QUESTIONS, image_paths: list[str] = None, passage_text: str = None):
         """
         收集圖片，並生成問題，最後呼叫 GPT 生成詞彙清單並回傳
         
         Args:
-            passage_image_folder: 圖片資料夾路徑（如果未提供 image_paths）
+            passage_image_folder: 圖片資料夾路徑（如果未提供 image_paths 與 passage_text）
             question: 問題提示
             image_paths: 指定的圖片路徑列表（優先使用）
+            passage_text: 文字層 PDF 擷取出的文章文字（直接以文字送出，不需 vision）
         """
-        # 如果提供了指定的圖片列表，直接使用
-        if image_paths:
-            if not image_paths:
-                raise ValueError("❌ 未選擇任何圖片")
+        # 如果提供了指定的圖片列表或文章文字，直接使用
+        if image_paths or passage_text:
+            image_paths = image_paths or []
         else:
             # 否則從資料夾收集所有圖片
             if not passage_image_folder:
@@ -77,62 +139,61 @@ class GPTClient:
             if not image_paths:
                 raise ValueError(f"❌ 資料夾 {passage_image_folder} 裡沒有圖片")
 
-        contents = [{"type": "text", "text": "請閱讀以下的英文文章圖片內容。"}]
+        # 相同圖片 + 相同問題 + 相同模型 → 直接使用快取結果
+        cache = get_vocab_cache()
+        cache_key = None
+        if cache:
+            cache_key = make_cache_key(
+                "passage",
+                [_file_digest(img) for img in image_paths],
+                hashlib.sha256(passage_text.encode("utf-8")).hexdigest() if passage_text else None,
+                question,
+                self.model,
+                prompt_version(PROMPT_EN_PASSAGE_VOCAB_QUESTIONS)
+            )
+            cached = cache.get(cache_key)
+            if cached:
+                logger.log(LogLevel.SUCCESS, f"✅ 使用快取的文章詞彙結果（{len(cached)} 個單字）")
+                return cached
+
+        if passage_text:
+            contents = [
+                {"type": "text", "text": "請閱讀以下的英文文章內容。"},
+                {"type": "text", "text": passage_text},
+            ]
+            if image_paths:
+                contents.append({"type": "text", "text": "以及以下的英文文章圖片內容。"})
+        else:
+            contents = [{"type": "text", "text": "請閱讀以下的英文文章圖片內容。"}]
         for img in image_paths:
             contents.append({
                 "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{self._encode_image(img)}"}
+                "image_url": {"url": self._encode_image(img)}
             })
         
         contents.append({"type": "text", "text": question})
 
         logger.log(LogLevel.INFO, "生成中...")
 
-        res = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": contents}],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "vocab_list",
-                    "schema": {
-                        "type": "object",
-                        "additionalProperties": False,
-                        "properties": WORD_SCHEMA,
-                        "required": ["vocab"]
-                    },
-                    "strict": True
-                }
-            }
-        )
-
-        # 記錄 token 使用量
-        if hasattr(res, 'usage') and res.usage:
-            usage = res.usage
-            prompt_tokens = getattr(usage, 'prompt_tokens', 0)
-            completion_tokens = getattr(usage, 'completion_tokens', 0)
-            total_tokens = getattr(usage, 'total_tokens', 0)
-            logger.log(LogLevel.INFO, f"Token 使用量 - 輸入: {prompt_tokens}, 輸出: {completion_tokens}, 總計: {total_tokens}")
-        
+        res = self._create_vocab_completion(contents)
         raw = res.choices[0].message.content
         try:
             obj = json.loads(raw)       # 這裡一定是 object（因為 schema）
-            return obj.get("vocab", []) # 只回傳你要的 array
+            vocab_list = obj.get("vocab", []) # 只回傳你要的 array
+            if cache and vocab_list:
+                cache.set(cache_key, vocab_list)
+            return vocab_list
         except json.JSONDecodeError:
             logger.log(LogLevel.ERROR, f"GPT 回傳非合法 JSON，原始輸出：\n{raw}")
             return []
 
-    def vocab_from_words(self, words: List[str], prompt: str = PROMPT_EN_VOCAB):
+    def _create_vocab_completion(self, contents: list):
         """
-        給定單字清單，請 GPT 依 WORD_SCHEMA 產生完整詞彙資料（pos/meaning/例句）。
+        以 WORD_SCHEMA 呼叫 chat completion 並記錄 token 使用量
         """
-        words = [w.strip() for w in words if isinstance(w, str) and w.strip()]
-        if not words:
-            return []
-
         res = self.client.chat.completions.create(
             model=self.model,
-            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+            messages=[{"role": "user", "content": contents}],
             response_format={
                 "type": "json_schema",
                 "json_schema": {
@@ -154,18 +215,176 @@ class GPTClient:
             completion_tokens = getattr(usage, 'completion_tokens', 0)
             total_tokens = getattr(usage, 'total_tokens', 0)
             logger.log(LogLevel.INFO, f"Token 使用量 - 輸入: {prompt_tokens}, 輸出: {completion_tokens}, 總計: {total_tokens}")
-        
+        return res
+
+    def _with_retry(self, fn, description: str, gate: RateLimitGate):
+        """
+        執行 fn，遇到可重試的錯誤時以指數退避重試（最多 GPT_MAX_RETRIES 次）
+
+        收到 429 時會依 Retry-After 暫停 gate（同一個 API Key）的所有 GPT / TTS 請求，
+        其他使用者的 key 不受影響。
+        """
+        for attempt in range(GPT_MAX_RETRIES + 1):
+            gate.wait()
+            try:
+                return fn()
+            except retryable_errors() as e:
+                if attempt >= GPT_MAX_RETRIES:
+                    raise
+                delay = GPT_RETRY_BACKOFF * (2 ** attempt) + random.uniform(0, GPT_RETRY_BACKOFF)
+                from openai import RateLimitError
+
+                if isinstance(e, RateLimitError):
+                    # 依伺服器建議的等待時間暫停同一個 key 的所有請求
+                    delay = max(delay, _retry_after_seconds(e) or 0)
+                    gate.pause(delay)
+                logger.log(LogLevel.WARNING, f"{description} 失敗（{type(e).__name__}），{delay:.1f} 秒後重試（{attempt + 1}/{GPT_MAX_RETRIES}）")
+                time.sleep(delay)
+
+    def _vocab_batch(self, prompt: str) -> list[dict]:
+        """送出單一批次並解析結果（非法 JSON 會拋出 JSONDecodeError 以觸發重試）"""
+        res = self._create_vocab_completion([{"type": "text", "text": prompt}])
         raw = res.choices[0].message.content
         try:
-            obj = json.loads(raw)
-            return obj.get("vocab", [])
+            return json.loads(raw).get("vocab", [])
         except json.JSONDecodeError:
             logger.log(LogLevel.WARNING, f"⚠️ GPT 回傳非合法 JSON，原始輸出：\n{raw}")
+            raise
+
+    def vocab_from_words(self, words: List[str], prompt: str = PROMPT_EN_VOCAB, goal_prompt_section: str = "",
+                         source_lang: str = SOURCE_LANG, target_lang: str = TARGET_LANG,
+                         batch_size: int = GPT_BATCH_SIZE, max_concurrency: int = GPT_MAX_CONCURRENCY,
+                         progress=None):
+        """
+        給定單字清單，請 GPT 依 WORD_SCHEMA 產生完整詞彙資料（pos/meaning/例句）。
+
+        先查詢詞彙快取，只有未命中的單字才送給 GPT。未命中的單字會切成每批 batch_size 個，
+        以最多 max_concurrency 個併發請求送出，每批各自重試，最後依輸入順序合併。
+
+        :param prompt: 含 {vocab_list} 欄位的模板；若已是格式化完成的文字，則整份清單以單一請求送出（不使用快取）
+        :param progress: 進度回調函數，接收 (stage, done, total)
+        """
+        words = [w.strip() for w in words if isinstance(w, str) and w.strip()]
+        if not words:
             return []
 
-    def gen_voice(self, text: str):
+        if "{vocab_list}" not in prompt:
+            return self._run_vocab_batches([words], [prompt], max_concurrency, progress)[0]
+
+        # 每個單字的快取 key：(單字, 詞性提示, 語言, 學習目標, 模型, prompt 版本)
+        version = prompt_version(prompt)
+        keys = []
+        for w in words:
+            word, pos_hint = _split_pos_hint(w)
+            keys.append(make_cache_key("vocab", word, pos_hint, source_lang, target_lang, goal_prompt_section, self.model, version))
+
+        cache = get_vocab_cache()
+        entries = cache.get_many(keys) if cache else {}
+
+        # 未命中的單字（相同 key 只問一次）
+        miss_words = {}
+        for key, w in zip(keys, words):
+            if key not in entries and key not in miss_words:
+                miss_words[key] = w
+        logger.log(LogLevel.INFO, f"詞彙快取：命中 {len(words) - len(miss_words)} / {len(words)} 個單字")
+
+        extras = []
+        if miss_words:
+            miss_keys = list(miss_words)
+            batch_size = max(1, batch_size)
+            key_batches = [miss_keys[i:i + batch_size] for i in range(0, len(miss_keys), batch_size)]
+            prompts = [
+                prompt.format(
+                    goal_prompt_section=goal_prompt_section,
+                    source_language=source_lang,
+                    target_language=target_lang,
+                    vocab_list="\n".join(miss_words[key] for key in batch)
+                )
+                for batch in key_batches
+            ]
+            results = self._run_vocab_batches(
+                [[miss_words[key] for key in batch] for batch in key_batches],
+                prompts, max_concurrency, progress
+            )
+
+            fresh = {}
+            for batch, batch_result in zip(key_batches, results):
+                aligned, unmatched = self._align_batch([miss_words[key] for key in batch], batch_result)
+                for key, entry in zip(batch, aligned):
+                    if entry is not None:
+                        fresh[key] = entry
+                extras.extend(unmatched)
+            if cache:
+                cache.set_many(fresh)
+            entries.update(fresh)
+        elif progress:
+            progress("gpt", 1, 1)
+
+        return [entries[key] for key in keys if key in entries] + extras
+
+    @staticmethod
+    def _align_batch(batch_words: list[str], batch_result: list[dict]) -> tuple[list, list]:
+        """
+        將一批 GPT 結果對應回輸入單字
+
+        數量一致且每筆的 word 欄位都與同位置的輸入單字相同（不分大小寫）時依位置對應；
+        否則依 word 欄位比對，對應不到的結果不寫入快取（避免把釋義存到錯的單字底下）。
+        回傳 (每個輸入單字對應的結果或 None, 無法對應的結果)
         """
-        生成語音檔案
+        input_words = [_split_pos_hint(w)[0].strip().casefold() for w in batch_words]
+        result_words = [str(entry.get("word", "")).strip().casefold() for entry in batch_result]
+        if result_words == input_words:
+            return list(batch_result), []
+
+        by_word = {}
+        for word, entry in zip(result_words, batch_result):
+            by_word.setdefault(word, []).append(entry)
+        aligned = []
+        for word in input_words:
+            candidates = by_word.get(word)
+            aligned.append(candidates.pop(0) if candidates else None)
+        unmatched = [entry for candidates in by_word.values() for entry in candidates]
+        return aligned, unmatched
+
+    def _run_vocab_batches(self, batches: list[list[str]], prompts: list[str], max_concurrency: int, progress=None) -> list[list[dict]]:
+        """
+        以有上限的執行緒池併發送出各批次，回傳依批次順序排列的結果
+        """
+        total = len(batches)
+        results: list[list[dict]] = [[] for _ in batches]
+        logger.log(LogLevel.INFO, f"呼叫 GPT：{sum(len(b) for b in batches)} 個單字，分為 {total} 批")
+        if progress:
+            progress("gpt", 0, total)
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, total))) as executor:
+            futures = {
+                executor.submit(self._with_retry, lambda p=p: self._vocab_batch(p), f"GPT 批次 {i + 1}/{total}", self.rate_limit_gate): i
+                for i, p in enumerate(prompts)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except retryable_errors() as e:
+                    # 重試用盡：保留其他批次的結果，並明確列出遺失的單字
+                    logger.log(LogLevel.ERROR, f"GPT 批次 {i + 1}/{total} 重試後仍失敗（{e}），遺失單字：{', '.join(batches[i])}")
+                if len(results[i]) < len(batches[i]):
+                    logger.log(LogLevel.WARNING, f"GPT 批次 {i + 1}/{total} 只回傳 {len(results[i])}/{len(batches[i])} 個單字")
+                done += 1
+                if progress:
+                    progress("gpt", done, total)
+
+        return results
+
+    def gen_voice(self, text: str, language: str = SOURCE_LANG) -> str:
+        """
+        生成語音檔案（串流寫入暫存檔後再原子性地改名）
+
+        先查詢跨會話共用的語音快取，命中時直接連結到會話目錄，不重新合成。
+
+        :param language: 文字語言（作為快取 key 的一部分）
+        :return: 語音檔路徑
         """
         from helpers.file_utils import safe_voice_filename
         
@@ -177,29 +396,78 @@ class GPTClient:
         # 檢查檔案是否已存在
         if os.path.exists(file_path):
             logger.log(LogLevel.INFO, f"⏭️  語音檔已存在，跳過生成: {file_path}")
-            return
-        
-        res = self.client.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",  # 可換: 'alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer', 'coral', 'verse', 'ballad', 'ash', 'sage', 'marin', and 'cedar'
-            input=text
-        )
-        with open(file_path, "wb") as f:
-            f.write(res.read())
+            return file_path
+
+        cache = get_audio_cache()
+        cache_key = make_cache_key("tts", _normalize_tts_text(text), TTS_MODEL, TTS_VOICE, language)
+        if cache is not None and cache.fetch(cache_key, file_path):
+            record_artifact(file_path)
+            logger.log(LogLevel.INFO, f"♻️  使用快取語音檔: {file_path}")
+            return file_path
+
+        tmp_path = f"{file_path}.{threading.get_ident()}.part"
+
+        def synthesize():
+            with self.client.audio.speech.with_streaming_response.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                input=text
+            ) as res:
+                res.stream_to_file(tmp_path)
+
+        try:
+            self._with_retry(synthesize, f"TTS「{text}」", self.rate_limit_gate)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        record_artifact(file_path)
+
+        if cache is not None:
+            try:
+                cache.put(cache_key, file_path)
+            except OSError as e:
+                logger.log(LogLevel.WARNING, f"語音檔寫入快取失敗：{e}")
 
         logger.log(LogLevel.SUCCESS, f"✅ 已生成語音檔: {file_path}")
+        return file_path
         
-    def gen_vocabs_voice(self, vocab_list: List[str]):
+    def gen_vocabs_voice(self, vocab_list: List[str], progress=None, max_concurrency: int = TTS_MAX_CONCURRENCY, language: str = SOURCE_LANG):
         """
-        將詞彙清單轉成語音檔案
+        將詞彙清單轉成語音檔案（以有上限的執行緒池併發生成）
+
+        :param progress: 進度回調函數，接收 (stage, done, total)
+        :param language: 詞彙語言（作為語音快取 key 的一部分）
+        :param max_concurrency: 同時進行中的 TTS 請求數量上限
         """
+        from helpers.file_utils import safe_voice_filename
+
         os.makedirs(self.voice_output_path, exist_ok=True)
-        count = 0
+        # 相同檔名的單字只生成一次，避免併發寫入同一個檔案
+        unique = {}
         for vocab in vocab_list:
             if vocab:
-                self.gen_voice(vocab)
+                unique.setdefault(safe_voice_filename(vocab), vocab)
+        vocabs = list(unique.values())
+        total = len(vocabs)
+        if not total:
+            return
+
+        count = 0
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, total))) as executor:
+            futures = {executor.submit(self.gen_voice, vocab, language): vocab for vocab in vocabs}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except retryable_errors() as e:
+                    # 重試用盡：略過此單字（打包時會跳過不存在的音檔）
+                    failed.append(futures[future])
+                    logger.log(LogLevel.ERROR, f"語音檔生成失敗：{futures[future]}（{e}）")
                 count += 1
-        logger.log(LogLevel.SUCCESS, f"已生成 {count} 個語音檔")
+                if progress:
+                    progress("tts", count, total)
+        logger.log(LogLevel.SUCCESS, f"已生成 {count - len(failed)} 個語音檔")
     
     def generate_vocab_list(self, prompt: str = PROMPT_AI_GENERATE):
         """
@@ -213,32 +481,7 @@ class GPTClient:
         """
         logger.log(LogLevel.INFO, "正在生成單字...")
         
-        res = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "vocab_list",
-                    "schema": {
-                        "type": "object",
-                        "additionalProperties": False,
-                        "properties": WORD_SCHEMA,
-                        "required": ["vocab"]
-                    },
-                    "strict": True
-                }
-            },
-        )
-        
-        # 記錄 token 使用量
-        if hasattr(res, 'usage') and res.usage:
-            usage = res.usage
-            prompt_tokens = getattr(usage, 'prompt_tokens', 0)
-            completion_tokens = getattr(usage, 'completion_tokens', 0)
-            total_tokens = getattr(usage, 'total_tokens', 0)
-            logger.log(LogLevel.INFO, f"Token 使用量 - 輸入: {prompt_tokens}, 輸出: {completion_tokens}, 總計: {total_tokens}")
-        
+        res = self._create_vocab_completion([{"type": "text", "text": prompt}])
         raw = res.choices[0].message.content
         try:
             obj = json.loads(raw)
@@ -265,9 +508,11 @@ class GPTClient:
         if filename_hint:
             ts = datetime.now().strftime('%Y%m%d_%H%M%S')
             base = f"{slugify(filename_hint)}-{ts}.json"
+            os.makedirs(self.transed_vocab_path, exist_ok=True)
             out_path = os.path.join(self.transed_vocab_path, base)
             with open(out_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            record_artifact(out_path)
             logger.log(LogLevel.SUCCESS, f"已輸出 JSON：{out_path}")
             return base
 
@@ -289,9 +534,11 @@ class GPTClient:
         parts.append(ts)
 
         filename = "-".join([p for p in parts if p]) + ".json"
+        os.makedirs(self.transed_vocab_path, exist_ok=True)
         out_path = os.path.join(self.transed_vocab_path, filename)
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        record_artifact(out_path)
         logger.log(LogLevel.SUCCESS, f"已輸出 JSON：{out_path}")
         return filename
 
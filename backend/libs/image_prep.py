@@ -0,0 +1,110 @@
+"""
+文章圖片前處理
+
+送進 vision 模型前先縮小尺寸、轉灰階並重新壓縮成 JPEG，減少請求大小與 token 用量。
+編碼結果依圖片內容雜湊快取在記憶體中，同一張圖片重複送出時不必再處理。
+未安裝 Pillow 時直接使用原始檔案（依檔頭判斷 MIME 類型）。
+"""
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from .config import IMAGE_MAX_EDGE, IMAGE_GRAYSCALE, IMAGE_JPEG_QUALITY, IMAGE_CACHE_SIZE
+from .logger import LogLevel, get_logger
+
+logger = get_logger()
+
+# 檔頭 -> MIME 類型
+_MAGIC_MIME = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def sniff_mime(data: bytes) -> str:
+    """依檔頭判斷圖片 MIME 類型（無法判斷時視為 JPEG）"""
+    for magic, mime in _MAGIC_MIME:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+
+def _recompress(data: bytes, max_edge: int, grayscale: bool, quality: int) -> tuple[str, bytes]:
+    """縮圖並重新壓縮，回傳 (MIME, bytes)；結果沒有比較小時保留原圖"""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return sniff_mime(data), data
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            if max_edge and max(img.size) > max_edge:
+                img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            img = img.convert("L" if grayscale else "RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=quality, optimize=True)
+    except (OSError, ValueError) as e:
+        logger.log(LogLevel.WARNING, f"圖片前處理失敗，改用原圖：{e}")
+        return sniff_mime(data), data
+
+    out = buf.getvalue()
+    if len(out) >= len(data):
+        return sniff_mime(data), data
+    return "image/jpeg", out
+
+
+class ImagePreprocessor:
+    """
+    圖片前處理器（含 LRU 快取）
+
+    快取 key 為圖片內容雜湊加上處理參數，值為 data URL。
+    """
+
+    def __init__(self, max_edge: int = IMAGE_MAX_EDGE, grayscale: bool = IMAGE_GRAYSCALE,
+                 quality: int = IMAGE_JPEG_QUALITY, cache_size: int = IMAGE_CACHE_SIZE):
+        self.max_edge = max_edge
+        self.grayscale = grayscale
+        self.quality = quality
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def data_url(self, image_path: str) -> str:
+        """讀取圖片並回傳前處理後的 data URL"""
+        with open(image_path, "rb") as f:
+            data = f.read()
+        return self.data_url_from_bytes(data)
+
+    def data_url_from_bytes(self, data: bytes) -> str:
+        key = f"{hashlib.sha256(data).hexdigest()}:{self.max_edge}:{int(self.grayscale)}:{self.quality}"
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        mime, out = _recompress(data, self.max_edge, self.grayscale, self.quality)
+        url = f"data:{mime};base64,{base64.b64encode(out).decode('ascii')}"
+        logger.log(LogLevel.DEBUG, f"圖片前處理：{len(data)} -> {len(out)} bytes（{mime}）")
+
+        with self._lock:
+            self._cache[key] = url
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return url
+
+
+# 全域圖片前處理器實例
+_image_preprocessor = ImagePreprocessor()
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """取得全域圖片前處理器"""
+    return _image_preprocessor
@@ -103,6 +103,17 @@ class Logger:
         """設定是否預設輸出到 stdout"""
         self._default_output = enabled
     
+    def is_enabled_for(self, level: LogLevel) -> bool:
+        """
+        此級別的日誌是否會被記錄（迴圈中可先檢查，避免組出會被過濾掉的訊息）
+
+        Args:
+            level: 日誌級別
+        """
+        if self._min_level is None or level.value is None:
+            return True
+        return level._get_priority() >= self._min_level._get_priority()
+
     def log(self, level: LogLevel, msg: str):
         """
         記錄日誌
@@ -112,13 +123,8 @@ class Logger:
             msg: 訊息內容
         """
         # 如果設定了最小日誌級別，過濾低級別的日誌
-        if self._min_level is not None:
-            # 如果當前日誌級別的優先順序低於最小級別，則過濾
-            if level.value is not None:
-                level_priority = level._get_priority()
-                min_priority = self._min_level._get_priority()
-                if level_priority < min_priority:
-                    return
+        if not self.is_enabled_for(level):
+            return
         
         # 調用所有註冊的回調函數
         for callback in self._callbacks:
@@ -0,0 +1,118 @@
+"""
+OpenAI 客戶端註冊表
+
+每個 OpenAI 客戶端都有自己的 HTTP 連線池。同一個 API Key 在行程內共用同一個客戶端，
+流程中先後的 GPT 與 TTS 請求就能沿用已建立的 keep-alive 連線，不必每次重新握手。
+
+- 以 API Key 的雜湊為 key（不保存明文 key 作為索引）
+- 每個 API Key 有自己的限流閘門：某個使用者收到 429 只會暫停使用同一個 key 的請求
+- 超過 idle_timeout 秒未使用的客戶端會被移除
+- 數量超過 max_clients 時移除最久未使用的客戶端
+
+被移除的客戶端不會主動關閉（可能仍有流程在使用），沒有引用後由 GC 回收連線。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from .config import OPENAI_CLIENT_MAX, OPENAI_CLIENT_IDLE_TIMEOUT
+from .logger import LogLevel, get_logger
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = get_logger()
+
+class RateLimitGate:
+    """
+    同一個 API Key 共用的限流閘門
+
+    任何請求收到 429 時設定暫停時間，使用同一個 key 的其他執行緒在送出下一個請求前會先等待，
+    避免併發請求在限流期間持續撞牆。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until = 0.0
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + seconds)
+
+    def wait(self):
+        with self._lock:
+            remaining = self._until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class OpenAIClientRegistry:
+    """依 API Key 共用 OpenAI 客戶端與限流閘門"""
+
+    def __init__(self, max_clients: int = OPENAI_CLIENT_MAX, idle_timeout: int = OPENAI_CLIENT_IDLE_TIMEOUT):
+        self.max_clients = max(1, max_clients)
+        self.idle_timeout = idle_timeout
+        # key_id -> (客戶端, 限流閘門, 最後使用時間)
+        self._clients: OrderedDict[str, tuple["OpenAI", RateLimitGate, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def get(self, api_key: str) -> "OpenAI":
+        """取得（或建立）此 API Key 的客戶端"""
+        return self.get_with_gate(api_key)[0]
+
+    def get_with_gate(self, api_key: str) -> tuple["OpenAI", RateLimitGate]:
+        """取得（或建立）此 API Key 的客戶端與限流閘門"""
+        key_id = self._key_id(api_key)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle_locked(now)
+            entry = self._clients.get(key_id)
+            if entry is not None:
+                client, gate, _ = entry
+                self._clients.move_to_end(key_id)
+            else:
+                # openai 套件匯入較慢，第一次建立客戶端時才匯入
+                from openai import OpenAI
+
+                client = OpenAI(api_key=api_key)
+                gate = RateLimitGate()
+                logger.log(LogLevel.DEBUG, f"建立 OpenAI 客戶端（key={key_id[:8]}）")
+            self._clients[key_id] = (client, gate, now)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return client, gate
+
+    def _evict_idle_locked(self, now: float):
+        if self.idle_timeout <= 0:
+            return
+        cutoff = now - self.idle_timeout
+        # OrderedDict 依最近使用排序，最舊的在前面
+        while self._clients:
+            key_id, (_, _, last_used) = next(iter(self._clients.items()))
+            if last_used >= cutoff:
+                break
+            del self._clients[key_id]
+
+    def clear(self):
+        """移除所有客戶端"""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'clients': len(self._clients), 'maxClients': self.max_clients}
+
+
+# 全域客戶端註冊表實例
+_openai_registry = OpenAIClientRegistry()
+
+
+def get_openai_registry() -> OpenAIClientRegistry:
+    """取得全域 OpenAI 客戶端註冊表"""
+    return _openai_registry
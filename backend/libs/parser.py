@@ -1,13 +1,128 @@
-from docx import Document
+# pandas、PyMuPDF（fitz）、python-docx 匯入較慢，在解析對應格式時才匯入
 from .gpt import GPTClient
 import re
-import fitz
-import pandas as pd
-from .config import PASSAGE_IMAGE_DIR
+from typing import TYPE_CHECKING
+from .config import PASSAGE_IMAGE_DIR, PDF_TEXT_MIN_CHARS, EXCEL_CHUNK_ROWS
 from .logger import LogLevel, get_logger
+from .session_index import record_artifact
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = get_logger()
 
+# Excel / CSV 欄位 -> 可接受的表頭名稱（依優先順序）
+EXCEL_ALIAS_MAP = {
+    "word": ("word", "單字", "vocab", "詞彙"),
+    "pos": ("pos", "詞性"),
+    "meaning": ("meaning", "意思", "中文意思"),
+    "synonyms": ("synonyms", "同義詞"),
+    "ex1_ori": ("ex1_ori", "例句1", "例句1英文", "例句一英文"),
+    "ex1_trans": ("ex1_trans", "例句1翻譯", "例句1中文", "例句一中文"),
+    "ex2_ori": ("ex2_ori", "例句2", "例句2英文", "例句二英文"),
+    "ex2_trans": ("ex2_trans", "例句2翻譯", "例句2中文", "例句二中文"),
+    "audio": ("audio", "語音", "音檔"),
+}
+
+VOCAB_FIELDS = list(EXCEL_ALIAS_MAP)
+
+
+def _normalize_column(name) -> str:
+    return str(name).strip().lower()
+
+
+# Word 單字段落：「1. word ... 中文：... 詞性：...」
+# 先確認開頭是編號單字再向後找中文與詞性，一次比對取出三個欄位
+_DOCX_ENTRY_RE = re.compile(
+    r'^(?=\d+\.\s+\w)'
+    r'(?=(?:[\s\S]*?中文：(?P<chinese>.+))?)'
+    r'(?=(?:[\s\S]*?詞性：(?P<pos>.+))?)'
+    r'\d+\.\s+(?P<word>\w+)'
+)
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# 段落內容元素 -> 對應文字（與 python-docx 的 Paragraph.text 相同）
+_W_RUN_CONTENT = {f"{_W}tab": "\t", f"{_W}ptab": "\t", f"{_W}cr": "\n", f"{_W}noBreakHyphen": "-"}
+
+
+def _paragraph_text(p) -> str:
+    """
+    直接走訪 w:p 的子元素取出段落文字
+
+    結果與 python-docx 的 Paragraph.text 相同，但不對每個段落與 run 執行 XPath。
+    """
+    parts = []
+    for child in p:
+        if child.tag == f"{_W}r":
+            runs = (child,)
+        elif child.tag == f"{_W}hyperlink":
+            runs = [r for r in child if r.tag == f"{_W}r"]
+        else:
+            continue
+        for run in runs:
+            for el in run:
+                tag = el.tag
+                if tag == f"{_W}t":
+                    parts.append(el.text or "")
+                elif tag == f"{_W}br":
+                    if el.get(f"{_W}type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif tag in _W_RUN_CONTENT:
+                    parts.append(_W_RUN_CONTENT[tag])
+    return "".join(parts)
+
+
+def _has_numbering(para) -> bool:
+    """段落是否帶有編號 / 項目符號屬性（w:pPr/w:numPr）"""
+    pPr = para._p.pPr
+    return pPr is not None and pPr.numPr is not None
+
+
+_VOCAB_COLUMN_ALIASES = {_normalize_column(alias) for aliases in EXCEL_ALIAS_MAP.values() for alias in aliases}
+
+
+def _is_vocab_column(name) -> bool:
+    """usecols 用：只讀取別名對應到的欄位"""
+    return _normalize_column(name) in _VOCAB_COLUMN_ALIASES
+
+
+def _resolve_vocab_columns(columns) -> dict:
+    """
+    依別名優先順序對應欄位，回傳 {field: 原始欄位名稱}
+
+    Raises:
+        ValueError: 找不到 word 欄位
+    """
+    normalized_columns = {}
+    for col in columns:
+        normalized_columns.setdefault(_normalize_column(col), col)
+
+    column_mapping = {}
+    for field, aliases in EXCEL_ALIAS_MAP.items():
+        for alias in aliases:
+            normalized_alias = _normalize_column(alias)
+            if normalized_alias in normalized_columns:
+                column_mapping[field] = normalized_columns[normalized_alias]
+                break
+
+    if "word" not in column_mapping:
+        raise ValueError("Excel 檔案缺少必需欄位：word（或對應同義名稱）。")
+    return column_mapping
+
+
+def _normalize_vocab_frame(df: "pd.DataFrame", column_mapping: dict) -> list[dict]:
+    """以整欄運算補空值、去除空白並過濾沒有單字的列"""
+    import pandas as pd
+
+    out = pd.DataFrame({
+        field: df[column_mapping[field]].fillna("").astype(str).str.strip() if field in column_mapping else ""
+        for field in VOCAB_FIELDS
+    }, index=df.index)
+    out = out[out["word"] != ""]
+    return out.to_dict("records")
+
+
 class Parser:
     def __init__(self, ori_language: str = "en", trans_language: str = "zh", api_key: str = None, session_dir: str = None):
         # 延遲初始化 GPTClient，只有在需要時才創建
@@ -33,8 +148,8 @@ class Parser:
     def execute(self, *args, **kwargs):
 
         if kwargs.get("parser_type") == "passage":
-            self.parse_pdf(kwargs.get("pdf_path"))
-            vocab_list = self.gpt_client.passage_with_question(self.passage_image_path)
+            passage_text = self.parse_pdf(kwargs.get("pdf_path"))
+            vocab_list = self.gpt_client.passage_with_question(self.passage_image_path, passage_text=passage_text)
             logger.log(LogLevel.DEBUG, f"vocab_list: {vocab_list}")
             return vocab_list
 
@@ -46,28 +161,40 @@ class Parser:
         
 
     def parse_word(self, path: str):
+        from docx import Document
+
         doc = Document(path)
+        return self.parse_word_paragraphs(doc.paragraphs)
+
+    def parse_word_paragraphs(self, paragraphs):
+        """
+        解析 Word 單字本的段落，回傳 [{word, chinese, pos, examples}]
 
+        單字段落以一個預先編譯的正規表示式同時取出單字、中文與詞性；
+        帶項目符號且恰為兩行的段落視為中英例句。
+        """
         current_word = None
         word_data = {}
         all_words = []
+        verbose = logger.is_enabled_for(LogLevel.DEBUG)
 
-        for para in doc.paragraphs:
-            text = para.text.strip()
+        for para in paragraphs:
+            text = _paragraph_text(para._p).strip()
             if not text:
                 continue
 
-            logger.log(LogLevel.DEBUG, f"\n =====> 原始段落: {text}")
-            logger.log(LogLevel.DISPLAY, "-"*80)
+            if verbose:
+                logger.log(LogLevel.DEBUG, f"\n =====> 原始段落: {text}")
+                logger.log(LogLevel.DISPLAY, "-"*80)
 
-            # 1️⃣ 檢查是否為新單字段落
-            found_word = self._find_docx_word(text)
-            if found_word:
+            # 1️⃣ 檢查是否為新單字段落（同時取出中文與詞性）
+            entry = _DOCX_ENTRY_RE.match(text)
+            if entry:
                 # 儲存前一個單字資料
                 if current_word and word_data:
                     all_words.append(word_data)
 
-                current_word = found_word
+                current_word = entry.group("word")
                 word_data = {
                     "word": current_word,
                     "chinese": "",
@@ -76,26 +203,23 @@ class Parser:
                 }
                 logger.log(LogLevel.INFO, f"找到新單字: {current_word}")
 
-
-                chinese = self._find_docx_chinese(text)
-
-                if chinese and word_data:
+                chinese = (entry.group("chinese") or "").strip()
+                if chinese:
                     word_data["chinese"] = chinese
                     logger.log(LogLevel.INFO, f"中文解釋: {chinese}")
 
-
-                pos = self._find_docx_pos(text)
-                if pos and word_data:
+                pos = (entry.group("pos") or "").strip()
+                if pos:
                     word_data["pos"] = pos
                     logger.log(LogLevel.INFO, f"詞性: {pos}")
 
-
             # 4️⃣ Bullet 例句（中英對照）
-            en, zh = self._find_docx_bulleted_list(para)
-            if en and zh and word_data:
-                word_data["examples"].append({"en": en, "zh": zh})
-                logger.log(LogLevel.INFO, f"📍Bullet例句: EN='{en}' / ZH='{zh}'")
-                continue
+            if word_data and _has_numbering(para):
+                lines = [line.strip() for line in text.splitlines() if line.strip()]
+                if len(lines) == 2:
+                    en, zh = lines
+                    word_data["examples"].append({"en": en, "zh": zh})
+                    logger.log(LogLevel.INFO, f"📍Bullet例句: EN='{en}' / ZH='{zh}'")
 
         # 最後一個單字加進來
         if current_word and word_data:
@@ -104,154 +228,157 @@ class Parser:
         logger.log(LogLevel.SUCCESS, f"\n 總共解析 {len(all_words)} 個單字")
         return all_words
     
-    def _find_docx_bulleted_list(self, para):
-        """判斷是否為 bullet list 並拆中英"""
-        is_bullet = bool(para._element.xpath(".//w:numPr"))
-        if is_bullet:
-            lines = [line.strip() for line in para.text.splitlines() if line.strip()]
-            if len(lines) == 2:
-                en, zh = lines
-                return en, zh
-        return None, None
-
-    def _find_docx_pos(self, text: str):
-        pos_match = re.search(r'詞性：(.+)', text)
-        return pos_match.group(1).strip() if pos_match else None
-
-    def _find_docx_chinese(self, text: str):
-        chinese_match = re.search(r'中文：(.+)', text)
-        return chinese_match.group(1).strip() if chinese_match else None
-
-    def _find_docx_word(self, text: str):
-        word_match = re.match(r'^(\d+)\.\s+(\w+)', text)
-        return word_match.group(2) if word_match else None
-
-    def parse_pdf_text(self, path: str):
-        """解析 pdf 的文字"""
-        ...
+    def passage_text_path(self, pdf_path: str) -> str:
+        """文字層 PDF 擷取出的文章文字檔路徑（{PDF 名稱}_passage.txt）"""
+        import os
+        from pathlib import Path
+        from helpers.file_utils import slugify
 
-    def parse_pdf(self, path: str):
-        # 先嘗試文字；若無文字再抽圖
-        text_found = False
-        try:
-            import pdfplumber
-            with pdfplumber.open(path) as pdf:
-                for p in pdf.pages:
-                    if p.extract_text():
-                        text_found = True
-                        break
-        except Exception:
-            text_found = False
-
-        if text_found:
-            # TODO: 之後如需直接以文字進 LLM，可在此實作
-            return
-        self.parse_pdf_image(path)
+        return os.path.join(self.passage_image_path, f"{slugify(Path(pdf_path).stem)}_passage.txt")
+
+    def parse_pdf_text(self, path: str, doc=None) -> str:
+        """解析 pdf 的文字（單次走訪所有頁面），回傳各頁文字以空行串接"""
+        if doc is None:
+            import fitz
+
+            with fitz.open(path) as doc:
+                return self.parse_pdf_text(path, doc)
+
+        pages = [page.get_text("text").strip() for page in doc]
+        return "\n\n".join(text for text in pages if text)
 
-    def parse_pdf_image(self, pdf_path: str):
-        """解析 pdf 的圖片"""
+    def parse_pdf(self, path: str) -> str | None:
+        """
+        解析 PDF：有文字層時直接取文字，否則抽取圖片
+
+        Returns:
+            str | None: 文字層 PDF 回傳文章文字（同時存成 {PDF 名稱}_passage.txt）；
+                        掃描檔回傳 None，圖片會存到 passage_image_path
+        """
         import os
+        import fitz
+
+        with fitz.open(path) as doc:
+            text = self.parse_pdf_text(path, doc)
+            if len(text) >= PDF_TEXT_MIN_CHARS:
+                os.makedirs(self.passage_image_path, exist_ok=True)
+                text_path = self.passage_text_path(path)
+                with open(text_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                record_artifact(text_path)
+                logger.log(LogLevel.SUCCESS, f"PDF 含文字層，已擷取 {len(text)} 字：{os.path.basename(text_path)}")
+                return text
+
+            self.parse_pdf_image(path, doc)
+        return None
+
+    def parse_pdf_image(self, pdf_path: str, doc=None) -> list[str]:
+        """
+        解析 pdf 的圖片（頁數多時併發擷取，重複與過小的圖片會略過）
+
+        Returns:
+            list[str]: 儲存的圖片路徑（PDF 名稱 + p1, p2, p3...）
+        """
         from pathlib import Path
-        
-        os.makedirs(self.passage_image_path, exist_ok=True)
+        from helpers.file_utils import slugify
+        from .pdf_images import extract_images
 
-        # 取得 PDF 檔案名稱（不含副檔名）
-        pdf_name = Path(pdf_path).stem
-        
-        doc = fitz.open(pdf_path)
-        image_counter = 1  # 圖片計數器，從 p1 開始
-        
-        for page_index in range(len(doc)):
-            page = doc[page_index]
-            images = page.get_images(full=True)
-            logger.log(LogLevel.INFO, f"第 {page_index + 1} 頁包含 {len(images)} 張圖片")
-
-            for image_index, img in enumerate(images):
-                xref = img[0]  # 取出圖像的 XREF ID
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-
-                # 儲存圖片：PDF 名稱 + p1, p2, p3...
-                from helpers.file_utils import slugify
-                safe_pdf_name = slugify(pdf_name)
-                image_filename = f"{safe_pdf_name}_p{image_counter}.{image_ext}"
-                out_path = os.path.join(self.passage_image_path, image_filename)
-                with open(out_path, "wb") as f:
-                    f.write(image_bytes)
-
-                logger.log(LogLevel.SUCCESS, f"儲存圖片：{image_filename}")
-                image_counter += 1  # 遞增計數器
+        return extract_images(pdf_path, self.passage_image_path, slugify(Path(pdf_path).stem), doc=doc)
 
     def parse_excel(self, path: str):
+        """
+        讀取 Excel / CSV 詞彙表，回傳 [{word, pos, meaning, ...}]
+
+        只讀取別名對應到的欄位，清理與過濾以整欄運算完成。
+        """
         if not path:
             raise ValueError("請提供 Excel 檔案路徑。")
 
+        import pandas as pd
+
         try:
             if path.lower().endswith(".csv"):
-                df = pd.read_csv(path)
+                df = pd.read_csv(path, usecols=_is_vocab_column, dtype=str)
             else:
-                df = pd.read_excel(path)
+                df = pd.read_excel(path, usecols=_is_vocab_column, dtype=str)
         except Exception as e:
             raise ValueError(f"無法讀取 Excel：{e}") from e
 
+        column_mapping = _resolve_vocab_columns(df.columns)
         if df.empty:
             return []
+        return _normalize_vocab_frame(df, column_mapping)
 
-        alias_map = {
-            "word": ("word", "單字", "vocab", "詞彙"),
-            "pos": ("pos", "詞性"),
-            "meaning": ("meaning", "意思", "中文意思"),
-            "synonyms": ("synonyms", "同義詞"),
-            "ex1_ori": ("ex1_ori", "例句1", "例句1英文", "例句一英文"),
-            "ex1_trans": ("ex1_trans", "例句1翻譯", "例句1中文", "例句一中文"),
-            "ex2_ori": ("ex2_ori", "例句2", "例句2英文", "例句二英文"),
-            "ex2_trans": ("ex2_trans", "例句2翻譯", "例句2中文", "例句二中文"),
-            "audio": ("audio", "語音", "音檔"),
-        }
-
-        def normalize(name: str) -> str:
-            return str(name).strip().lower()
-
-        normalized_columns = {normalize(col): col for col in df.columns}
-
-        column_mapping = {}
-        for field, aliases in alias_map.items():
-            for alias in aliases:
-                normalized_alias = normalize(alias)
-                if normalized_alias in normalized_columns:
-                    column_mapping[field] = normalized_columns[normalized_alias]
-                    break
+    def iter_excel_chunks(self, path: str, chunk_rows: int = EXCEL_CHUNK_ROWS):
+        """
+        分批讀取 Excel / CSV 詞彙表，每次產生最多 chunk_rows 筆 [{word, pos, meaning, ...}]
 
-        if "word" not in column_mapping:
-            raise ValueError("Excel 檔案缺少必需欄位：word（或對應同義名稱）。")
-
-        vocab_fields = [
-            "word",
-            "pos",
-            "meaning",
-            "synonyms",
-            "ex1_ori",
-            "ex1_trans",
-            "ex2_ori",
-            "ex2_trans",
-            "audio",
-        ]
-
-        vocab_list = []
-        for _, row in df.iterrows():
-            word = row.get(column_mapping["word"], "")
-            if pd.isna(word) or not str(word).strip():
-                continue
+        CSV 以 pandas 的 chunksize 逐批讀取，.xlsx 以 openpyxl 唯讀模式逐列讀取，
+        記憶體用量與檔案大小無關；舊版 .xls 只能整份讀取後再分批。
+        """
+        if not path:
+            raise ValueError("請提供 Excel 檔案路徑。")
 
-            entry = {}
-            for field in vocab_fields:
-                source_col = column_mapping.get(field)
-                value = row.get(source_col, "") if source_col else ""
-                entry[field] = "" if pd.isna(value) else str(value).strip()
-            vocab_list.append(entry)
+        lower_path = path.lower()
+        if lower_path.endswith((".xlsx", ".xlsm")):
+            yield from self._iter_xlsx_chunks(path, chunk_rows)
+            return
+        if not lower_path.endswith(".csv"):
+            vocab_list = self.parse_excel(path)
+            for i in range(0, len(vocab_list), chunk_rows):
+                yield vocab_list[i:i + chunk_rows]
+            return
 
-        return vocab_list
+        import pandas as pd
+
+        try:
+            reader = pd.read_csv(path, usecols=_is_vocab_column, dtype=str, chunksize=chunk_rows)
+        except Exception as e:
+            raise ValueError(f"無法讀取 Excel：{e}") from e
+
+        column_mapping = None
+        with reader:
+            for df in reader:
+                if column_mapping is None:
+                    column_mapping = _resolve_vocab_columns(df.columns)
+                chunk = _normalize_vocab_frame(df, column_mapping)
+                if chunk:
+                    yield chunk
+
+    def _iter_xlsx_chunks(self, path: str, chunk_rows: int):
+        """以 openpyxl 唯讀模式逐列讀取第一個工作表，每 chunk_rows 列整理一次"""
+        from itertools import islice
+        import pandas as pd
+        from openpyxl import load_workbook
+
+        try:
+            wb = load_workbook(path, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"無法讀取 Excel：{e}") from e
+
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            # 只保留別名對應到的欄位（同名欄位取第一個，與 pandas 讀取結果一致）
+            indexes, names = [], []
+            for i, name in enumerate(header):
+                if name is not None and _is_vocab_column(name) and str(name) not in names:
+                    indexes.append(i)
+                    names.append(str(name))
+            column_mapping = _resolve_vocab_columns(names)
+
+            while True:
+                batch = [
+                    [row[i] if i < len(row) else None for i in indexes]
+                    for row in islice(rows, chunk_rows)
+                ]
+                if not batch:
+                    break
+                chunk = _normalize_vocab_frame(pd.DataFrame(batch, columns=names, dtype=object), column_mapping)
+                if chunk:
+                    yield chunk
+        finally:
+            wb.close()
 
     def parse_vocab_txt(self, vocab_path: str):
         """
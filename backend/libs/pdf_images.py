@@ -0,0 +1,145 @@
+"""
+PDF 圖片擷取
+
+- 依頁面區段切分，頁數多時以子行程併發擷取（PyMuPDF 的文件物件不能跨執行緒共用）
+- 同一個 xref（每頁重複的 logo、頁首）只擷取一次，內容相同的圖片以雜湊去重
+- 過小的裝飾圖片（尺寸或檔案大小低於門檻）直接略過
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import PDF_IMAGE_WORKERS, PDF_IMAGE_PARALLEL_MIN_PAGES, PDF_IMAGE_MIN_EDGE, PDF_IMAGE_MIN_BYTES
+from .logger import LogLevel, get_logger
+from .session_index import record_artifact
+
+logger = get_logger()
+
+
+def extract_page_range(pdf_path: str, start: int, end: int, work_dir: str,
+                       min_edge: int = PDF_IMAGE_MIN_EDGE, min_bytes: int = PDF_IMAGE_MIN_BYTES, doc=None) -> list[dict]:
+    """
+    擷取 [start, end) 頁的圖片，以內容雜湊為檔名寫入 work_dir
+
+    可在子行程中執行（只回傳中繼資料，不經由行程間傳遞圖片內容）。
+
+    Returns:
+        list[dict]: 依頁面順序的 {page, xref, sha256, ext, path}
+    """
+    if doc is None:
+        # PyMuPDF 匯入較慢，實際擷取時才匯入（子行程中同樣在這裡匯入）
+        import fitz
+
+        with fitz.open(pdf_path) as doc:
+            return extract_page_range(pdf_path, start, end, work_dir, min_edge, min_bytes, doc)
+
+    results = []
+    seen_xrefs = set()
+    for page_index in range(start, end):
+        for img in doc[page_index].get_images(full=True):
+            xref, width, height = img[0], img[2], img[3]
+            if xref in seen_xrefs:
+                continue
+            seen_xrefs.add(xref)
+            if min(width, height) < min_edge:
+                continue
+
+            base_image = doc.extract_image(xref)
+            image_bytes = base_image["image"]
+            if len(image_bytes) < min_bytes:
+                continue
+
+            digest = hashlib.sha256(image_bytes).hexdigest()
+            path = os.path.join(work_dir, f"{digest}.{base_image['ext']}")
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{os.getpid()}.part"
+                with open(tmp_path, "wb") as f:
+                    f.write(image_bytes)
+                os.replace(tmp_path, path)
+            results.append({
+                'page': page_index,
+                'xref': xref,
+                'sha256': digest,
+                'ext': base_image["ext"],
+                'path': path,
+            })
+    return results
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """延遲建立擷取用的行程池（使用 spawn，避免 fork 帶著執行緒狀態）"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    """關閉擷取用的行程池"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_images(pdf_path: str, out_dir: str, name_prefix: str, doc=None) -> list[str]:
+    """
+    擷取 PDF 中的圖片並去重，依頁面順序存成 {name_prefix}_p1.ext、_p2.ext...
+
+    Args:
+        doc: 已開啟的 fitz 文件（頁數少時直接使用，不重新開檔）
+
+    Returns:
+        list[str]: 儲存的圖片路徑
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=".extract-", dir=out_dir)
+    try:
+        if doc is not None:
+            page_count = len(doc)
+        else:
+            import fitz
+
+            with fitz.open(pdf_path) as tmp_doc:
+                page_count = len(tmp_doc)
+        workers = max(1, PDF_IMAGE_WORKERS)
+        if workers > 1 and page_count >= PDF_IMAGE_PARALLEL_MIN_PAGES:
+            step = -(-page_count // workers)
+            pool = _get_pdf_pool()
+            futures = [
+                pool.submit(extract_page_range, pdf_path, start, min(start + step, page_count), work_dir)
+                for start in range(0, page_count, step)
+            ]
+            found = [item for future in futures for item in future.result()]
+        else:
+            found = extract_page_range(pdf_path, 0, page_count, work_dir, doc=doc)
+
+        saved = []
+        seen_hashes = set()
+        for item in found:
+            if item['sha256'] in seen_hashes:
+                continue
+            seen_hashes.add(item['sha256'])
+            out_path = os.path.join(out_dir, f"{name_prefix}_p{len(saved) + 1}.{item['ext']}")
+            os.replace(item['path'], out_path)
+            saved.append(out_path)
+            logger.log(LogLevel.SUCCESS, f"儲存圖片：{os.path.basename(out_path)}（第 {item['page'] + 1} 頁）")
+
+        record_artifact(*saved)
+        logger.log(LogLevel.INFO, f"共 {page_count} 頁，擷取 {len(found)} 張圖片，去重後 {len(saved)} 張")
+        return saved
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,391 @@
+"""
+Session 目錄索引
+
+每個 session 目錄下的 .index.sqlite 記錄所有產出檔案（路徑、角色、類型、大小、雜湊、修改時間），
+使用遠端儲存後端時另外記錄本機副本對應的物件版本（etag）。
+寫入檔案時由寫入端呼叫 record_artifact 更新索引；列出檔案與查詢最新的卡片 / 圖片 / .apkg
+直接查索引，不必對整個目錄 rglob + stat（session 有上千個語音檔時尤其明顯）。
+
+- 角色（role）為 session 底下的第一層目錄：source / orig / edited
+- 索引不存在（舊的 session）或損毀時，掃描一次目錄重建
+- 查詢最新檔案時會確認檔案仍存在，已被刪除的項目直接從索引移除
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+
+from .config import OUTPUTS_DIR
+from .logger import LogLevel, get_logger
+from .storage import publish_artifact
+
+logger = get_logger()
+
+INDEX_FILENAME = ".index.sqlite"
+
+# session 底下會被索引的第一層目錄
+ROLES = ("source", "orig", "edited")
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+_KINDS = {
+    ".mp3": "audio",
+    ".apkg": "apkg",
+    ".json": "cards",
+    ".txt": "text",
+    ".pdf": "document",
+    ".docx": "document",
+    ".xlsx": "document",
+    ".xlsm": "document",
+    ".csv": "document",
+    **{suffix: "image" for suffix in IMAGE_SUFFIXES},
+}
+
+# 同時保持開啟的 session 索引數量
+_MAX_OPEN_INDEXES = 64
+
+
+def artifact_kind(suffix: str) -> str:
+    """依副檔名判斷檔案類型"""
+    return _KINDS.get(suffix.lower(), "other")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_index_file(name: str) -> bool:
+    # 包含 SQLite 的 -wal / -shm / -journal 檔
+    return name.startswith(INDEX_FILENAME)
+
+
+class SessionIndex:
+    """
+    單一 session 目錄的檔案索引
+
+    Args:
+        session_dir: session 根目錄（outputs/{session_id}）
+    """
+
+    def __init__(self, session_dir):
+        self.session_dir = Path(session_dir).resolve()
+        self.path = self.session_dir / INDEX_FILENAME
+        self._lock = threading.Lock()
+        self._conn = None
+        self._open()
+
+    def _open(self):
+        fresh = not self.path.exists()
+        try:
+            self._connect()
+        except sqlite3.DatabaseError as e:
+            logger.log(LogLevel.WARNING, f"Session 索引損毀，重建：{self.path}（{e}）")
+            self._discard()
+            self._connect()
+            fresh = True
+        if fresh:
+            self._rebuild_locked()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " path TEXT PRIMARY KEY,"
+            " dir TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " suffix TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " sha256 TEXT,"
+            " mtime REAL NOT NULL,"
+            " etag TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(artifacts)")}
+        if "etag" not in columns:
+            # 加入 etag 欄位之前建立的索引
+            self._conn.execute("ALTER TABLE artifacts ADD COLUMN etag TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_dir ON artifacts(dir, suffix, mtime)")
+
+    def _discard(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        try:
+            names = os.listdir(self.session_dir)
+        except FileNotFoundError:
+            # session 目錄已被刪除（例如背景清理），沒有索引檔需要移除；之後重新連線會拋出 sqlite3 錯誤
+            return
+        for name in names:
+            if _is_index_file(name):
+                os.remove(self.session_dir / name)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _row(self, file_path: Path, sha256: str = None) -> tuple | None:
+        rel = file_path.relative_to(self.session_dir)
+        if len(rel.parts) < 2 or rel.parts[0] not in ROLES:
+            return None
+        st = file_path.stat()
+        return (
+            rel.as_posix(),
+            rel.parent.as_posix(),
+            rel.parts[0],
+            artifact_kind(file_path.suffix),
+            file_path.suffix.lower(),
+            st.st_size,
+            sha256 or _file_sha256(str(file_path)),
+            st.st_mtime,
+        )
+
+    def record(self, paths: Iterable, sha256: str = None):
+        """
+        記錄（或更新）已寫入的檔案
+
+        Args:
+            paths: 檔案路徑（必須位於 session 目錄底下）
+            sha256: 呼叫端已算好的雜湊（只有單一檔案時適用），未提供時讀檔計算
+
+        Raises:
+            ValueError: 指定 sha256 時傳入多個檔案
+        """
+        paths = list(paths)
+        if sha256 is not None and len(paths) > 1:
+            raise ValueError("sha256 can only be given for a single path")
+        rows = []
+        for path in paths:
+            file_path = Path(path).resolve()
+            try:
+                row = self._row(file_path, sha256)
+            except FileNotFoundError:
+                continue
+            if row is not None:
+                rows.append(row)
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO artifacts (path, dir, role, kind, suffix, size, sha256, mtime)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("COMMIT")
+
+    def set_etags(self, etags: dict):
+        """
+        記錄檔案對應的儲存後端物件版本（上傳或下載之後呼叫）
+
+        Args:
+            etags: {檔案路徑: 物件版本}（路徑必須位於 session 目錄底下）
+        """
+        rows = [
+            (etag, Path(path).resolve().relative_to(self.session_dir).as_posix())
+            for path, etag in etags.items()
+        ]
+        with self._lock:
+            self._conn.executemany("UPDATE artifacts SET etag = ? WHERE path = ?", rows)
+
+    def etags(self) -> dict[str, str]:
+        """已記錄物件版本的檔案：{相對路徑: 物件版本}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, etag FROM artifacts WHERE etag IS NOT NULL").fetchall()
+        return dict(rows)
+
+    def remove(self, rel_paths: Iterable[str]):
+        """從索引移除項目（相對於 session 目錄的路徑）"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM artifacts WHERE path = ?", [(p,) for p in rel_paths])
+
+    def rebuild(self) -> int:
+        """掃描整個 session 目錄重建索引，回傳項目數量"""
+        with self._lock:
+            return self._rebuild_locked()
+
+    def _rebuild_locked(self) -> int:
+        rows = []
+        for role in ROLES:
+            for file_path in (self.session_dir / role).rglob("*"):
+                rel_parts = file_path.relative_to(self.session_dir).parts
+                # 略過寫入中的暫存檔與隱藏的工作目錄（例如 PDF 擷取的 .extract-*）
+                if file_path.name.endswith(".part") or any(p.startswith(".") for p in rel_parts):
+                    continue
+                try:
+                    if file_path.is_file():
+                        rows.append(self._row(file_path))
+                except FileNotFoundError:
+                    continue
+        self._conn.execute("BEGIN")
+        self._conn.execute("DELETE FROM artifacts")
+        self._conn.executemany(
+            "INSERT INTO artifacts (path, dir, role, kind, suffix, size, sha256, mtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self._conn.execute("COMMIT")
+        logger.log(LogLevel.INFO, f"重建 session 索引：{self.session_dir.name}（{len(rows)} 個檔案）")
+        return len(rows)
+
+    def list(self, dir: str = None, suffixes: Iterable[str] = None, newest_first: bool = False) -> list[dict]:
+        """
+        列出索引中的檔案
+
+        Args:
+            dir: 只列出此目錄（相對於 session，例如 "orig"）的直接子檔案
+            suffixes: 只列出這些副檔名
+            newest_first: 依修改時間由新到舊排序（預設依路徑排序）
+
+        Returns:
+            list[dict]: {path, dir, role, kind, suffix, size, sha256, mtime}
+        """
+        where, params = [], []
+        if dir is not None:
+            where.append("dir = ?")
+            params.append(dir)
+        if suffixes:
+            suffixes = [s.lower() for s in suffixes]
+            where.append(f"suffix IN ({','.join('?' * len(suffixes))})")
+            params.extend(suffixes)
+        sql = "SELECT path, dir, role, kind, suffix, size, sha256, mtime FROM artifacts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY mtime DESC, path DESC" if newest_first else " ORDER BY path"
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def latest(self, dir: str, suffixes: Iterable[str]) -> Path | None:
+        """dir 中指定副檔名、修改時間最新的檔案（已被刪除的項目會移除後再找下一個）"""
+        suffixes = [s.lower() for s in suffixes]
+        sql = (
+            "SELECT path FROM artifacts WHERE dir = ?"
+            f" AND suffix IN ({','.join('?' * len(suffixes))})"
+            " ORDER BY mtime DESC, path DESC LIMIT 1"
+        )
+        while True:
+            with self._lock:
+                row = self._conn.execute(sql, (dir, *suffixes)).fetchone()
+            if row is None:
+                return None
+            file_path = self.session_dir / row[0]
+            if file_path.exists():
+                return file_path
+            self.remove([row[0]])
+
+
+_indexes: OrderedDict[str, SessionIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_session_index(session_dir) -> SessionIndex:
+    """取得 session 目錄的索引（行程內共用連線，最久未使用的會被關閉）"""
+    key = str(Path(session_dir).resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and index.path.exists():
+            _indexes.move_to_end(key)
+            return index
+        if index is not None:
+            # session 目錄被清理後又重新建立
+            index.close()
+        index = SessionIndex(key)
+        _indexes[key] = index
+        while len(_indexes) > _MAX_OPEN_INDEXES:
+            _, oldest = _indexes.popitem(last=False)
+            oldest.close()
+        return index
+
+
+def forget_session_index(session_dir):
+    """關閉並移除 session 的索引連線（刪除 session 目錄前呼叫）"""
+    key = str(Path(session_dir).resolve())
+    with _indexes_lock:
+        index = _indexes.pop(key, None)
+    if index is not None:
+        index.close()
+
+
+def indexed_bytes(session_dir) -> int | None:
+    """
+    由索引加總 session 中所有檔案的大小（唯讀開啟，不建立也不重建索引）
+
+    Returns:
+        int | None: 總位元組數；索引不存在或無法讀取時回傳 None
+    """
+    path = Path(session_dir) / INDEX_FILENAME
+    if not path.exists():
+        return None
+    try:
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=5)
+        try:
+            total, = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return total
+
+
+def session_dir_of(path) -> Path | None:
+    """檔案所屬的 session 目錄（outputs/{session_id}/{role}/...），不在 session 中時回傳 None"""
+    try:
+        rel = Path(path).resolve().relative_to(Path(OUTPUTS_DIR).resolve())
+    except ValueError:
+        return None
+    if len(rel.parts) < 3 or rel.parts[1] not in ROLES:
+        return None
+    return Path(OUTPUTS_DIR).resolve() / rel.parts[0]
+
+
+def record_artifact(*paths, sha256: str = None):
+    """
+    寫入檔案後更新所屬 session 的索引，並發布到儲存後端（使用 S3 時上傳，讓其他副本也能取得）
+
+    不在 session 目錄中的檔案（例如預設的 outputs/voice）直接略過；索引更新失敗只記錄警告，
+    不影響主流程（下次索引遺失或損毀時會重建）。
+
+    Args:
+        paths: 已寫入的檔案
+        sha256: 呼叫端已算好的雜湊（只能搭配單一檔案），未提供時讀檔計算
+
+    Raises:
+        ValueError: 指定 sha256 時傳入多個檔案
+    """
+    if sha256 is not None and len(paths) > 1:
+        raise ValueError("sha256 can only be given for a single path")
+    by_session: dict[Path, list] = {}
+    for path in paths:
+        session_dir = session_dir_of(path)
+        if session_dir is not None:
+            by_session.setdefault(session_dir, []).append(path)
+    for session_dir, session_paths in by_session.items():
+        try:
+            get_session_index(session_dir).record(session_paths, sha256=sha256)
+        except (OSError, sqlite3.Error) as e:
+            logger.log(LogLevel.WARNING, f"更新 session 索引失敗：{session_dir.name}（{e}）")
+        etags = {}
+        for path in session_paths:
+            try:
+                etag = publish_artifact(session_dir, path)
+            except Exception as e:
+                logger.log(LogLevel.WARNING, f"上傳到儲存後端失敗：{path}（{e}）")
+                continue
+            if etag is not None:
+                etags[path] = etag
+        if etags:
+            try:
+                get_session_index(session_dir).set_etags(etags)
+            except (OSError, sqlite3.Error) as e:
+                logger.log(LogLevel.WARNING, f"更新 session 索引失敗：{session_dir.name}（{e}）")
@@ -0,0 +1,348 @@
+"""
+Session 產出的儲存後端
+
+生成流程（GPT、TTS、genanki）仍在本機的 OUTPUTS_DIR/{session_id} 中寫檔；儲存後端負責讓其他副本也能取得這些檔案：
+- LocalArtifactStore：檔案本來就在 OUTPUTS_DIR，發布與取回都不需要做事（單一容器的預設值）
+- S3ArtifactStore：寫入產出時同步上傳到 S3 相容的物件儲存（AWS S3、MinIO），
+  其他副本遇到本機沒有的 session 時再下載回來，單一檔案也可以直接以範圍讀取串流給前端
+
+物件 key 為 {session_id}/{相對路徑}；.index.sqlite 等本機索引不上傳，下載後在本機重建。
+本機副本對應的物件版本（S3 的 ETag）記錄在 session 索引中，用來判斷後端的檔案是否已被其他副本改寫。
+boto3 只在使用 S3 時才需要安裝（延遲匯入）。
+"""
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .config import (
+    OUTPUTS_DIR, ARTIFACT_STORE, ARTIFACT_CHUNK_SIZE,
+    S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION,
+)
+from .logger import LogLevel, get_logger
+
+logger = get_logger()
+
+
+class ArtifactNotFoundError(FileNotFoundError):
+    """儲存後端中沒有此物件"""
+
+
+class ArtifactStore(ABC):
+    """
+    儲存後端介面
+
+    key 一律使用 "/" 分隔的相對路徑；iter_range 的 end 為包含的最後一個位元組（與 HTTP Range 相同）。
+    版本（etag）為後端判斷物件內容是否改變的識別字串（S3 為 ETag），後端沒有時為 None。
+    """
+
+    # 是否需要在本機與後端之間複製檔案
+    is_remote = False
+
+    @abstractmethod
+    def put_stream(self, key: str, chunks: Iterable[bytes]):
+        """串流寫入物件（覆寫既有的物件）"""
+
+    def put_file(self, key: str, path: str) -> str | None:
+        """上傳檔案，回傳寫入後的物件版本"""
+        with open(path, "rb") as f:
+            self.put_stream(key, iter(lambda: f.read(ARTIFACT_CHUNK_SIZE), b""))
+        return None
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: int = None,
+                   chunk_size: int = ARTIFACT_CHUNK_SIZE) -> Iterator[bytes]:
+        """依範圍串流讀取物件，不存在時拋出 ArtifactNotFoundError"""
+
+    @abstractmethod
+    def size(self, key: str) -> int | None:
+        """物件大小，不存在時回傳 None"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> list[tuple[str, int, str | None]]:
+        """列出 prefix 底下的 (key, 大小, 版本)"""
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> int:
+        """刪除 prefix 底下的所有物件，回傳刪除數量"""
+
+    def get_file(self, key: str, dest: str):
+        """串流下載到 dest（先寫暫存檔再改名）"""
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = f"{dest}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in self.iter_range(key):
+                    f.write(chunk)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class LocalArtifactStore(ArtifactStore):
+    """本機檔案系統（key 對應 root 底下的路徑）"""
+
+    def __init__(self, root: str = str(OUTPUTS_DIR)):
+        self.root = Path(root).resolve()
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Invalid artifact key: {key}")
+        return path
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def put_file(self, key: str, path: str) -> str | None:
+        # 已經在目標位置（生成流程直接寫在 OUTPUTS_DIR）時不需要複製
+        if Path(path).resolve() != self._path(key):
+            super().put_file(key, path)
+        return None
+
+    def iter_range(self, key: str, start: int = 0, end: int = None,
+                   chunk_size: int = ARTIFACT_CHUNK_SIZE) -> Iterator[bytes]:
+        path = self._path(key)
+        if not path.is_file():
+            raise ArtifactNotFoundError(key)
+        remaining = None if end is None else end - start + 1
+        with open(path, "rb") as f:
+            f.seek(start)
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def size(self, key: str) -> int | None:
+        try:
+            return self._path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def list(self, prefix: str) -> list[tuple[str, int, str | None]]:
+        base = self._path(prefix)
+        if not base.is_dir():
+            return []
+        return [
+            (p.relative_to(self.root).as_posix(), p.stat().st_size, None)
+            for p in sorted(base.rglob("*")) if p.is_file()
+        ]
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = self.list(prefix)
+        for key, _, _ in keys:
+            self._path(key).unlink(missing_ok=True)
+        return len(keys)
+
+
+class _ChunkReader(io.RawIOBase):
+    """將位元組區塊的迭代器包成可讀的檔案物件（給 boto3 的 upload_fileobj 串流上傳）"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class S3ArtifactStore(ArtifactStore):
+    """
+    S3 相容的物件儲存（AWS S3、MinIO；測試時可用 moto）
+
+    Args:
+        bucket: bucket 名稱
+        prefix: 所有 key 前面加上的前綴
+        endpoint_url: S3 相容服務的端點（AWS S3 時為 None）
+        region: 區域
+        client: 已建立的 boto3 S3 客戶端（未提供時延遲建立）
+    """
+
+    is_remote = True
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: str = S3_ENDPOINT_URL,
+                 region: str = S3_REGION, client=None):
+        if not bucket:
+            raise ValueError("S3_BUCKET is required when ARTIFACT_STORE=s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                try:
+                    import boto3
+                except ImportError as e:
+                    raise RuntimeError("ARTIFACT_STORE=s3 requires boto3 (pip install boto3)") from e
+                # boto3 的客戶端可跨執行緒共用
+                self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+            return self._client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    @staticmethod
+    def _is_not_found(error) -> bool:
+        code = error.response.get("Error", {}).get("Code", "")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]):
+        # upload_fileobj 依大小自動改用 multipart，記憶體用量只與分段大小有關
+        self.client.upload_fileobj(_ChunkReader(chunks), self.bucket, self._key(key))
+
+    def put_file(self, key: str, path: str) -> str | None:
+        self.client.upload_file(path, self.bucket, self._key(key))
+        # upload_file 不回傳 ETag（multipart 上傳的 ETag 也不是 MD5），以 HEAD 取得實際的值
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ETag"]
+
+    def iter_range(self, key: str, start: int = 0, end: int = None,
+                   chunk_size: int = ARTIFACT_CHUNK_SIZE) -> Iterator[bytes]:
+        from botocore.exceptions import ClientError
+
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            body = self.client.get_object(**params)["Body"]
+        except ClientError as e:
+            if self._is_not_found(e):
+                raise ArtifactNotFoundError(key) from e
+            raise
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def size(self, key: str) -> int | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except ClientError as e:
+            if self._is_not_found(e):
+                return None
+            raise
+
+    def list(self, prefix: str) -> list[tuple[str, int, str | None]]:
+        items = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                items.append((obj["Key"][len(self.prefix):], obj["Size"], obj.get("ETag")))
+        return items
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [key for key, _, _ in self.list(prefix)]
+        # DeleteObjects 一次最多 1000 個
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self._key(k)} for k in keys[i:i + 1000]], "Quiet": True},
+            )
+        return len(keys)
+
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """取得全域儲存後端（依 ARTIFACT_STORE 設定）"""
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            if ARTIFACT_STORE == "s3":
+                _artifact_store = S3ArtifactStore()
+            else:
+                if ARTIFACT_STORE != "local":
+                    logger.log(LogLevel.WARNING, f"未知的 ARTIFACT_STORE：{ARTIFACT_STORE}，使用 local")
+                _artifact_store = LocalArtifactStore()
+        return _artifact_store
+
+
+def session_key(session_id: str, rel_path: str = "") -> str:
+    """session 中檔案的物件 key"""
+    return f"{session_id}/{rel_path}"
+
+
+def publish_artifact(session_dir, path) -> str | None:
+    """
+    將 session 中剛寫入的檔案發布到儲存後端（本機後端不需要做事）
+
+    Returns:
+        str | None: 物件版本（記錄到 session 索引，之後用來判斷後端的檔案是否被改寫）
+    """
+    store = get_artifact_store()
+    if not store.is_remote:
+        return None
+    session_dir = Path(session_dir)
+    rel_path = Path(path).resolve().relative_to(session_dir.resolve()).as_posix()
+    return store.put_file(session_key(session_dir.name, rel_path), str(path))
+
+
+def ensure_local_session(session_id: str, known_etags: dict[str, str] = None) -> dict[Path, str | None]:
+    """
+    列出儲存後端中的 session，下載本機沒有或已被改寫的檔案到 OUTPUTS_DIR
+
+    Args:
+        session_id: session ID
+        known_etags: 本機副本對應的 {相對路徑: 物件版本}（來自 session 索引）；
+                     有記錄版本時以版本比對，沒有時（例如索引重建後）才退回比對大小
+
+    Returns:
+        dict[Path, str | None]: 新下載的檔案與其物件版本
+    """
+    store = get_artifact_store()
+    if not store.is_remote:
+        return {}
+    known_etags = known_etags or {}
+    session_dir = Path(OUTPUTS_DIR) / session_id
+    downloaded = {}
+    for key, size, etag in store.list(session_key(session_id)):
+        rel_path = key[len(session_key(session_id)):]
+        dest = (session_dir / rel_path).resolve()
+        if not rel_path or not dest.is_relative_to(session_dir.resolve()):
+            continue
+        if dest.exists():
+            local_etag = known_etags.get(rel_path)
+            if local_etag is not None and etag is not None:
+                if local_etag == etag:
+                    continue
+            elif dest.stat().st_size == size:
+                continue
+        store.get_file(key, str(dest))
+        downloaded[dest] = etag
+    if downloaded:
+        logger.log(LogLevel.INFO, f"已從儲存後端取回 session {session_id}（{len(downloaded)} 個檔案）")
+    return downloaded
@@ -0,0 +1,151 @@
+"""
+GPT 詞彙結果快取
+
+以 SQLite 保存 GPT 產生的詞彙資料，讓相同的單字（相同語言、學習目標、模型與 prompt）
+在不同使用者與會話之間不必重複呼叫 GPT。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable
+
+from .config import VOCAB_CACHE_ENABLED, VOCAB_CACHE_PATH, VOCAB_CACHE_TTL, VOCAB_CACHE_MAX_ENTRIES
+from .logger import LogLevel, get_logger
+
+logger = get_logger()
+
+# SQLite 單一查詢的參數數量上限（保守值）
+_SQL_BATCH = 500
+
+
+def make_cache_key(*parts) -> str:
+    """將任意可 JSON 序列化的欄位組合成穩定的快取 key"""
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def prompt_version(prompt: str) -> str:
+    """以 prompt 模板內容的雜湊作為版本，模板一改快取自然失效"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class VocabCache:
+    """
+    SQLite 鍵值快取
+
+    - 值以 JSON 保存
+    - 超過 ttl 秒的項目視為過期
+    - 項目數超過 max_entries 時淘汰最久未使用的項目
+    """
+
+    def __init__(self, path: str = VOCAB_CACHE_PATH, ttl: int = VOCAB_CACHE_TTL, max_entries: int = VOCAB_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+
+    def get_many(self, keys: Iterable[str]) -> dict:
+        """批次讀取，回傳 {key: value}（只包含命中且未過期的項目）"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        min_created = now - self.ttl
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                chunk = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*chunk, min_created)
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE entries SET accessed_at = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        (now, *[key for key, _ in rows])
+                    )
+        return found
+
+    def get(self, key: str):
+        """讀取單一項目，未命中回傳 None"""
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: dict):
+        """批次寫入 {key: value}"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, json.dumps(value, ensure_ascii=False), now, now) for key, value in items.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("COMMIT")
+            self._writes_since_evict += len(rows)
+            if self._writes_since_evict >= 1000 or self._writes_since_evict >= self.max_entries // 10:
+                self._evict_locked()
+
+    def set(self, key: str, value):
+        self.set_many({key: value})
+
+    def evict(self) -> int:
+        """刪除過期與超出數量上限的項目，回傳刪除數量"""
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        self._writes_since_evict = 0
+        deleted = self._conn.execute(
+            "DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,)
+        ).rowcount
+        count, = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            deleted += self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            ).rowcount
+        if deleted:
+            logger.log(LogLevel.INFO, f"詞彙快取淘汰 {deleted} 筆")
+        return deleted
+
+
+_vocab_cache = None
+_vocab_cache_lock = threading.Lock()
+
+
+def get_vocab_cache() -> VocabCache | None:
+    """取得全域詞彙快取（停用或無法開啟時回傳 None）"""
+    global _vocab_cache
+    if not VOCAB_CACHE_ENABLED:
+        return None
+    with _vocab_cache_lock:
+        if _vocab_cache is None:
+            try:
+                _vocab_cache = VocabCache()
+            except sqlite3.Error as e:
+                logger.log(LogLevel.WARNING, f"無法開啟詞彙快取 {VOCAB_CACHE_PATH}：{e}")
+                return None
+        return _vocab_cache
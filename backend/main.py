@@ -4,18 +4,35 @@ FastAPI Server for Anki Generator
 """
 import os
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # 從 routes 模組導入所有路由
 from routes import api_router
+from helpers.worker_pool import get_pipeline_pool
+from libs.pdf_images import shutdown_pdf_pool
+from libs.openai_pool import get_openai_registry
+from service.session_gc import get_session_gc
 
 # 配置日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """應用生命週期：啟動 session 背景清理，關閉時停止背景執行池"""
+    get_session_gc().start()
+    yield
+    get_session_gc().stop()
+    get_pipeline_pool().shutdown(wait=False)
+    shutdown_pdf_pool()
+    get_openai_registry().clear()
+
+
 # 創建 FastAPI 應用
-app = FastAPI(title="Anki Generator API", version="2.0.0")
+app = FastAPI(title="Anki Generator API", version="2.0.0", lifespan=lifespan)
 
 # 從環境變數讀取 CORS 設定
 cors_origins_env = os.getenv("CORS_ALLOW_ORIGINS", "*")
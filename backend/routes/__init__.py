@@ -7,13 +7,14 @@ from fastapi import APIRouter
 api_router = APIRouter(prefix="/api")
 
 # 導入各個路由模組（這會觸發路由註冊）
-from . import health, settings, analyze, generate, files
+from . import health, settings, analyze, generate, jobs, files
 
 # 註冊所有路由
 api_router.include_router(health.router)
 api_router.include_router(settings.router)
 api_router.include_router(analyze.router)
 api_router.include_router(generate.router)
+api_router.include_router(jobs.router)
 api_router.include_router(files.router)
 
 __all__ = ['api_router']
@@ -4,31 +4,43 @@
 import json
 import traceback
 from pathlib import Path
-from typing import Optional
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 
 from libs.config import OUTPUTS_DIR, PASSAGE_IMAGE_DIR
 from libs.parser import Parser
-from helpers.session import get_or_create_session_dir, setup_session_directories
+from libs.session_index import IMAGE_SUFFIXES, get_session_index, record_artifact
+from helpers.session import SessionHold, get_or_create_session_dir, setup_session_directories
 from helpers.file_utils import secure_filename, get_image_path
 from helpers.api_key import validate_and_get_api_key, format_api_key_error
+from helpers.upload import receive_multipart_upload, UploadFormError, UploadTooLargeError
+from helpers.worker_pool import get_pipeline_pool, PoolFullError
+from .generate import RETRY_AFTER_SECONDS
+from .generate_helpers import format_busy_response
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
 @router.post("/analyze/images")
-async def analyze_images(
-    file: UploadFile = File(...),
-    settings: Optional[str] = Form(None),
-    sessionId: Optional[str] = Form(None)
-):
-    """分析 PDF 或圖片文件，提取圖片列表"""
+async def analyze_images(request: Request):
+    """
+    分析 PDF 或圖片文件，提取圖片列表
+
+    表單欄位：file（上傳檔案）、settings（JSON 字串，選填）、sessionId（選填）。
+    body 以串流解析，檔案在接收時就檢查大小上限（不使用 UploadFile）。
+    """
+    upload = None
+    # 處理期間持有 session，避免背景清理刪除正在使用的目錄
+    hold = SessionHold()
     try:
-        if not file.filename:
+        upload = await receive_multipart_upload(request)
+        if not upload.filename:
             raise HTTPException(status_code=400, detail='No file selected')
+        settings = upload.fields.get('settings')
+        sessionId = upload.fields.get('sessionId') or None
         
         # 解析 settings
         settings_dict = {}
@@ -52,51 +64,62 @@ async def analyze_images(
             )
         
         # 使用提供的 sessionId 或創建新的 session 目錄
-        session_dir = get_or_create_session_dir(sessionId)
+        # 可能需要從儲存後端取回 session，不在 event loop 上執行
+        hold.add(sessionId)
+        session_dir = await run_in_threadpool(get_or_create_session_dir, sessionId)
+        hold.add(session_dir.name)
         dirs = setup_session_directories(session_dir)
         source_dir = dirs['source']
         
-        filename = secure_filename(file.filename)
-        filepath = source_dir / filename
+        filename = secure_filename(upload.filename)
+        filepath = upload.move_to(source_dir / filename)
         
-        # 保存文件
-        with open(filepath, 'wb') as f:
-            content = await file.read()
-            f.write(content)
+        # 檔案已在接收時寫入暫存檔並計算雜湊，這裡只需改名到 session 目錄
+        size, sha256 = upload.size, upload.sha256
+        record_artifact(filepath, sha256=sha256)
+        logger.info(f"Saved upload {filename}: {size} bytes, sha256={sha256}")
         
         images = []
+        passages = []
         
         # 如果是 PDF，解析提取圖片（圖片會儲存在 source 目錄中）
         if filename.lower().endswith('.pdf'):
             parser = Parser(session_dir=str(source_dir), api_key=api_key)
-            parser.parse_pdf(str(filepath))
-            
-            # 獲取提取的圖片（從 source 目錄中查找）
-            image_dir = Path(parser.passage_image_path)
-            image_files = sorted(
-                list(image_dir.glob('*.jpg')) + 
-                list(image_dir.glob('*.png')) + 
-                list(image_dir.glob('*.jpeg')),
-                key=lambda p: p.stat().st_mtime,
-                reverse=True
-            )
+            # 文字層 PDF 直接擷取文字（存成 {PDF 名稱}_passage.txt），不抽圖片
+            text = await get_pipeline_pool().run(parser.parse_pdf, str(filepath))
+            if text is not None:
+                logger.info(f"PDF has a text layer, skipped image extraction: {filename}")
+                # 生成請求以 passageIds 明確指定要送給 GPT 的文章
+                passages.append({
+                    'id': Path(parser.passage_text_path(str(filepath))).name,
+                    'chars': len(text),
+                    'selected': True
+                })
+            else:
+                # 獲取提取的圖片（從 session 索引查詢 source 目錄，新到舊）
+                image_files = [
+                    session_dir / img['path']
+                    for img in get_session_index(session_dir).list(
+                        dir=source_dir.name, suffixes=IMAGE_SUFFIXES, newest_first=True
+                    )
+                ]
             
-            # 只獲取最近解析的圖片（匹配當前PDF文件名）
-            pdf_stem = Path(filename).stem
-            pdf_images = [img for img in image_files if img.stem.startswith(pdf_stem)]
+                # 只獲取最近解析的圖片（匹配當前PDF文件名）
+                pdf_stem = Path(filename).stem
+                pdf_images = [img for img in image_files if img.stem.startswith(pdf_stem)]
             
-            # 如果沒有找到匹配的圖片，使用所有圖片（可能是第一次解析）
-            if not pdf_images:
-                pdf_images = image_files[:10]  # 限制最多10張，避免太多
+                # 如果沒有找到匹配的圖片，使用所有圖片（可能是第一次解析）
+                if not pdf_images:
+                    pdf_images = image_files[:10]  # 限制最多10張，避免太多
             
-            for idx, img_path in enumerate(pdf_images, start=1):
-                # 轉換為可訪問的 URL 路徑
-                images.append({
-                    'id': len(images) + idx,
-                    'src': f'/api/files/image/{session_dir.name}/{img_path.name}',
-                    'path': str(img_path),
-                    'selected': True
-                })
+                for idx, img_path in enumerate(pdf_images, start=1):
+                    # 轉換為可訪問的 URL 路徑
+                    images.append({
+                        'id': len(images) + idx,
+                        'src': f'/api/files/image/{session_dir.name}/{img_path.name}',
+                        'path': str(img_path),
+                        'selected': True
+                    })
         elif filename.lower().endswith(('.png', '.jpg', '.jpeg')):
             # 單個圖片文件
             images.append({
@@ -109,11 +132,30 @@ async def analyze_images(
         return {
             'success': True,
             'images': images,
+            'hasText': bool(passages),
+            'passages': passages,
+            'sha256': sha256,
             'sessionId': session_dir.name
         }
         
     except HTTPException:
         raise
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=413,
+            detail={'error': 'File too large', 'details': str(e)}
+        )
+    except UploadFormError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={'error': 'Invalid upload', 'details': str(e)}
+        )
+    except PoolFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=format_busy_response(e),
+            headers={'Retry-After': str(RETRY_AFTER_SECONDS)}
+        )
     except Exception as e:
         error_msg = str(e)
         full_traceback = traceback.format_exc()
@@ -124,6 +166,10 @@ async def analyze_images(
             status_code=500,
             detail={'error': 'Analysis failed', 'details': detailed_error}
         )
+    finally:
+        hold.release()
+        if upload is not None:
+            upload.discard()
 
 
 @router.get("/files/image/{session_id}/{filename}")
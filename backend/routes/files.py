@@ -2,21 +2,26 @@
 文件管理 API 路由
 """
 import json
-import zipfile
-import tempfile
-import threading
-import shutil
-import time
+import mimetypes
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
+from urllib.parse import quote
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 
 from libs.config import OUTPUTS_DIR
+from libs.session_index import get_session_index, record_artifact
+from libs.storage import get_artifact_store, session_key
 from service.anki_service import AnkiService
-from helpers.session import get_or_create_session_dir, setup_session_directories
+from service.session_gc import get_session_gc
+from helpers.session import (
+    SessionHold, find_session_dir, get_or_create_session_dir, session_in_use, setup_session_directories,
+    touch_session_dir,
+)
+from helpers.zip_stream import stream_zip
 from .generate_helpers import determine_card_type
 
 router = APIRouter()
@@ -55,89 +60,50 @@ def get_display_name_for_apkg(file_path: Path, relative_path: Path) -> str:
 
 @router.get("/files/download/{session_id}")
 async def download_file(session_id: str):
-    """打包整個 session 目錄為 .zip 檔案"""
-    try:
-        session_dir = Path(OUTPUTS_DIR) / session_id
-        if not session_dir.exists():
-            raise HTTPException(status_code=404, detail='Session not found')
-        
-        # 創建臨時 zip 檔案
-        zip_filename = f"{session_id}.zip"
-        temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-        temp_zip_path = temp_zip.name
-        temp_zip.close()
-        
-        # 打包整個 session 目錄
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in session_dir.rglob('*'):
-                if file_path.is_file():
-                    # 計算相對路徑（相對於 session_dir）
-                    arcname = file_path.relative_to(session_dir)
-                    zipf.write(file_path, arcname)
-        
-        logger.info(f"Created zip file for session {session_id}: {temp_zip_path}")
-        
-        # 使用 StreamingResponse 來處理檔案下載和清理
-        def generate():
-            try:
-                with open(temp_zip_path, 'rb') as f:
-                    while True:
-                        chunk = f.read(8192)
-                        if not chunk:
-                            break
-                        yield chunk
-            finally:
-                # 清理臨時檔案
-                try:
-                    if Path(temp_zip_path).exists():
-                        Path(temp_zip_path).unlink()
-                        logger.info(f"Cleaned up temp file: {temp_zip_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup temp file {temp_zip_path}: {e}")
-        
-        return StreamingResponse(
-            generate(),
-            media_type='application/zip',
-            headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        # 確保清理臨時檔案
-        try:
-            if 'temp_zip_path' in locals() and Path(temp_zip_path).exists():
-                Path(temp_zip_path).unlink()
-        except:
-            pass
-        logger.error(f"Download error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail={'error': 'Download failed', 'details': str(e)})
+    """打包整個 session 目錄為 .zip 檔案（邊讀邊壓縮串流輸出，不產生暫存檔）"""
+    session_dir = await run_in_threadpool(find_session_dir, session_id)
+    if session_dir is None:
+        raise HTTPException(status_code=404, detail='Session not found')
+
+    zip_filename = f"{session_id}.zip"
+    logger.info(f"Streaming zip for session {session_id}")
+
+    def session_files():
+        # 檔案清單來自 session 索引，在開始迭代時才查詢
+        for artifact in get_session_index(session_dir).list():
+            yield session_dir / artifact['path'], artifact['path']
+
+    # 同步產生器由 StreamingResponse 在執行緒池中迭代，查詢索引與壓縮都不會阻塞事件迴圈
+    return StreamingResponse(
+        stream_zip(session_files()),
+        media_type='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{zip_filename}"'}
+    )
 
 
 @router.get("/files/list/{session_id}")
 async def list_session_files(session_id: str):
     """列出 session 目錄中的所有文件"""
     try:
-        session_dir = Path(OUTPUTS_DIR) / session_id
-        if not session_dir.exists():
+        session_dir = await run_in_threadpool(find_session_dir, session_id)
+        if session_dir is None:
             raise HTTPException(status_code=404, detail='Session not found')
         
         files = []
-        # 列出所有文件
-        for file_path in session_dir.rglob('*'):
-            if file_path.is_file():
-                relative_path = file_path.relative_to(session_dir)
-                file_name = file_path.name
-                display_name = get_display_name_for_apkg(file_path, relative_path)
-                
-                files.append({
-                    'name': display_name,
-                    'originalName': file_name,
-                    'path': str(relative_path),
-                    'size': file_path.stat().st_size,
-                    'type': file_path.suffix,
-                    'isApkg': file_path.suffix == '.apkg'
-                })
+        # 列出所有文件（從 session 索引讀取，不掃描目錄）
+        for artifact in get_session_index(session_dir).list():
+            relative_path = Path(artifact['path'])
+            file_path = session_dir / relative_path
+            display_name = get_display_name_for_apkg(file_path, relative_path)
+            
+            files.append({
+                'name': display_name,
+                'originalName': file_path.name,
+                'path': str(relative_path),
+                'size': artifact['size'],
+                'type': file_path.suffix,
+                'isApkg': file_path.suffix == '.apkg'
+            })
         
         return {
             'success': True,
@@ -151,31 +117,89 @@ async def list_session_files(session_id: str):
         raise HTTPException(status_code=500, detail={'error': 'Failed to list files', 'details': str(e)})
 
 
+def parse_range_header(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    解析單一範圍的 Range 標頭（bytes=start-end、bytes=start-、bytes=-suffix）
+
+    Returns:
+        tuple[int, int] | None: (start, end)，end 包含在內；格式不支援或超出檔案大小時回傳 None
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def remote_file_response(key: str, size: int, filename: str, range_header: str = None) -> Response:
+    """從儲存後端串流單一檔案（支援 Range，回傳 206 部分內容）"""
+    store = get_artifact_store()
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f"attachment; filename*=utf-8''{quote(filename)}",
+    }
+    media_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if size == 0:
+        return Response(b'', media_type=media_type, headers=headers)
+
+    start, end, status_code = 0, size - 1, 200
+    if range_header:
+        byte_range = parse_range_header(range_header, size)
+        if byte_range is None:
+            raise HTTPException(status_code=416, detail='Range not satisfiable', headers={'Content-Range': f'bytes */{size}'})
+        start, end = byte_range
+        status_code = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(store.iter_range(key, start, end), status_code=status_code,
+                             media_type=media_type, headers=headers)
+
+
 @router.get("/files/download/{session_id}/{file_path:path}")
-async def download_specific_file(session_id: str, file_path: str):
-    """下載 session 目錄中的特定文件"""
+async def download_specific_file(session_id: str, file_path: str, request: Request):
+    """下載 session 目錄中的特定文件（本機沒有時直接從儲存後端以範圍讀取串流）"""
     try:
         session_dir = Path(OUTPUTS_DIR) / session_id
-        if not session_dir.exists():
-            raise HTTPException(status_code=404, detail='Session not found')
         
         # 防止路徑遍歷攻擊
         target_file = (session_dir / file_path).resolve()
-        if not str(target_file).startswith(str(session_dir.resolve())):
+        if not target_file.is_relative_to(session_dir.resolve()):
             raise HTTPException(status_code=400, detail='Invalid file path')
         
-        if not target_file.exists() or not target_file.is_file():
-            raise HTTPException(status_code=404, detail='File not found')
-        
         # 確定下載時的檔案名稱（使用顯示名稱）
         relative_path = Path(file_path)
         download_filename = get_display_name_for_apkg(target_file, relative_path)
         
-        logger.info(f"Sending file for download: {target_file} as {download_filename}")
-        return FileResponse(
-            str(target_file),
-            filename=download_filename
-        )
+        if target_file.is_file():
+            touch_session_dir(session_dir)
+            logger.info(f"Sending file for download: {target_file} as {download_filename}")
+            # FileResponse 本身支援 Range 請求
+            return FileResponse(
+                str(target_file),
+                filename=download_filename
+            )
+        
+        store = get_artifact_store()
+        if store.is_remote:
+            key = session_key(session_id, target_file.relative_to(session_dir.resolve()).as_posix())
+            size = await run_in_threadpool(store.size, key)
+            if size is not None:
+                logger.info(f"Streaming file from artifact store: {key} as {download_filename}")
+                return remote_file_response(key, size, download_filename, request.headers.get('range'))
+        
+        if not session_dir.exists():
+            raise HTTPException(status_code=404, detail='Session not found')
+        raise HTTPException(status_code=404, detail='File not found')
     except HTTPException:
         raise
     except Exception as e:
@@ -188,21 +212,14 @@ async def cleanup_session(session_id: str):
     """刪除 session 目錄（延遲刪除）"""
     try:
         session_dir = Path(OUTPUTS_DIR) / session_id
-        if not session_dir.exists():
+        store = get_artifact_store()
+        if not session_dir.exists() and not (
+            store.is_remote and await run_in_threadpool(store.list, session_key(session_id))
+        ):
             raise HTTPException(status_code=404, detail='Session not found')
         
-        # 使用線程延遲刪除
-        def delayed_delete():
-            time.sleep(5)  # 等待 5 秒後刪除
-            try:
-                if session_dir.exists():
-                    shutil.rmtree(session_dir)
-                    logger.info(f"Cleaned up session directory: {session_dir}")
-            except Exception as e:
-                logger.error(f"Failed to cleanup session {session_id}: {e}")
-        
-        thread = threading.Thread(target=delayed_delete, daemon=True)
-        thread.start()
+        # 交由背景清理執行緒延遲刪除（包含儲存後端中的檔案）（仍有任務執行中時會等任務結束）
+        get_session_gc().schedule_delete(session_id, delay=5)
         
         return {
             'success': True,
@@ -215,6 +232,71 @@ async def cleanup_session(session_id: str):
         raise HTTPException(status_code=500, detail={'error': 'Cleanup failed', 'details': str(e)})
 
 
+def _package_cards_sync(cards: list, deck_name: str, note_name: str, session_id: str = None,
+                        hold: SessionHold = None) -> dict:
+    """儲存編輯後的卡片並打包（含檔案讀寫、語音雜湊與 genanki，在執行緒中執行）"""
+    # 使用提供的 sessionId 或創建新的 session 目錄（語音檔可能由其他副本生成，本機沒有時從儲存後端補齊）
+    session_dir = get_or_create_session_dir(session_id, required=("orig/voice",))
+    if hold is not None:
+        hold.add(session_dir.name)
+    dirs = setup_session_directories(session_dir)
+    edited_dir = dirs['edited']
+    orig_dir = dirs['orig']
+    orig_voice_dir = orig_dir / "voice"
+    
+    # 確定卡片類型
+    card_type = determine_card_type(note_name)
+    
+    # 轉換卡片格式
+    vocab_list = []
+    for card in cards:
+        vocab_list.append({
+            'word': card.get('word', card.get('front', '')),
+            'pos': card.get('pos', ''),
+            'meaning': card.get('meaning', card.get('back', '')),
+            'synonyms': card.get('synonyms', ''),
+            'ex1_ori': card.get('ex1_ori', card.get('sentence', '')),
+            'ex1_trans': card.get('ex1_trans', ''),
+            'ex2_ori': card.get('ex2_ori', ''),
+            'ex2_trans': card.get('ex2_trans', ''),
+            'hint': card.get('hint', '')
+        })
+    
+    # 儲存修改後的 JSON 到 edited 目錄
+    from helpers.file_utils import slugify
+    safe_deck_name = slugify(deck_name)
+    json_filename = f"{safe_deck_name}-edited-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    json_path = edited_dir / json_filename
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(vocab_list, f, ensure_ascii=False, indent=2)
+    record_artifact(json_path)
+    logger.info(f"Saved edited JSON to: {json_path}")
+    
+    # 確定 voice 目錄：優先使用 orig/voice，如果不存在則使用 edited/voice（向後兼容）
+    voice_dir_to_use = None
+    if orig_voice_dir.exists():
+        voice_dir_to_use = str(orig_voice_dir)
+    else:
+        edited_voice_dir = edited_dir / "voice"
+        if edited_voice_dir.exists():
+            voice_dir_to_use = str(edited_voice_dir)
+    
+    # 調用打包邏輯（卡片內容沒有變更時直接沿用已打包的 .apkg）
+    result, file_path = AnkiService.pack_vocab(
+        vocab_list, deck_name, card_type,
+        session_dir=str(edited_dir),
+        voice_dir=voice_dir_to_use,
+        filename_suffix='edited'
+    )
+    
+    return {
+        'success': True,
+        'filePath': file_path,
+        'message': result,
+        'sessionId': session_dir.name
+    }
+
+
 @router.post("/generate/package")
 async def package_cards(data: Dict[str, Any]):
     """打包卡片為 .apkg 文件"""
@@ -224,93 +306,15 @@ async def package_cards(data: Dict[str, Any]):
         cards = data.get('cards', [])
         deck_name = data.get('deckName', 'TestDeck')
         note_name = data.get('noteName', 'Basic')
-        tags = data.get('tags', '')
         session_id = data.get('sessionId')
         
         if not cards:
             raise HTTPException(status_code=400, detail='No cards provided')
         
-        # 使用提供的 sessionId 或創建新的 session 目錄
-        session_dir = get_or_create_session_dir(session_id)
-        dirs = setup_session_directories(session_dir)
-        edited_dir = dirs['edited']
-        orig_dir = dirs['orig']
-        orig_voice_dir = orig_dir / "voice"
-        
-        # 確定卡片類型
-        card_type = determine_card_type(note_name)
-        
-        # 轉換卡片格式
-        vocab_list = []
-        for card in cards:
-            vocab_list.append({
-                'word': card.get('word', card.get('front', '')),
-                'pos': card.get('pos', ''),
-                'meaning': card.get('meaning', card.get('back', '')),
-                'synonyms': card.get('synonyms', ''),
-                'ex1_ori': card.get('ex1_ori', card.get('sentence', '')),
-                'ex1_trans': card.get('ex1_trans', ''),
-                'ex2_ori': card.get('ex2_ori', ''),
-                'ex2_trans': card.get('ex2_trans', ''),
-                'hint': card.get('hint', '')
-            })
-        
-        # 儲存修改後的 JSON 到 edited 目錄
-        from helpers.file_utils import slugify
-        safe_deck_name = slugify(deck_name)
-        json_filename = f"{safe_deck_name}-edited-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        json_path = edited_dir / json_filename
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(vocab_list, f, ensure_ascii=False, indent=2)
-        logger.info(f"Saved edited JSON to: {json_path}")
-        
-        # 確定 voice 目錄：優先使用 orig/voice，如果不存在則使用 edited/voice（向後兼容）
-        voice_dir_to_use = None
-        if orig_voice_dir.exists():
-            voice_dir_to_use = str(orig_voice_dir)
-        else:
-            edited_voice_dir = edited_dir / "voice"
-            if edited_voice_dir.exists():
-                voice_dir_to_use = str(edited_voice_dir)
-        
-        # 調用打包邏輯
-        if card_type == 'Basic':
-            result = AnkiService.import_basic_model_notes(
-                vocab_list, deck_name, 
-                session_dir=str(edited_dir), 
-                voice_dir=voice_dir_to_use, 
-                filename_suffix='edited'
-            )
-        elif card_type == 'Cloze':
-            result = AnkiService.import_cloze_model_notes(
-                vocab_list, deck_name, 
-                session_dir=str(edited_dir), 
-                voice_dir=voice_dir_to_use, 
-                filename_suffix='edited'
-            )
-        else:
-            result = AnkiService.import_basic_and_cloze_notes(
-                vocab_list, deck_name, 
-                session_dir=str(edited_dir), 
-                voice_dir=voice_dir_to_use, 
-                filename_suffix='edited'
-            )
-        
-        # 在 edited_dir 中查找生成的 .apkg 文件
-        from helpers.file_utils import slugify
-        safe_deck_name = slugify(deck_name)
-        apkg_files = sorted(edited_dir.glob('*.apkg'), key=lambda p: p.stat().st_mtime, reverse=True)
-        if apkg_files:
-            file_path = str(apkg_files[0])
-        else:
-            file_path = str(edited_dir / f"{safe_deck_name}_edited.apkg")
-        
-        return {
-            'success': True,
-            'filePath': file_path,
-            'message': result,
-            'sessionId': session_dir.name
-        }
+        # 打包會等待快取鎖（同一份內容可能正由其他流程打包）並執行 genanki，不能在 event loop 上執行
+        # 打包期間持有 session，避免背景清理刪除正在使用的目錄
+        with session_in_use(session_id) as hold:
+            return await run_in_threadpool(_package_cards_sync, cards, deck_name, note_name, session_id, hold)
         
     except HTTPException:
         raise
@@ -6,11 +6,13 @@ import tempfile
 import traceback
 from pathlib import Path
 from typing import Dict, Any, Optional, List
+from fastapi import HTTPException
 import logging
 
 from libs.config import OUTPUTS_DIR, PASSAGE_IMAGE_DIR, SOURCE_LANG, TARGET_LANG, AI_MODEL
+from libs.session_index import get_session_index, record_artifact
 from helpers.session import get_or_create_session_dir, setup_session_directories
-from helpers.api_key import format_api_key_error
+from helpers.api_key import validate_and_get_api_key, format_api_key_error
 from helpers.file_utils import secure_filename
 
 logger = logging.getLogger(__name__)
@@ -30,6 +32,7 @@ def parse_request_data(data: Dict[str, Any]) -> dict:
     
     return {
         'images': data.get('images', []),
+        'passage_ids': data.get('passageIds', []),
         'vocab_list': vocab_list,
         'vocab_file_name': vocab_file_name,
         'settings': data.get('settings', {}),
@@ -43,9 +46,46 @@ def parse_request_data(data: Dict[str, Any]) -> dict:
     }
 
 
-def prepare_session_directories(session_id: Optional[str] = None) -> dict:
-    """準備會話目錄結構"""
-    session_dir = get_or_create_session_dir(session_id)
+def find_passage_texts(source_dir: Path, passage_ids: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    取得使用者選取的文章文字檔（/analyze/images 回傳的 passages[].id，即 source/{PDF 名稱}_passage.txt 的檔名）
+
+    只接受此會話 source 目錄中、已登錄於索引的文章文字檔，不會自動帶入其他 .txt（舊的擷取結果或單字列表）。
+
+    Returns:
+        List[str]: 文字檔路徑列表（依請求順序），沒有選取時回傳 None
+
+    Raises:
+        HTTPException: id 不是此會話擷取出的文章文字檔（400）
+    """
+    if not passage_ids:
+        return None
+    source_dir = Path(source_dir)
+    indexed = {
+        Path(t['path']).name
+        for t in get_session_index(source_dir.parent).list(dir=source_dir.name, suffixes=('.txt',))
+    }
+    paths = []
+    for passage_id in passage_ids:
+        name = passage_id if isinstance(passage_id, str) else ''
+        if Path(name).name != name or not name.endswith('_passage.txt') or name not in indexed:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    'success': False,
+                    'error': 'Invalid passage',
+                    'details': f'Unknown passage id: {passage_id!r}'
+                }
+            )
+        path = str(source_dir / name)
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def prepare_session_directories(session_id: Optional[str] = None, required: List[str] = ()) -> dict:
+    """準備會話目錄結構（required：需要的 source 等檔案，本機缺少時從儲存後端補齊）"""
+    session_dir = get_or_create_session_dir(session_id, required)
     dirs = setup_session_directories(session_dir)
     return {
         'session_dir': session_dir,
@@ -81,6 +121,7 @@ def process_vocab_list(vocab_list: str, source_dir: Path, vocab_file_name: Optio
                 vocab_filename = f"{vocab_filename}.txt"
             vocab_path = source_dir / vocab_filename
             vocab_path.write_text(vocab_list, encoding='utf-8')
+            record_artifact(vocab_path)
             logger.info(f"Saved vocab list text to source directory: {vocab_path}")
             return str(vocab_path)
         
@@ -96,12 +137,29 @@ def process_vocab_list(vocab_list: str, source_dir: Path, vocab_file_name: Optio
         vocab_filename = f"vocab_{Path(tempfile.mktemp()).stem}.txt"
         vocab_path = source_dir / vocab_filename
         vocab_path.write_text(vocab_list, encoding='utf-8')
+        record_artifact(vocab_path)
         logger.info(f"Saved vocab list text to source directory: {vocab_path}")
         return str(vocab_path)
     
     return None
 
 
+def required_source_files(images: List[Dict], passage_ids: List[str]) -> List[str]:
+    """
+    文章模式需要的 session 檔案（相對於 session 目錄）：選取的圖片與文章文字檔
+
+    其他副本分析過的 session，這些檔案可能還不在本機。
+    """
+    names = []
+    for img in images or []:
+        if img.get('selected', True):
+            name = Path(img.get('path') or img.get('src', '')).name
+            if name:
+                names.append(name)
+    names.extend(Path(p).name for p in passage_ids or [] if isinstance(p, str))
+    return [f"source/{name}" for name in names if name]
+
+
 def process_image_paths(images: List[Dict], session_dir: Path) -> Optional[List[str]]:
     """
     處理圖片路徑列表
@@ -168,6 +226,194 @@ def get_language_settings(settings: Dict[str, Any]) -> tuple:
     return source_lang, target_lang
 
 
+def require_api_key_or_400(settings: Dict[str, Any]) -> str:
+    """獲取 API Key，缺少時拋出 400 錯誤"""
+    api_key = validate_and_get_api_key(settings)
+    if not api_key:
+        error_msg = "OpenAI API Key is required. Please set it in Settings."
+        logger.error(error_msg)
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'success': False,
+                'error': 'API Key required',
+                'details': error_msg
+            }
+        )
+    return api_key
+
+
+def _require_vocab_list(vocab_list) -> None:
+    """驗證單字列表不可為空"""
+    if not vocab_list or (isinstance(vocab_list, str) and not vocab_list.strip()):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'success': False,
+                'error': 'Vocab list is required',
+                'details': 'Please provide a vocabulary list file or text content'
+            }
+        )
+
+
+def _save_vocab_list_or_400(vocab_list: str, source_dir: Path, vocab_file_name: Optional[str]) -> str:
+    """保存單字列表，失敗時拋出 400 錯誤"""
+    vocab_path = process_vocab_list(vocab_list, source_dir, vocab_file_name)
+    if not vocab_path:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'success': False,
+                'error': 'Invalid vocab list',
+                'details': 'Could not process vocabulary list'
+            }
+        )
+    return vocab_path
+
+
+def prepare_article_task(data: Dict[str, Any]) -> dict:
+    """
+    準備文章模式的生成任務
+
+    Returns:
+        dict: 包含 session_dir、orig_dir 以及 MainProcessor.run_article_mode 所需參數的 kwargs
+    """
+    req_data = parse_request_data(data)
+    vocab_list = req_data['vocab_list']
+    settings = req_data['settings']
+    deck_name = req_data['deck_name']
+    _require_vocab_list(vocab_list)
+
+    # 準備會話目錄
+    dirs = prepare_session_directories(
+        req_data['session_id'], required_source_files(req_data['images'], req_data['passage_ids'])
+    )
+    session_dir = dirs['session_dir']
+    orig_dir = dirs['orig']
+
+    vocab_path = _save_vocab_list_or_400(vocab_list, dirs['source'], req_data['vocab_file_name'])
+    selected_images = process_image_paths(req_data['images'], session_dir)
+    passage_text_paths = find_passage_texts(dirs['source'], req_data['passage_ids'])
+
+    # 確定卡片類型和語言設置
+    card_type = determine_card_type(req_data['note_name'])
+    source_lang, target_lang = get_language_settings(settings)
+    api_key = require_api_key_or_400(settings)
+    # 獲取模型設置（從前端設置或使用預設值）
+    model = settings.get('model') or AI_MODEL
+
+    logger.info(f"Starting article generation: deck={deck_name}, card_type={card_type}, vocab_path={vocab_path}, images={len(selected_images) if selected_images else 0}, passage_texts={len(passage_text_paths) if passage_text_paths else 0}, model={model}, orig_dir={orig_dir}")
+    return {
+        'session_dir': session_dir,
+        'orig_dir': orig_dir,
+        'kwargs': {
+            'pdf_path': '',  # Article 模式可能不需要 PDF，如果圖片已提取
+            'text_path': vocab_path,
+            'deck_name': deck_name,
+            'target': req_data['user_goal'],
+            'source_lang': source_lang,
+            'target_lang': target_lang,
+            'selected_images': selected_images,
+            'passage_text_paths': passage_text_paths,
+            'card_type': card_type,
+            'session_dir': str(orig_dir),
+            'api_key': api_key,
+            'model': model
+        }
+    }
+
+
+def prepare_vocab_task(data: Dict[str, Any]) -> dict:
+    """
+    準備單字模式的生成任務
+
+    Returns:
+        dict: 包含 session_dir、orig_dir 以及 MainProcessor.run_vocab_mode 所需參數的 kwargs
+    """
+    req_data = parse_request_data(data)
+    vocab_list = req_data['vocab_list']
+    settings = req_data['settings']
+    deck_name = req_data['deck_name']
+    _require_vocab_list(vocab_list)
+
+    # 準備會話目錄
+    dirs = prepare_session_directories(req_data['session_id'])
+    session_dir = dirs['session_dir']
+    orig_dir = dirs['orig']
+
+    vocab_path = _save_vocab_list_or_400(vocab_list, dirs['source'], req_data['vocab_file_name'])
+
+    # 確定卡片類型和語言設置
+    card_type = determine_card_type(req_data['note_name'])
+    source_lang, target_lang = get_language_settings(settings)
+    api_key = require_api_key_or_400(settings)
+    # 獲取模型設置（從前端設置或使用預設值）
+    model = settings.get('model') or AI_MODEL
+
+    logger.info(f"Starting vocab generation: deck={deck_name}, card_type={card_type}, vocab_path={vocab_path}, model={model}, orig_dir={orig_dir}")
+    return {
+        'session_dir': session_dir,
+        'orig_dir': orig_dir,
+        'kwargs': {
+            'text_path': vocab_path,
+            'target': req_data['user_goal'],
+            'deck_name': deck_name,
+            'source_lang': source_lang,
+            'target_lang': target_lang,
+            'card_type': card_type,
+            'session_dir': str(orig_dir),
+            'api_key': api_key,
+            'model': model
+        }
+    }
+
+
+def prepare_ai_task(data: Dict[str, Any]) -> dict:
+    """
+    準備 AI 生成模式的生成任務
+
+    Returns:
+        dict: 包含 session_dir、orig_dir 以及 MainProcessor.run_ai_generate_mode 所需參數的 kwargs
+    """
+    req_data = parse_request_data(data)
+    topic = req_data['topic']
+    settings = req_data['settings']
+    deck_name = req_data['deck_name']
+    user_goal = req_data['user_goal'] or topic
+
+    if not topic:
+        raise HTTPException(status_code=400, detail='Topic is required')
+
+    # 準備會話目錄
+    dirs = prepare_session_directories(req_data['session_id'])
+    session_dir = dirs['session_dir']
+    orig_dir = dirs['orig']
+
+    # 確定卡片類型和語言設置
+    card_type = determine_card_type(req_data['note_name'])
+    source_lang, target_lang = get_language_settings(settings)
+    api_key = require_api_key_or_400(settings)
+    # 獲取模型設置（從前端設置或使用預設值）
+    model = settings.get('model') or AI_MODEL
+
+    logger.info(f"Starting AI generation: deck={deck_name}, card_type={card_type}, topic={topic}, model={model}, orig_dir={orig_dir}")
+    return {
+        'session_dir': session_dir,
+        'orig_dir': orig_dir,
+        'kwargs': {
+            'target': user_goal,
+            'count': req_data['count'],
+            'deck_name': deck_name,
+            'source_lang': source_lang,
+            'target_lang': target_lang,
+            'card_type': card_type,
+            'session_dir': str(orig_dir),
+            'api_key': api_key,
+            'model': model
+        }
+    }
+
+
 def load_generated_cards(orig_dir: Path) -> List[Dict]:
     """
     從 orig_dir 中讀取生成的卡片 JSON 文件
@@ -178,11 +424,11 @@ def load_generated_cards(orig_dir: Path) -> List[Dict]:
     Returns:
         List[Dict]: 卡片列表
     """
-    json_files = sorted(orig_dir.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
-    if not json_files:
+    latest_json = get_session_index(orig_dir.parent).latest(orig_dir.name, ('.json',))
+    if latest_json is None:
         return []
     
-    with open(json_files[0], 'r', encoding='utf-8') as f:
+    with open(latest_json, 'r', encoding='utf-8') as f:
         cards_data = json.load(f)
         # 確保 cards_data 是列表
         if isinstance(cards_data, dict) and 'notes' in cards_data:
@@ -212,6 +458,16 @@ def load_generated_cards(orig_dir: Path) -> List[Dict]:
         return cards
 
 
+def format_busy_response(e: Exception) -> Dict[str, Any]:
+    """格式化執行池已滿的錯誤響應（429）"""
+    logger.warning(f"Pipeline pool is full: {e}")
+    return {
+        'success': False,
+        'error': 'Server busy',
+        'details': f'{e}. Please retry later.'
+    }
+
+
 def format_error_response(e: Exception, operation: str) -> Dict[str, Any]:
     """格式化錯誤響應"""
     error_msg = str(e)
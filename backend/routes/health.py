@@ -3,6 +3,9 @@
 """
 from fastapi import APIRouter
 
+from helpers.worker_pool import get_pipeline_pool
+from service.session_gc import get_session_gc
+
 router = APIRouter()
 
 
@@ -12,6 +15,8 @@ async def health():
     return {
         'status': 'ok',
         'message': 'Anki Generator API is running',
-        'backend': 'backend2 (Python/FastAPI)'
+        'backend': 'backend2 (Python/FastAPI)',
+        'pipeline': get_pipeline_pool().stats(),
+        'sessions': get_session_gc().stats()
     }
 
@@ -0,0 +1,120 @@
+"""
+背景生成任務 API 路由
+
+提交後立即回傳 jobId，流程在背景執行；前端以輪詢方式查詢進度並取回卡片。
+"""
+import traceback
+from pathlib import Path
+from typing import Dict, Any
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+import logging
+
+from service.job_manager import get_job_manager
+from helpers.session import session_in_use
+from helpers.worker_pool import PoolFullError
+from .generate import processor, RETRY_AFTER_SECONDS
+from .generate_helpers import (
+    prepare_article_task,
+    prepare_vocab_task,
+    prepare_ai_task,
+    load_generated_cards,
+    format_busy_response,
+    format_error_response
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+job_manager = get_job_manager()
+
+# 模式 -> (任務準備函數, 處理函數)
+JOB_MODES = {
+    'article': (prepare_article_task, processor.run_article_mode),
+    'vocab': (prepare_vocab_task, processor.run_vocab_mode),
+    'ai': (prepare_ai_task, processor.run_ai_generate_mode),
+}
+
+
+@router.post("/jobs/{mode}")
+async def submit_job(mode: str, data: Dict[str, Any]):
+    """提交背景生成任務（article / vocab / ai），立即回傳 jobId"""
+    if mode not in JOB_MODES:
+        raise HTTPException(status_code=404, detail=f'Unknown generation mode: {mode}')
+    try:
+        logger.info(f"Job submission ({mode}): {list(data.keys())}")
+        prepare_task, run = JOB_MODES[mode]
+        # 提交前持有 session（提交後由 JobManager 追蹤），避免背景清理刪除正在準備的目錄
+        with session_in_use(data.get('sessionId')) as hold:
+            # 準備 session 目錄時可能需要從儲存後端取回檔案，不在 event loop 上執行
+            task = await run_in_threadpool(prepare_task, data)
+            hold.add(task['session_dir'].name)
+            job = job_manager.submit(
+                mode,
+                run,
+                task['kwargs'],
+                session_id=task['session_dir'].name,
+                orig_dir=task['orig_dir']
+            )
+        return {
+            'success': True,
+            'jobId': job.job_id,
+            'status': job.status,
+            'sessionId': job.session_id
+        }
+    except HTTPException:
+        raise
+    except PoolFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=format_busy_response(e),
+            headers={'Retry-After': str(RETRY_AFTER_SECONDS)}
+        )
+    except Exception as e:
+        error_detail = format_error_response(e, 'Job submission')
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=error_detail)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """查詢任務狀態與各階段進度"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return {
+        'success': True,
+        **job.to_dict()
+    }
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """取得已完成任務的卡片"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+
+    if job.status == 'failed':
+        raise HTTPException(
+            status_code=500,
+            detail=format_error_response(RuntimeError(job.error), f'{job.mode} generation')
+        )
+    if job.status != 'succeeded':
+        raise HTTPException(
+            status_code=409,
+            detail={
+                'success': False,
+                'error': 'Job not finished',
+                'details': f'Job is {job.status}',
+                'status': job.status
+            }
+        )
+
+    cards = load_generated_cards(Path(job.orig_dir))
+    return {
+        'success': True,
+        'cards': cards,
+        'message': job.message,
+        'sessionId': job.session_id
+    }
@@ -1,19 +1,62 @@
 from datetime import datetime
+from functools import lru_cache
+import hashlib
 import json
 import os
 from pathlib import Path
 
-from libs.anki_logic import AnkiLogic
-from libs.config import VOICE_DIR
+from libs.anki_logic import AnkiLogic, apkg_path
+from libs.blob_cache import get_apkg_cache
+from libs.config import (
+    VOICE_DIR, ANKI_TEMPLATE_VERSION,
+    BASIC_FIELDS, BASIC_TEMPLATES, BASIC_CSS, CLOZE_FIELDS, CLOZE_TEMPLATES,
+)
 from libs.logger import LogLevel, get_logger
-from helpers.file_utils import safe_voice_filename
+from libs.session_index import record_artifact
+from libs.vocab_cache import make_cache_key, prompt_version
+from service.note_builder import NoteBuilder, existing_audio, normalize_card_type
 
 
 logger = get_logger()
 
+# 打包邏輯（例如 Cloze 轉換方式）改變時遞增，讓既有的 .apkg 快取失效
+PACKAGE_CACHE_VERSION = 3
+
+# 模板內容的雜湊（模板改了但忘記遞增 ANKI_TEMPLATE_VERSION 時快取也會失效）
+_TEMPLATE_DIGEST = prompt_version(json.dumps(
+    [BASIC_FIELDS, BASIC_TEMPLATES, BASIC_CSS, CLOZE_FIELDS, CLOZE_TEMPLATES], ensure_ascii=False, sort_keys=True
+))
+
+# 影響卡片內容的欄位
+_CARD_FIELDS = ("word", "pos", "meaning", "synonyms", "ex1_ori", "ex1_trans", "ex2_ori", "ex2_trans", "hint")
+
+
+@lru_cache(maxsize=4096)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    """檔案內容雜湊（以路徑、大小與修改時間作為記憶體快取的 key）"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
 
 class AnkiService:
     # ---------------- Import helpers ----------------
+    @staticmethod
+    def _build_and_pack(vocab_list: list[dict], deck_name: str, card_type: str, output_dir: str = None, voice_dir: str = None, filename_suffix: str = None) -> str:
+        """單次走訪建立 notes 並打包，回傳 .apkg 檔名"""
+        logic = AnkiLogic(deck_name)
+        builder = NoteBuilder(logic, card_type, voice_dir)
+        logger.log(LogLevel.INFO, f"建立 Anki {builder.card_type} model 與 notes...")
+        builder.add_to_deck(vocab_list)
+
+        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
+        logic.to_pack(output_dir=output_dir, filename_suffix=filename_suffix)
+        apkg_filename = os.path.basename(logic.pack_path(output_dir, filename_suffix))
+        logger.log(LogLevel.INFO, f"✅ 打包完成：{apkg_filename}")
+        return apkg_filename
+
     @staticmethod
     def import_basic_model_notes(vocab_list: list[dict], deck_name: str = "MyTestDeck", session_dir: str = None, voice_dir: str = None, filename_suffix: str = None) -> str:
         """
@@ -28,58 +71,9 @@ class AnkiService:
         Returns:
             str: 處理結果訊息
         """
-        logic = AnkiLogic(deck_name)
-
-        # 確定 audio 路徑
-        if voice_dir:
-            # 如果明確指定了 voice_dir，使用它
-            voice_dir = voice_dir
-        elif session_dir:
-            # 如果提供了 session_dir，先嘗試在 session_dir/voice 查找
-            session_voice_dir = os.path.join(session_dir, "voice")
-            if os.path.exists(session_voice_dir):
-                voice_dir = session_voice_dir
-            else:
-                # 如果 session_dir/voice 不存在，嘗試在上一層的 orig/voice 查找
-                parent_dir = os.path.dirname(session_dir)
-                orig_voice_dir = os.path.join(parent_dir, "orig", "voice")
-                if os.path.exists(orig_voice_dir):
-                    voice_dir = orig_voice_dir
-                else:
-                    voice_dir = VOICE_DIR
-        else:
-            voice_dir = VOICE_DIR
-
-        # 建立 model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki model 與 notes...")
-        model = logic.get_or_create_basic_model()
-
-        for v in vocab_list:
-            word = v.get("word", "")
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(voice_dir, audio_filename) if audio_filename else ""
-            note = logic.create_anki_note(
-                model=model,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=v.get("ex1_ori", ""),
-                ex1_trans=v.get("ex1_trans", ""),
-                ex2_ori=v.get("ex2_ori", ""),
-                ex2_trans=v.get("ex2_trans", ""),
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 notes")
-            
-        # 產生 .apkg 檔案
-        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
-        logic.to_pack(output_dir=session_dir)
-        logger.log(LogLevel.INFO, f"✅ 打包完成：{logic.deck_name}.apkg")
-        return f"打包完成，請在 Anki 中匯入 {logic.deck_name}.apkg"
+        voice_dir = AnkiService._resolve_voice_dir(session_dir, voice_dir)
+        apkg_filename = AnkiService._build_and_pack(vocab_list, deck_name, "Basic", session_dir, voice_dir, filename_suffix)
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}"
         
     @staticmethod
     def confirm_and_pack_basic_model(vocab_list: list[dict], deck_name: str = "MyTestDeck") -> str:
@@ -93,38 +87,8 @@ class AnkiService:
         Returns:
             str: 處理結果訊息
         """
-        logic = AnkiLogic(deck_name)
-
-        # 建立 model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki model 與 notes...")
-        model = logic.get_or_create_basic_model()
-
-        for v in vocab_list:
-            word = v.get("word", "")
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(VOICE_DIR, audio_filename) if audio_filename else ""
-            note = logic.create_anki_note(
-                model=model,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=v.get("ex1_ori", ""),
-                ex1_trans=v.get("ex1_trans", ""),
-                ex2_ori=v.get("ex2_ori", ""),
-                ex2_trans=v.get("ex2_trans", ""),
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 notes")
-            
-        # 產生 .apkg 檔案
-        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
-        logic.to_pack()
-        logger.log(LogLevel.INFO, f"✅ 打包完成：{logic.deck_name}.apkg")
-        return f"打包完成，請在 Anki 中匯入 {logic.deck_name}.apkg"
+        apkg_filename = AnkiService._build_and_pack(vocab_list, deck_name, "Basic", voice_dir=VOICE_DIR)
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}"
 
     @staticmethod
     def confirm_and_pack_cloze_model(vocab_list: list[dict], deck_name: str = "MyTestDeck") -> str:
@@ -138,62 +102,8 @@ class AnkiService:
         Returns:
             str: 處理結果訊息
         """
-        logic = AnkiLogic(deck_name)
-        
-        # 建立 Cloze model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki Cloze model 與 notes...")
-        model = logic.get_or_create_cloze_model()
-        
-        for v in vocab_list:
-            word = v.get("word", "")
-            ex1_ori = v.get("ex1_ori", "")
-            ex1_trans = v.get("ex1_trans", "")
-            ex2_ori = v.get("ex2_ori", "")
-            ex2_trans = v.get("ex2_trans", "")
-            
-            # 將兩個例句中的單字轉換為 Cloze 格式
-            import re
-            
-            # 處理第一個例句
-            cloze_ex1 = ex1_ori
-            if word and ex1_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex1 = pattern.sub(f"{{{{c1::{word}}}}}", ex1_ori, count=1)
-            
-            # 處理第二個例句
-            cloze_ex2 = ex2_ori
-            if word and ex2_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex2 = pattern.sub(f"{{{{c1::{word}}}}}", ex2_ori, count=1)
-            
-            # 將兩個例句和翻譯組合成一個 Text 欄位
-            cloze_text = f"{cloze_ex1}\n{ex1_trans}\n\n{cloze_ex2}\n{ex2_trans}" if cloze_ex2 else f"{cloze_ex1}\n{ex1_trans}"
-            
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(VOICE_DIR, audio_filename) if audio_filename else ""
-            note = logic.create_cloze_note(
-                model=model,
-                text=cloze_text,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=ex1_ori,
-                ex1_trans=ex1_trans,
-                ex2_ori=ex2_ori,
-                ex2_trans=ex2_trans,
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 Cloze notes")
-        
-        # 產生 .apkg 檔案
-        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
-        logic.to_pack()
-        logger.log(LogLevel.INFO, f"✅ 打包完成：{logic.deck_name}.apkg")
-        return f"打包完成，請在 Anki 中匯入 {logic.deck_name}.apkg"
+        apkg_filename = AnkiService._build_and_pack(vocab_list, deck_name, "Cloze", voice_dir=VOICE_DIR)
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}"
 
     @staticmethod
     def confirm_and_pack_basic_and_cloze(vocab_list: list[dict], deck_name: str = "MyTestDeck") -> str:
@@ -207,87 +117,8 @@ class AnkiService:
         Returns:
             str: 處理結果訊息
         """
-        logic = AnkiLogic(deck_name)
-        
-        # 建立 Basic model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki Basic model 與 notes...")
-        basic_model = logic.get_or_create_basic_model()
-        
-        for v in vocab_list:
-            word = v.get("word", "")
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(VOICE_DIR, audio_filename) if audio_filename else ""
-            note = logic.create_anki_note(
-                model=basic_model,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=v.get("ex1_ori", ""),
-                ex1_trans=v.get("ex1_trans", ""),
-                ex2_ori=v.get("ex2_ori", ""),
-                ex2_trans=v.get("ex2_trans", ""),
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 Basic notes")
-        
-        # 建立 Cloze model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki Cloze model 與 notes...")
-        cloze_model = logic.get_or_create_cloze_model()
-        
-        for v in vocab_list:
-            word = v.get("word", "")
-            ex1_ori = v.get("ex1_ori", "")
-            ex1_trans = v.get("ex1_trans", "")
-            ex2_ori = v.get("ex2_ori", "")
-            ex2_trans = v.get("ex2_trans", "")
-            
-            # 將兩個例句中的單字轉換為 Cloze 格式
-            import re
-            
-            # 處理第一個例句
-            cloze_ex1 = ex1_ori
-            if word and ex1_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex1 = pattern.sub(f"{{{{c1::{word}}}}}", ex1_ori, count=1)
-            
-            # 處理第二個例句
-            cloze_ex2 = ex2_ori
-            if word and ex2_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex2 = pattern.sub(f"{{{{c1::{word}}}}}", ex2_ori, count=1)
-            
-            # 將兩個例句和翻譯組合成一個 Text 欄位
-            cloze_text = f"{cloze_ex1}\n{ex1_trans}\n\n{cloze_ex2}\n{ex2_trans}" if cloze_ex2 else f"{cloze_ex1}\n{ex1_trans}"
-            logger.log(LogLevel.DEBUG, f"cloze_text: {cloze_text}")
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(VOICE_DIR, audio_filename) if audio_filename else ""
-            note = logic.create_cloze_note(
-                model=cloze_model,
-                text=cloze_text,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=ex1_ori,
-                ex1_trans=ex1_trans,
-                ex2_ori=ex2_ori,
-                ex2_trans=ex2_trans,
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 Cloze notes")
-        
-        # 產生 .apkg 檔案（包含兩種卡片）
-        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
-        logic.to_pack()
-        logger.log(LogLevel.INFO, f"✅ 打包完成：{logic.deck_name}.apkg")
-        return f"打包完成，請在 Anki 中匯入 {logic.deck_name}.apkg（包含 Basic 和 Cloze 卡片）"
+        apkg_filename = AnkiService._build_and_pack(vocab_list, deck_name, "Basic+Cloze", voice_dir=VOICE_DIR)
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}（包含 Basic 和 Cloze 卡片）"
 
     @staticmethod
     def import_cloze_model_notes(vocab_list: list[dict], deck_name: str = "MyTestDeck", session_dir: str = None, voice_dir: str = None, filename_suffix: str = None) -> str:
@@ -303,87 +134,14 @@ class AnkiService:
         Returns:
             str: 處理結果訊息
         """
-        logic = AnkiLogic(deck_name)
-        
-        # 確定 audio 路徑
-        if voice_dir:
-            # 如果明確指定了 voice_dir，使用它
-            voice_dir = voice_dir
-        elif session_dir:
-            # 如果提供了 session_dir，先嘗試在 session_dir/voice 查找
-            session_voice_dir = os.path.join(session_dir, "voice")
-            if os.path.exists(session_voice_dir):
-                voice_dir = session_voice_dir
-            else:
-                # 如果 session_dir/voice 不存在，嘗試在上一層的 orig/voice 查找
-                parent_dir = os.path.dirname(session_dir)
-                orig_voice_dir = os.path.join(parent_dir, "orig", "voice")
-                if os.path.exists(orig_voice_dir):
-                    voice_dir = orig_voice_dir
-                else:
-                    voice_dir = VOICE_DIR
-        else:
-            voice_dir = VOICE_DIR
-        
-        # 建立 Cloze model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki Cloze model 與 notes...")
-        model = logic.get_or_create_cloze_model()
-        
-        for v in vocab_list:
-            word = v.get("word", "")
-            ex1_ori = v.get("ex1_ori", "")
-            ex1_trans = v.get("ex1_trans", "")
-            ex2_ori = v.get("ex2_ori", "")
-            ex2_trans = v.get("ex2_trans", "")
-            
-            # 將兩個例句中的單字轉換為 Cloze 格式
-            import re
-            
-            # 處理第一個例句
-            cloze_ex1 = ex1_ori
-            if word and ex1_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex1 = pattern.sub(f"{{{{c1::{word}}}}}", ex1_ori, count=1)
-            
-            # 處理第二個例句
-            cloze_ex2 = ex2_ori
-            if word and ex2_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex2 = pattern.sub(f"{{{{c1::{word}}}}}", ex2_ori, count=1)
-            
-            # 將兩個例句和翻譯組合成一個 Text 欄位
-            cloze_text = f"{cloze_ex1}\n{ex1_trans}\n\n{cloze_ex2}\n{ex2_trans}" if cloze_ex2 else f"{cloze_ex1}\n{ex1_trans}"
-            
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(voice_dir, audio_filename) if audio_filename else ""
-            note = logic.create_cloze_note(
-                model=model,
-                text=cloze_text,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=ex1_ori,
-                ex1_trans=ex1_trans,
-                ex2_ori=ex2_ori,
-                ex2_trans=ex2_trans,
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 Cloze notes")
-        
-        # 產生 .apkg 檔案
-        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
-        logic.to_pack(output_dir=session_dir)
-        logger.log(LogLevel.INFO, f"✅ 打包完成：{logic.deck_name}.apkg")
-        return f"打包完成，請在 Anki 中匯入 {logic.deck_name}.apkg"
+        voice_dir = AnkiService._resolve_voice_dir(session_dir, voice_dir)
+        apkg_filename = AnkiService._build_and_pack(vocab_list, deck_name, "Cloze", session_dir, voice_dir, filename_suffix)
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}"
     
     @staticmethod
     def import_basic_and_cloze_notes(vocab_list: list[dict], deck_name: str = "MyTestDeck", session_dir: str = None, voice_dir: str = None, filename_suffix: str = None) -> str:
         """
-        同時匯入 Basic 和 Cloze 模型的 notes 到同一個 Anki deck
+        同時匯入 Basic 和 Cloze 模型的 notes 到同一個 Anki deck（單次走訪單字列表）
         
         Args:
             vocab_list: 單字列表，每個元素為包含單字資訊的字典
@@ -394,115 +152,110 @@ class AnkiService:
         Returns:
             str: 處理結果訊息
         """
-        logic = AnkiLogic(deck_name)
-        
-        # 確定 audio 路徑
+        voice_dir = AnkiService._resolve_voice_dir(session_dir, voice_dir)
+        apkg_filename = AnkiService._build_and_pack(vocab_list, deck_name, "Basic+Cloze", session_dir, voice_dir, filename_suffix)
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}（包含 Basic 和 Cloze 卡片）"
+    
+    @staticmethod
+    def pack_vocab(vocab_list: list[dict], deck_name: str = "MyTestDeck", card_type: str = "Basic", session_dir: str = None, voice_dir: str = None, filename_suffix: str = None) -> tuple[str, str]:
+        """
+        依卡片類型打包 .apkg；卡片內容、卡片類型、deck 名稱、語音檔與模板都相同，
+        且目的路徑仍是上次打包的結果時直接沿用
+
+        Args:
+            card_type: 卡片類型 ("Basic", "Cloze", "Basic+Cloze")
+
+        Returns:
+            tuple[str, str]: (處理結果訊息, .apkg 路徑)
+        """
+        importers = {
+            "Basic": AnkiService.import_basic_model_notes,
+            "Cloze": AnkiService.import_cloze_model_notes,
+            "Basic+Cloze": AnkiService.import_basic_and_cloze_notes,
+        }
+        card_type = normalize_card_type(card_type)
+        importer = importers[card_type]
+
+        voice_dir = AnkiService._resolve_voice_dir(session_dir, voice_dir)
+        output_path = apkg_path(deck_name, session_dir, filename_suffix)
+        cache = get_apkg_cache()
+        if cache is None:
+            msg = importer(vocab_list, deck_name, session_dir=session_dir, voice_dir=voice_dir, filename_suffix=filename_suffix)
+            return msg, output_path
+
+        key = AnkiService._package_cache_key(vocab_list, deck_name, card_type, voice_dir)
+        # 同一份內容同時只打包一次（連點兩次時，第二個請求等待後直接命中快取）
+        with cache.key_lock(key):
+            # 只有目的路徑的 .apkg 就是這份快取時才沿用：中間若打包過其他內容（例如編輯後又改回），
+            # 舊的 .apkg 修改時間比 Anki 中已匯入的版本舊，重新匯入會被略過，必須以新的修改時間重新打包
+            if cache.matches(key, output_path):
+                record_artifact(output_path)
+                apkg_filename = os.path.basename(output_path)
+                logger.log(LogLevel.INFO, f"✅ 沿用已打包的 {apkg_filename}")
+                return f"打包完成，請在 Anki 中匯入 {apkg_filename}", output_path
+
+            msg = importer(vocab_list, deck_name, session_dir=session_dir, voice_dir=voice_dir, filename_suffix=filename_suffix)
+            cache.put(key, output_path)
+        return msg, output_path
+
+    @staticmethod
+    def _package_cache_key(vocab_list: list[dict], deck_name: str, card_type: str, voice_dir: str) -> str:
+        """打包快取 key：卡片欄位、卡片類型、deck 名稱、語音檔內容雜湊與模板版本"""
+        cards = [[str(v.get(field, "") or "") for field in _CARD_FIELDS] for v in vocab_list]
+        media = []
+        for v in vocab_list:
+            audio_path = existing_audio(voice_dir, v.get("word", ""))
+            if audio_path:
+                st = os.stat(audio_path)
+                media.append([os.path.basename(audio_path), _file_digest(audio_path, st.st_size, st.st_mtime_ns)])
+        return make_cache_key(
+            "apkg", PACKAGE_CACHE_VERSION, ANKI_TEMPLATE_VERSION, _TEMPLATE_DIGEST,
+            deck_name, card_type, cards, media
+        )
+
+    @staticmethod
+    def _resolve_voice_dir(session_dir: str = None, voice_dir: str = None) -> str:
+        """語音檔目錄：voice_dir > session_dir/voice > 上一層的 orig/voice > VOICE_DIR"""
         if voice_dir:
-            # 如果明確指定了 voice_dir，使用它
-            voice_dir = voice_dir
-        elif session_dir:
-            # 如果提供了 session_dir，先嘗試在 session_dir/voice 查找
+            return voice_dir
+        if session_dir:
             session_voice_dir = os.path.join(session_dir, "voice")
             if os.path.exists(session_voice_dir):
-                voice_dir = session_voice_dir
-            else:
-                # 如果 session_dir/voice 不存在，嘗試在上一層的 orig/voice 查找
-                parent_dir = os.path.dirname(session_dir)
-                orig_voice_dir = os.path.join(parent_dir, "orig", "voice")
-                if os.path.exists(orig_voice_dir):
-                    voice_dir = orig_voice_dir
-                else:
-                    voice_dir = VOICE_DIR
-        else:
-            voice_dir = VOICE_DIR
-        
-        # 建立 Basic model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki Basic model 與 notes...")
-        basic_model = logic.get_or_create_basic_model()
-        
-        for v in vocab_list:
-            word = v.get("word", "")
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(voice_dir, audio_filename) if audio_filename else ""
-            note = logic.create_anki_note(
-                model=basic_model,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=v.get("ex1_ori", ""),
-                ex1_trans=v.get("ex1_trans", ""),
-                ex2_ori=v.get("ex2_ori", ""),
-                ex2_trans=v.get("ex2_trans", ""),
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 Basic notes")
-        
-        # 建立 Cloze model 並產生 notes
-        logger.log(LogLevel.INFO, "建立 Anki Cloze model 與 notes...")
-        cloze_model = logic.get_or_create_cloze_model()
-        
-        for v in vocab_list:
-            word = v.get("word", "")
-            ex1_ori = v.get("ex1_ori", "")
-            ex1_trans = v.get("ex1_trans", "")
-            ex2_ori = v.get("ex2_ori", "")
-            ex2_trans = v.get("ex2_trans", "")
-            
-            # 將兩個例句中的單字轉換為 Cloze 格式
-            import re
-            
-            # 處理第一個例句
-            cloze_ex1 = ex1_ori
-            if word and ex1_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex1 = pattern.sub(f"{{{{c1::{word}}}}}", ex1_ori, count=1)
-            
-            # 處理第二個例句
-            cloze_ex2 = ex2_ori
-            if word and ex2_ori:
-                pattern = re.compile(re.escape(word), re.IGNORECASE)
-                cloze_ex2 = pattern.sub(f"{{{{c1::{word}}}}}", ex2_ori, count=1)
-            
-            # 將兩個例句和翻譯組合成一個 Text 欄位
-            cloze_text = f"{cloze_ex1}\n{ex1_trans}\n\n{cloze_ex2}\n{ex2_trans}" if cloze_ex2 else f"{cloze_ex1}\n{ex1_trans}"
-            logger.log(LogLevel.DEBUG, f"cloze_text: {cloze_text}")
-            # 使用 safe_voice_filename 確保文件名與生成時一致
-            audio_filename = f'{safe_voice_filename(word)}.mp3' if word else ""
-            audio_path = os.path.join(voice_dir, audio_filename) if audio_filename else ""
-            note = logic.create_cloze_note(
-                model=cloze_model,
-                text=cloze_text,
-                word=word,
-                pos=v.get("pos", ""),
-                meaning=v.get("meaning", ""),
-                synonyms=v.get("synonyms", ""),
-                ex1_ori=ex1_ori,
-                ex1_trans=ex1_trans,
-                ex2_ori=ex2_ori,
-                ex2_trans=ex2_trans,
-                audio=audio_path,
-                hint=v.get("hint", ""),
-            )
-            logic.create_anki_card(note)
-        logger.log(LogLevel.INFO, f"✅ 已建立 {len(vocab_list)} 個 Cloze notes")
-        
-        # 產生 .apkg 檔案（包含兩種卡片）
-        from helpers.file_utils import slugify
-        logger.log(LogLevel.INFO, "打包 .apkg 檔案...")
-        logic.to_pack(output_dir=session_dir, filename_suffix=filename_suffix)
-        safe_deck_name = slugify(logic.deck_name)
-        if filename_suffix:
-            safe_suffix = slugify(filename_suffix)
-            apkg_filename = f'{safe_deck_name}_{safe_suffix}.apkg'
-        else:
-            apkg_filename = f'{safe_deck_name}.apkg'
-        logger.log(LogLevel.INFO, f"✅ 打包完成：{apkg_filename}")
-        return f"打包完成，請在 Anki 中匯入 {apkg_filename}（包含 Basic 和 Cloze 卡片）"
-    
+                return session_voice_dir
+            orig_voice_dir = os.path.join(os.path.dirname(session_dir), "orig", "voice")
+            if os.path.exists(orig_voice_dir):
+                return orig_voice_dir
+        return VOICE_DIR
+
+    @staticmethod
+    def stream_vocab_chunks(vocab_chunks, deck_name: str = "MyTestDeck", card_type: str = "Basic", session_dir: str = None, voice_dir: str = None, filename_suffix: str = None, progress=None) -> str:
+        """
+        分批將單字寫入 .apkg（每批建立 notes 後立即寫入，不保留整份單字表）
+
+        Args:
+            vocab_chunks: 產生單字列表的可迭代物件（例如 Parser.iter_excel_chunks）
+            card_type: 卡片類型 ("Basic", "Cloze", "Basic+Cloze")
+            progress: 進度回調函數，接收 (stage, done, total)；total 未知時為 0
+
+        Returns:
+            str: 處理結果訊息
+        """
+        logic = AnkiLogic(deck_name)
+        builder = NoteBuilder(logic, card_type, AnkiService._resolve_voice_dir(session_dir, voice_dir))
+
+        word_count = 0
+        with logic.open_stream(output_dir=session_dir, filename_suffix=filename_suffix) as writer:
+            for chunk in vocab_chunks:
+                builder.write_to(writer, chunk)
+                word_count += len(chunk)
+                logger.log(LogLevel.INFO, f"已寫入 {word_count} 個單字")
+                if progress:
+                    progress("packaging", word_count, 0)
+
+        apkg_filename = os.path.basename(writer.output_path)
+        logger.log(LogLevel.INFO, f"✅ 打包完成：{apkg_filename}（{word_count} 個單字，{writer.note_count} 個 notes）")
+        return f"打包完成，請在 Anki 中匯入 {apkg_filename}（共 {word_count} 個單字）"
+
     def read_vocab_json(self, json_path: str):
         """讀取單字 JSON 檔案"""
         logic = AnkiLogic()
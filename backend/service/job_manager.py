@@ -0,0 +1,166 @@
+# /service/job_manager.py
+import threading
+import time
+from concurrent.futures import Future
+
+from nanoid import generate
+
+from helpers.worker_pool import PipelinePool, get_pipeline_pool
+from libs.config import JOB_RESULT_TTL
+from libs.logger import LogLevel, get_logger
+
+logger = get_logger()
+
+# 流程階段（依執行順序）
+JOB_STAGES = ["parse", "gpt", "tts", "packaging"]
+
+
+class Job:
+    """
+    背景生成任務
+
+    status: queued -> running -> succeeded / failed
+    progress: 每個階段的 {done, total}
+    """
+
+    def __init__(self, mode: str, session_id: str, orig_dir: str):
+        self.job_id = generate()
+        self.mode = mode
+        self.session_id = session_id
+        self.orig_dir = orig_dir
+        self.status = "queued"
+        self.stage = None
+        self.progress = {stage: {"done": 0, "total": 0} for stage in JOB_STAGES}
+        self.message = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._future: Future | None = None  # 行程池模式：由 future 狀態得知是否已派送到子行程
+
+    def update_progress(self, stage: str, done: int, total: int):
+        """進度回調：由 MainProcessor 在各階段呼叫"""
+        with self._lock:
+            self.stage = stage
+            self.progress[stage] = {"done": done, "total": total}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def _refresh_status_locked(self):
+        # 子行程無法回呼本行程，future 進入 running（已派送給子行程）時才標記為執行中
+        if self.status == "queued" and self._future is not None and self._future.running():
+            self.status = "running"
+            self.started_at = time.time()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            self._refresh_status_locked()
+            return {
+                'jobId': self.job_id,
+                'mode': self.mode,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': {stage: dict(value) for stage, value in self.progress.items()},
+                'message': self.message,
+                'error': self.error,
+                'sessionId': self.session_id,
+                'createdAt': self.created_at,
+                'startedAt': self.started_at,
+                'finishedAt': self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    管理背景生成任務（記憶體內保存，完成後保留 JOB_RESULT_TTL 秒）
+    """
+
+    def __init__(self, pool: PipelinePool = None, result_ttl: int = JOB_RESULT_TTL):
+        self.pool = pool or get_pipeline_pool()
+        self.result_ttl = result_ttl
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, mode: str, fn, kwargs: dict, session_id: str, orig_dir: str) -> Job:
+        """
+        提交生成任務，立即回傳 Job
+
+        Raises:
+            PoolFullError: 執行池已滿
+        """
+        self._prune()
+        job = Job(mode, session_id, str(orig_dir))
+
+        if self.pool.executor_type == "process":
+            # 子行程無法回呼本行程的 Job，只追蹤派送與完成狀態（沒有各階段進度）
+            future = self.pool.submit(fn, **kwargs)
+            with job._lock:
+                job._future = future
+                job._refresh_status_locked()
+        else:
+            future = self.pool.submit(self._execute, job, fn, kwargs)
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+        future.add_done_callback(lambda f: self._finish(job, f))
+        logger.log(LogLevel.INFO, f"已提交任務 {job.job_id}（{mode}，session={session_id}）")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_session_ids(self) -> set[str]:
+        """取得仍在排隊或執行中的任務所屬 session"""
+        with self._lock:
+            return {job.session_id for job in self._jobs.values() if not job.finished}
+
+    def _execute(self, job: Job, fn, kwargs: dict):
+        with job._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        return fn(progress=job.update_progress, **kwargs)
+
+    def _finish(self, job: Job, future: Future):
+        with job._lock:
+            job._future = None
+            job.finished_at = time.time()
+            if job.started_at is None and not future.cancelled():
+                # 行程池模式中兩次查詢之間就已完成的任務
+                job.started_at = job.finished_at
+            if future.cancelled():
+                job.status = "failed"
+                job.error = "Job was cancelled"
+            elif future.exception() is not None:
+                job.status = "failed"
+                job.error = str(future.exception())
+            else:
+                job.status = "succeeded"
+                job.message = future.result()
+        if job.status == "failed":
+            logger.log(LogLevel.ERROR, f"任務 {job.job_id} 失敗：{job.error}")
+        else:
+            logger.log(LogLevel.SUCCESS, f"任務 {job.job_id} 完成")
+
+    def _prune(self):
+        """移除已完成且超過保留時間的任務"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and job.finished_at and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+# 全域任務管理器實例
+_job_manager = JobManager()
+
+
+def get_job_manager() -> JobManager:
+    """取得全域任務管理器"""
+    return _job_manager
@@ -7,7 +7,7 @@ from libs.logger import LogLevel, get_logger
 logger = get_logger()
 
 class MainProcessor:
-    def run_article_mode(self, pdf_path: str, text_path: str, deck_name: str, target: str, source_lang: str = 'English', target_lang: str = 'Chinese', selected_images: list[str] = None, card_type: str = 'Basic', session_dir: str = None, api_key: str = None, model: str = None) -> str:
+    def run_article_mode(self, pdf_path: str, text_path: str, deck_name: str, target: str, source_lang: str = 'English', target_lang: str = 'Chinese', selected_images: list[str] = None, card_type: str = 'Basic', session_dir: str = None, api_key: str = None, model: str = None, progress=None, passage_text_paths: list[str] = None) -> str:
         """
         執行文章模式
         
@@ -19,6 +19,8 @@ class MainProcessor:
             source_lang: 來源語言
             target_lang: 目標語言
             selected_images: 選擇的圖片路徑列表（如果為 None，則使用所有圖片）
+            progress: 進度回調函數，接收 (stage, done, total)
+            passage_text_paths: 文字層 PDF 擷取出的文章文字檔列表
         """
         logger.log(LogLevel.INFO, "開始解析文章與單字...")
         # 如果 PDF 已在 UI 中解析過，selected_images 會包含選擇的圖片
@@ -33,22 +35,24 @@ class MainProcessor:
             deck_name=deck_name,
             session_dir=session_dir,
             api_key=api_key,
-            model=model
+            model=model,
+            progress=progress,
+            passage_text_paths=passage_text_paths
         )
         logger.log(LogLevel.INFO, f"解析完成，共 {len(transed_vocab_list)} 個單字")
         
         logger.log(LogLevel.INFO, "開始生成語音檔...")
         gpt = GPTClient(session_dir=session_dir, api_key=api_key, model=model)
         word_list = [word["word"] for word in transed_vocab_list]
-        gpt.gen_vocabs_voice(word_list)
+        gpt.gen_vocabs_voice(word_list, progress=progress, language=source_lang)
         logger.log(LogLevel.INFO, f"語音檔生成完成，共 {len(word_list)} 個檔案")
         
         logger.log(LogLevel.INFO, "開始匯入 Anki...")
-        msg = self._import_to_anki(transed_vocab_list, deck_name, card_type, session_dir=session_dir)
+        msg = self._import_to_anki(transed_vocab_list, deck_name, card_type, session_dir=session_dir, progress=progress)
         logger.log(LogLevel.INFO, "Anki 匯入完成")
         return f"文章模式完成 ✅｜{msg}"
 
-    def run_vocab_mode(self, text_path: str, target: str, deck_name: str, source_lang: str = 'English', target_lang: str = 'Chinese', card_type: str = 'Basic', session_dir: str = None, api_key: str = None, model: str = None) -> str:
+    def run_vocab_mode(self, text_path: str, target: str, deck_name: str, source_lang: str = 'English', target_lang: str = 'Chinese', card_type: str = 'Basic', session_dir: str = None, api_key: str = None, model: str = None, progress=None) -> str:
         logger.log(LogLevel.INFO, "開始解析單字列表...")
         vocab_list = ParserService.parse_vocab_txt(
             text_path,
@@ -58,24 +62,47 @@ class MainProcessor:
             deck_name=deck_name,
             session_dir=session_dir,
             api_key=api_key,
-            model=model
+            model=model,
+            progress=progress
         )
         logger.log(LogLevel.INFO, f"解析完成，共 {len(vocab_list)} 個單字")
 
         logger.log(LogLevel.INFO, "開始生成語音檔...")
         gpt = GPTClient(session_dir=session_dir, api_key=api_key, model=model)
         word_list = [word["word"] for word in vocab_list]
-        gpt.gen_vocabs_voice(word_list)
+        gpt.gen_vocabs_voice(word_list, progress=progress, language=source_lang)
         logger.log(LogLevel.INFO, f"語音檔生成完成，共 {len(word_list)} 個檔案")
 
         logger.log(LogLevel.INFO, "開始匯入 Anki...")
-        msg = self._import_to_anki(vocab_list, deck_name, card_type, session_dir=session_dir)
+        msg = self._import_to_anki(vocab_list, deck_name, card_type, session_dir=session_dir, progress=progress)
         logger.log(LogLevel.INFO, "Anki 匯入完成")
         return f"單純單字模式完成 ✅｜{msg}"
 
-    def run_excel_mode(self, excel_path: str) -> str:
-        vocab_list = ParserService.parse_excel(excel_path)
-        msg = AnkiService.import_passage(vocab_list)
+    def run_excel_mode(self, excel_path: str, deck_name: str = None, card_type: str = 'Basic', session_dir: str = None, progress=None) -> str:
+        """
+        執行 Excel 模式
+
+        詞彙表分批讀取，每批轉成 notes 後立即寫入 .apkg，
+        大型試算表的記憶體用量只與單批大小有關。
+
+        Args:
+            excel_path: Excel / CSV 檔案路徑
+            deck_name: Deck 名稱（未指定時使用檔案名稱）
+            progress: 進度回調函數，接收 (stage, done, total)
+        """
+        from pathlib import Path
+
+        deck_name = deck_name or Path(excel_path).stem
+        logger.log(LogLevel.INFO, "開始分批匯入 Excel...")
+        msg = AnkiService.stream_vocab_chunks(
+            ParserService.iter_excel(excel_path),
+            deck_name,
+            card_type,
+            session_dir=session_dir,
+            filename_suffix='orig',
+            progress=progress
+        )
+        logger.log(LogLevel.INFO, "Anki 匯入完成")
         return f"Excel 模式完成 ✅｜{msg}"
 
     def run_word_mode(self, word_path: str) -> str:
@@ -83,7 +110,7 @@ class MainProcessor:
         msg = AnkiService.import_passage(vocab_list)
         return f"Word 模式完成 ✅｜{msg}"
 
-    def run_ai_generate_mode(self, target: str, count: int, deck_name: str, source_lang: str = 'English', target_lang: str = 'Chinese', card_type: str = 'Basic', session_dir: str = None, api_key: str = None, model: str = None) -> str:
+    def run_ai_generate_mode(self, target: str, count: int, deck_name: str, source_lang: str = 'English', target_lang: str = 'Chinese', card_type: str = 'Basic', session_dir: str = None, api_key: str = None, model: str = None, progress=None) -> str:
         """
         執行 AI 生成模式
         
@@ -93,6 +120,7 @@ class MainProcessor:
             deck_name: Deck 名稱
             source_lang: 來源語言
             target_lang: 目標語言
+            progress: 進度回調函數，接收 (stage, done, total)
             
         Returns:
             str: 執行結果訊息
@@ -107,21 +135,21 @@ class MainProcessor:
             logger.log(LogLevel.WARNING, f"無法解析數量參數，使用預設值：{count_int}")
         
         logger.log(LogLevel.INFO, "開始使用 AI 生成單字列表...")
-        vocab_list = ParserService.generate_vocab_ai(target, count_int, source_lang=source_lang, target_lang=target_lang, session_dir=session_dir, api_key=api_key, model=model)
+        vocab_list = ParserService.generate_vocab_ai(target, count_int, source_lang=source_lang, target_lang=target_lang, session_dir=session_dir, api_key=api_key, model=model, progress=progress)
         logger.log(LogLevel.INFO, f"生成完成，共 {len(vocab_list)} 個單字")
         
         logger.log(LogLevel.INFO, "開始生成語音檔...")
         gpt = GPTClient(session_dir=session_dir, api_key=api_key, model=model)
         word_list = [word["word"] for word in vocab_list]
-        gpt.gen_vocabs_voice(word_list)
+        gpt.gen_vocabs_voice(word_list, progress=progress, language=source_lang)
         logger.log(LogLevel.INFO, f"語音檔生成完成，共 {len(word_list)} 個檔案")
         
         logger.log(LogLevel.INFO, "開始匯入 Anki...")
-        msg = self._import_to_anki(vocab_list, deck_name, card_type, session_dir=session_dir)
+        msg = self._import_to_anki(vocab_list, deck_name, card_type, session_dir=session_dir, progress=progress)
         logger.log(LogLevel.INFO, "Anki 匯入完成")
         return f"AI 生成模式完成 ✅｜{msg}"
 
-    def _import_to_anki(self, vocab_list: list[dict], deck_name: str, card_type: str, session_dir: str = None) -> str:
+    def _import_to_anki(self, vocab_list: list[dict], deck_name: str, card_type: str, session_dir: str = None, progress=None) -> str:
         """
         根據卡片類型匯入到 Anki
         
@@ -129,18 +157,20 @@ class MainProcessor:
             vocab_list: 單字列表
             deck_name: Deck 名稱
             card_type: 卡片類型 ("Basic", "Cloze", "Basic+Cloze")
+            progress: 進度回調函數，接收 (stage, done, total)
             
         Returns:
             str: 處理結果訊息
         """
+        if progress:
+            progress("packaging", 0, 1)
+        msg = self._pack_by_card_type(vocab_list, deck_name, card_type, session_dir=session_dir)
+        if progress:
+            progress("packaging", 1, 1)
+        return msg
+
+    def _pack_by_card_type(self, vocab_list: list[dict], deck_name: str, card_type: str, session_dir: str = None) -> str:
+        """依卡片類型打包（內容相同時沿用已打包的 .apkg）"""
         # 使用 "orig" 作為檔案名稱後綴，表示原始生成的版本
-        if card_type == "Basic":
-            return AnkiService.import_basic_model_notes(vocab_list, deck_name, session_dir=session_dir, filename_suffix='orig')
-        elif card_type == "Cloze":
-            return AnkiService.import_cloze_model_notes(vocab_list, deck_name, session_dir=session_dir, filename_suffix='orig')
-        elif card_type == "Basic+Cloze":
-            return AnkiService.import_basic_and_cloze_notes(vocab_list, deck_name, session_dir=session_dir, filename_suffix='orig')
-        else:
-            # 預設使用 Basic
-            logger.log(LogLevel.WARNING, f"未知的卡片類型：{card_type}，使用 Basic 模式")
-            return AnkiService.import_basic_model_notes(vocab_list, deck_name, session_dir=session_dir, filename_suffix='orig')
\ No newline at end of file
+        msg, _ = AnkiService.pack_vocab(vocab_list, deck_name, card_type, session_dir=session_dir, filename_suffix='orig')
+        return msg
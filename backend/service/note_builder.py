@@ -0,0 +1,167 @@
+# /service/note_builder.py
+"""
+Anki note 建構器
+
+單次走訪單字列表，每個單字只解析一次語音檔，再交給各卡片類型的 emitter 產生 note。
+Basic+Cloze 只是同時掛上兩個 emitter，不必重複走訪整份列表。
+輸出時依 emitter 順序加入 deck（例如先全部 Basic 再全部 Cloze），與逐類型打包的順序相同。
+"""
+import os
+from abc import ABC, abstractmethod
+
+from libs.anki_logic import AnkiLogic, ApkgStreamWriter
+from libs.cloze import cloze_text
+from libs.logger import LogLevel, get_logger
+from helpers.file_utils import safe_voice_filename
+
+logger = get_logger()
+
+
+class NoteEmitter(ABC):
+    """卡片類型 emitter：建立 model，並將一個單字轉成一個 note"""
+
+    label = ""
+
+    def __init__(self, logic: AnkiLogic):
+        self.logic = logic
+        self.model = self.create_model()
+
+    @abstractmethod
+    def create_model(self):
+        """建立（或取得）此卡片類型的 genanki model"""
+
+    @abstractmethod
+    def emit(self, v: dict, audio: str):
+        """將單字資料 v 轉成 note（audio 為語音檔路徑，沒有語音時為空字串）"""
+
+
+class BasicEmitter(NoteEmitter):
+    label = "Basic"
+
+    def create_model(self):
+        return self.logic.get_or_create_basic_model()
+
+    def emit(self, v: dict, audio: str):
+        return self.logic.create_anki_note(
+            model=self.model,
+            word=v.get("word", ""),
+            pos=v.get("pos", ""),
+            meaning=v.get("meaning", ""),
+            synonyms=v.get("synonyms", ""),
+            ex1_ori=v.get("ex1_ori", ""),
+            ex1_trans=v.get("ex1_trans", ""),
+            ex2_ori=v.get("ex2_ori", ""),
+            ex2_trans=v.get("ex2_trans", ""),
+            audio=audio,
+            hint=v.get("hint", ""),
+            register_media=False,
+        )
+
+
+class ClozeEmitter(NoteEmitter):
+    label = "Cloze"
+
+    def create_model(self):
+        return self.logic.get_or_create_cloze_model()
+
+    def emit(self, v: dict, audio: str):
+        word = v.get("word", "")
+        ex1_ori, ex1_trans = v.get("ex1_ori", ""), v.get("ex1_trans", "")
+        ex2_ori, ex2_trans = v.get("ex2_ori", ""), v.get("ex2_trans", "")
+        return self.logic.create_cloze_note(
+            model=self.model,
+            text=cloze_text(word, ex1_ori, ex1_trans, ex2_ori, ex2_trans),
+            word=word,
+            pos=v.get("pos", ""),
+            meaning=v.get("meaning", ""),
+            synonyms=v.get("synonyms", ""),
+            ex1_ori=ex1_ori,
+            ex1_trans=ex1_trans,
+            ex2_ori=ex2_ori,
+            ex2_trans=ex2_trans,
+            audio=audio,
+            hint=v.get("hint", ""),
+            register_media=False,
+        )
+
+
+# 卡片類型 -> emitter（依序輸出）
+CARD_TYPE_EMITTERS = {
+    "Basic": (BasicEmitter,),
+    "Cloze": (ClozeEmitter,),
+    "Basic+Cloze": (BasicEmitter, ClozeEmitter),
+}
+
+
+def normalize_card_type(card_type: str) -> str:
+    """未知的卡片類型視為 Basic"""
+    if card_type not in CARD_TYPE_EMITTERS:
+        logger.log(LogLevel.WARNING, f"未知的卡片類型：{card_type}，使用 Basic 模式")
+        return "Basic"
+    return card_type
+
+
+def existing_audio(voice_dir: str, word: str) -> str:
+    """單字的語音檔路徑；檔案不存在時回傳空字串（不產生沒有檔案的 [sound:] 欄位）"""
+    if not word or not voice_dir:
+        return ""
+    audio_path = os.path.join(voice_dir, f'{safe_voice_filename(word)}.mp3')
+    return audio_path if os.path.exists(audio_path) else ""
+
+
+class NoteBuilder:
+    """
+    依卡片類型建立 notes
+
+    Args:
+        logic: 目標 deck
+        card_type: 卡片類型 ("Basic", "Cloze", "Basic+Cloze")
+        voice_dir: 語音檔目錄
+    """
+
+    def __init__(self, logic: AnkiLogic, card_type: str, voice_dir: str):
+        self.logic = logic
+        self.card_type = normalize_card_type(card_type)
+        self.voice_dir = voice_dir
+        self.emitters = [cls(logic) for cls in CARD_TYPE_EMITTERS[self.card_type]]
+        self._audio: dict[str, str] = {}
+
+    def audio_for(self, word: str) -> str:
+        """每個單字只解析一次語音檔（重複的單字直接沿用）"""
+        if word not in self._audio:
+            audio = existing_audio(self.voice_dir, word)
+            self._audio[word] = audio
+            if audio:
+                self.logic.media_files.append(os.path.abspath(audio))
+        return self._audio[word]
+
+    def build(self, vocab_list: list[dict]) -> list[list]:
+        """單次走訪單字列表，回傳各 emitter 的 notes（與 self.emitters 順序相同）"""
+        batches = [[] for _ in self.emitters]
+        for v in vocab_list:
+            audio = self.audio_for(v.get("word", ""))
+            for emitter, notes in zip(self.emitters, batches):
+                notes.append(emitter.emit(v, audio))
+        return batches
+
+    def add_to_deck(self, vocab_list: list[dict]) -> int:
+        """建立 notes 並依 emitter 順序加入 deck，回傳 note 數量"""
+        count = 0
+        for emitter, notes in zip(self.emitters, self.build(vocab_list)):
+            for note in notes:
+                self.logic.deck.add_note(note)
+            count += len(notes)
+            logger.log(LogLevel.INFO, f"✅ 已建立 {len(notes)} 個 {emitter.label} notes")
+        return count
+
+    def write_to(self, writer: ApkgStreamWriter, vocab_list: list[dict]) -> int:
+        """建立一批 notes 直接寫入串流打包（每個 emitter 使用各自的 stream，維持類型順序）"""
+        count = 0
+        for stream, notes in enumerate(self.build(vocab_list)):
+            writer.write_notes(notes, stream=stream)
+            count += len(notes)
+        writer.add_media(self.logic.media_files)
+        self.logic.media_files = []
+        # 串流打包時不保留整份單字的語音對照（writer 已依檔名去重）
+        self._audio.clear()
+        return count
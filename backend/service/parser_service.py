@@ -1,7 +1,7 @@
 # /service/parser_service.py
 from libs.parser import Parser
 from libs.gpt import GPTClient
-from libs.config import PROMPT_EN_PASSAGE_VOCAB_QUESTIONS, PROMPT_EN_VOCAB, PROMPT_AI_GENERATE, GOAL_PROMPT, PASSAGE_IMAGE_DIR
+from libs.config import PROMPT_EN_PASSAGE_VOCAB_QUESTIONS, PROMPT_EN_VOCAB, PROMPT_AI_GENERATE, GOAL_PROMPT, PASSAGE_IMAGE_DIR, EXCEL_CHUNK_ROWS
 from libs.logger import LogLevel, get_logger
 from service.anki_service import AnkiService
 import os
@@ -10,7 +10,7 @@ logger = get_logger()
 
 class ParserService:
     @staticmethod
-    def parse_passage(pdf_path: str, vocab_path: str, target: str, source_lang: str = 'English', target_lang: str = 'Chinese', selected_images: list[str] = None, deck_name: str | None = None, session_dir: str = None, api_key: str = None, model: str = None):
+    def parse_passage(pdf_path: str, vocab_path: str, target: str, source_lang: str = 'English', target_lang: str = 'Chinese', selected_images: list[str] = None, deck_name: str | None = None, session_dir: str = None, api_key: str = None, model: str = None, progress=None, passage_text_paths: list[str] = None):
         """
         解析文章模式
         
@@ -21,17 +21,29 @@ class ParserService:
             source_lang: 來源語言
             target_lang: 目標語言
             selected_images: 選擇的圖片路徑列表（如果為 None，則需要 pdf_path 並解析 PDF 使用所有圖片）
+            progress: 進度回調函數，接收 (stage, done, total)
+            passage_text_paths: 文字層 PDF 擷取出的文章文字檔（有提供時直接以文字送 GPT）
         """
         parser = Parser(api_key=api_key, session_dir=session_dir)
+
+        passage_text = None
+        if passage_text_paths:
+            texts = []
+            for path in passage_text_paths:
+                with open(path, encoding="utf-8") as f:
+                    texts.append(f.read().strip())
+            passage_text = "\n\n".join(text for text in texts if text) or None
         
-        # 如果沒有提供選擇的圖片，則需要解析 PDF
-        if selected_images is None:
+        # 如果沒有提供選擇的圖片或文章文字，則需要解析 PDF
+        if selected_images is None and passage_text is None:
             if not pdf_path:
                 raise ValueError("❌ 請提供 PDF 檔案路徑或選擇的圖片列表")
-            # 1) 解析 PDF 圖片 → 存到 outputs/passage_images/
+            # 1) 解析 PDF：文字層直接取文字，否則抽取圖片 → 存到 outputs/passage_images/
             logger.log(LogLevel.INFO, "解析 PDF 檔案...")
-            parser.parse_pdf(pdf_path)
+            passage_text = parser.parse_pdf(pdf_path)
             logger.log(LogLevel.INFO, "✅ PDF 解析完成")
+        elif selected_images is None:
+            logger.log(LogLevel.INFO, f"使用 PDF 文字層（{len(passage_text)} 字），略過圖片")
         else:
             # 如果已提供選擇的圖片，使用該路徑的資料夾（用於後續處理，但實際上會直接使用 image_paths）
             parser.passage_image_path = os.path.dirname(selected_images[0]) if selected_images else PASSAGE_IMAGE_DIR
@@ -39,6 +51,8 @@ class ParserService:
         logger.log(LogLevel.INFO, "解析單字列表...")
         parse_vocab_list = parser.parse_vocab_txt(vocab_path)
         logger.log(LogLevel.INFO, f"✅ 單字列表解析完成，共 {len(parse_vocab_list)} 個單字")
+        if progress:
+            progress("parse", 1, 1)
 
         # 所有單字都詢問 GPT（不過濾，因為需要考慮詞性差異）
         logger.log(LogLevel.INFO, f"呼叫 GPT 進行視覺理解與翻譯（共 {len(parse_vocab_list)} 個單字，包含可能重複的單字）...")
@@ -57,11 +71,16 @@ class ParserService:
         logger.log(LogLevel.DEBUG, f"selected_images: {selected_images}")
         logger.log(LogLevel.DEBUG, f"prompt: {prompt}")
         # 如果提供了選擇的圖片列表，使用它；否則使用所有圖片
+        if progress:
+            progress("gpt", 0, 1)
         transed_vocab_list = gpt.passage_with_question(
-            passage_image_folder=parser.passage_image_path if not selected_images else None,
+            passage_image_folder=parser.passage_image_path if not selected_images and not passage_text else None,
             question=prompt,
-            image_paths=selected_images
+            image_paths=selected_images,
+            passage_text=passage_text
         )
+        if progress:
+            progress("gpt", 1, 1)
         logger.log(LogLevel.INFO, f"✅ GPT 處理完成，共 {len(transed_vocab_list)} 個單字")
 
         try:
@@ -84,11 +103,13 @@ class ParserService:
         return transed_vocab_list
 
     @staticmethod
-    def parse_vocab_txt(vocab_path: str, target: str, source_lang: str = 'English', target_lang: str = 'Chinese', deck_name: str | None = None, session_dir: str = None, api_key: str = None, model: str = None):
+    def parse_vocab_txt(vocab_path: str, target: str, source_lang: str = 'English', target_lang: str = 'Chinese', deck_name: str | None = None, session_dir: str = None, api_key: str = None, model: str = None, progress=None):
         logger.log(LogLevel.INFO, "解析單字列表...")
         parser = Parser(api_key=api_key, session_dir=session_dir)
         vocab_list = parser.parse_vocab_txt(vocab_path)
         logger.log(LogLevel.INFO, f"✅ 單字列表解析完成，共 {len(vocab_list)} 個單字")
+        if progress:
+            progress("parse", 1, 1)
 
         # 所有單字都詢問 GPT（不過濾，因為需要考慮詞性差異）
         logger.log(LogLevel.INFO, f"呼叫 GPT 進行翻譯與擴充（共 {len(vocab_list)} 個單字，包含可能重複的單字）...")
@@ -98,17 +119,14 @@ class ParserService:
         if target:
             goal_prompt_section = GOAL_PROMPT.format(target=target)
 
-        prompt = PROMPT_EN_VOCAB.format(
-            goal_prompt_section=goal_prompt_section,
-            source_language=source_lang,
-            target_language=target_lang,
-            vocab_list="\n".join(vocab_list)  # 使用所有單字，不過濾
-        )
-        
-        logger.log(LogLevel.DEBUG, f"prompt: {prompt}")
+        # prompt 模板由 GPTClient 依批次填入單字
         transed_vocab_list = gpt.vocab_from_words(
             vocab_list,  # 使用所有單字，不過濾
-            prompt=prompt
+            prompt=PROMPT_EN_VOCAB,
+            goal_prompt_section=goal_prompt_section,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            progress=progress
         )
         logger.log(LogLevel.INFO, f"✅ GPT 處理完成，共 {len(transed_vocab_list)} 個單字")
 
@@ -143,7 +161,12 @@ class ParserService:
         return parser.parse_excel(excel_path)
     
     @staticmethod
-    def generate_vocab_ai(target: str, count: int, source_lang: str = 'English', target_lang: str = 'Chinese', session_dir: str = None, api_key: str = None, model: str = None):
+    def iter_excel(excel_path: str, chunk_rows: int = EXCEL_CHUNK_ROWS):
+        """分批解析 Excel / CSV，每次產生一批單字列表"""
+        return Parser().iter_excel_chunks(excel_path, chunk_rows)
+
+    @staticmethod
+    def generate_vocab_ai(target: str, count: int, source_lang: str = 'English', target_lang: str = 'Chinese', session_dir: str = None, api_key: str = None, model: str = None, progress=None):
         """
         使用 AI 生成單字列表
         
@@ -152,6 +175,7 @@ class ParserService:
             count: 要生成的單字數量
             source_lang: 來源語言
             target_lang: 目標語言
+            progress: 進度回調函數，接收 (stage, done, total)
             
         Returns:
             List[Dict]: 生成的單字列表
@@ -171,7 +195,11 @@ class ParserService:
         
         # 呼叫 GPT 生成單字列表
         gpt = GPTClient(session_dir=session_dir, api_key=api_key, model=model)
+        if progress:
+            progress("gpt", 0, 1)
         vocab_list = gpt.generate_vocab_list(prompt=prompt)
+        if progress:
+            progress("gpt", 1, 1)
         logger.log(LogLevel.INFO, f"✅ AI 生成完成，共 {len(vocab_list)} 個單字")
         
         
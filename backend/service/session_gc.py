@@ -0,0 +1,306 @@
+# /service/session_gc.py
+"""
+Session 目錄背景清理
+
+在背景執行緒中定期掃描 outputs/ 下的 session 目錄：
+- 最後存取時間超過 SESSION_TTL 的 session 直接刪除
+- 所有 session 總大小超過 OUTPUTS_MAX_BYTES 時，依最後存取時間由舊到新淘汰（LRU）
+- 仍有排隊或執行中任務、或請求處理中的 session 不會被刪除
+- 每輪最多刪除 SESSION_GC_BATCH 個，其餘留到下一輪
+
+最後存取時間取 session 目錄與索引檔的修改時間（請求使用 session 時會 touch 目錄），
+大小優先由 session 索引加總，沒有索引時才走訪目錄（結果依最後存取時間快取）。
+DELETE /files/cleanup/{session_id} 也交由這個執行緒延遲刪除，不再每次呼叫都開一個執行緒。
+"""
+import os
+import shutil
+import threading
+import time
+from typing import Callable
+
+from libs.config import (
+    OUTPUTS_DIR, SESSION_GC_ENABLED, SESSION_TTL, OUTPUTS_MAX_BYTES,
+    SESSION_GC_INTERVAL, SESSION_GC_MIN_AGE, SESSION_GC_BATCH,
+)
+from libs.logger import LogLevel, get_logger
+from libs.session_index import INDEX_FILENAME, ROLES, forget_session_index, indexed_bytes
+from libs.storage import get_artifact_store, session_key
+from helpers.session import in_use_session_ids
+from service.job_manager import get_job_manager
+
+logger = get_logger()
+
+
+def _dir_bytes(path: str) -> int:
+    """走訪目錄加總檔案大小（不跟隨符號連結）"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except FileNotFoundError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return total
+
+
+def _last_access(session_dir: str, dir_mtime: float) -> float:
+    """session 目錄與索引檔（寫入產出時會更新）中最新的修改時間"""
+    latest = dir_mtime
+    for suffix in ("", "-wal"):
+        try:
+            latest = max(latest, os.stat(os.path.join(session_dir, INDEX_FILENAME + suffix)).st_mtime)
+        except FileNotFoundError:
+            pass
+    return latest
+
+
+class SessionGC:
+    """
+    session 目錄清理器
+
+    Args:
+        root: session 目錄的上層資料夾
+        ttl: 最後存取後保留的秒數（0 表示不依時間清理）
+        max_bytes: 所有 session 的總大小上限（0 表示不限制）
+        interval: 兩次清理之間的秒數
+        min_age: 配額淘汰時不刪除最近這麼多秒內存取過的 session
+        batch: 每輪最多刪除的 session 數量
+        enabled: 是否依 ttl / max_bytes 清理（停用時仍會處理 schedule_delete 的刪除）
+        active_sessions: 回傳仍在使用中的 session ID（預設為背景任務與處理中請求的 session）
+    """
+
+    def __init__(self, root: str = str(OUTPUTS_DIR), ttl: int = SESSION_TTL, max_bytes: int = OUTPUTS_MAX_BYTES,
+                 interval: int = SESSION_GC_INTERVAL, min_age: int = SESSION_GC_MIN_AGE,
+                 batch: int = SESSION_GC_BATCH, enabled: bool = SESSION_GC_ENABLED,
+                 active_sessions: Callable[[], set[str]] = None):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.interval = max(1, interval)
+        self.min_age = min_age
+        self.batch = max(1, batch)
+        self.enabled = enabled
+        self.active_sessions = active_sessions or (lambda: get_job_manager().active_session_ids() | in_use_session_ids())
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pending: dict[str, float] = {}  # session_id -> 預定刪除時間
+        self._size_cache: dict[str, tuple[float, int]] = {}  # session_id -> (最後存取時間, 位元組)
+        self._stats = {
+            'sessions': 0,
+            'bytes': 0,
+            'reclaimedBytes': 0,
+            'evictedSessions': 0,
+            'evicted': {'ttl': 0, 'quota': 0, 'requested': 0},
+            'lastSweepAt': None,
+            'lastSweepSeconds': None,
+        }
+
+    # ---- 執行緒 ----
+
+    def start(self):
+        """啟動背景清理執行緒（重複呼叫不會重複啟動）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="session-gc", daemon=True)
+            self._thread.start()
+        logger.log(LogLevel.INFO, f"Session 清理已啟動（TTL {self.ttl} 秒，上限 {self.max_bytes} 位元組，每 {self.interval} 秒）")
+
+    def stop(self, timeout: float = 5):
+        """停止背景清理執行緒"""
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.log(LogLevel.ERROR, f"Session 清理失敗：{e}")
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+
+    def _next_wait(self) -> float:
+        with self._lock:
+            if not self._pending:
+                return self.interval
+            return max(0.0, min(self.interval, min(self._pending.values()) - time.time()))
+
+    def schedule_delete(self, session_id: str, delay: float = 0):
+        """排定在 delay 秒後刪除 session（由清理執行緒執行）"""
+        with self._lock:
+            self._pending[session_id] = time.time() + delay
+        self.start()
+        self._wake.set()
+
+    # ---- 清理 ----
+
+    def _scan(self) -> list[dict]:
+        """列出所有 session：{id, path, last_access, bytes}"""
+        sessions = []
+        seen = set()
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return sessions
+        for entry in entries:
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                # 只處理 session 目錄（outputs/ 下的 voice、apkg 等預設資料夾不算）
+                if not any(os.path.isdir(os.path.join(entry.path, role)) for role in ROLES):
+                    continue
+                last_access = _last_access(entry.path, entry.stat(follow_symlinks=False).st_mtime)
+            except FileNotFoundError:
+                continue
+            seen.add(entry.name)
+            sessions.append({
+                'id': entry.name,
+                'path': entry.path,
+                'last_access': last_access,
+                'bytes': self._session_bytes(entry.name, entry.path, last_access),
+            })
+        for session_id in set(self._size_cache) - seen:
+            del self._size_cache[session_id]
+        return sessions
+
+    def _session_bytes(self, session_id: str, path: str, last_access: float) -> int:
+        size = indexed_bytes(path)
+        if size is not None:
+            return size
+        cached = self._size_cache.get(session_id)
+        if cached is not None and cached[0] == last_access:
+            return cached[1]
+        size = _dir_bytes(path)
+        self._size_cache[session_id] = (last_access, size)
+        return size
+
+    def _delete(self, session: dict, reason: str) -> bool:
+        forget_session_index(session['path'])
+        shutil.rmtree(session['path'], ignore_errors=True)
+        if os.path.exists(session['path']):
+            logger.log(LogLevel.WARNING, f"無法刪除 session：{session['id']}")
+            return False
+        self._size_cache.pop(session['id'], None)
+        with self._lock:
+            self._stats['reclaimedBytes'] += session['bytes']
+            self._stats['evictedSessions'] += 1
+            self._stats['evicted'][reason] += 1
+        logger.log(LogLevel.INFO, f"已清理 session {session['id']}（{reason}，{session['bytes']} 位元組）")
+        return True
+
+    def _delete_remote(self, session_id: str):
+        store = get_artifact_store()
+        if not store.is_remote:
+            return
+        try:
+            count = store.delete_prefix(session_key(session_id))
+        except Exception as e:
+            logger.log(LogLevel.WARNING, f"無法刪除儲存後端中的 session {session_id}：{e}")
+            return
+        if count:
+            logger.log(LogLevel.INFO, f"已刪除儲存後端中的 session {session_id}（{count} 個檔案）")
+
+    def sweep(self) -> dict:
+        """
+        清理一輪：先處理排定的刪除，再依 TTL 與總大小上限淘汰
+
+        Returns:
+            dict: 本輪刪除的 {session 數量, 位元組}
+        """
+        start = time.perf_counter()
+        now = time.time()
+        active = self.active_sessions()
+        by_id = {s['id']: s for s in self._scan()}
+        deleted: dict[str, dict] = {}
+        evicted = 0  # 本輪依 TTL / 配額刪除的數量
+
+        def evict(session: dict, reason: str) -> bool:
+            nonlocal evicted
+            if evicted >= self.batch or not self._delete(session, reason):
+                return False
+            deleted[session['id']] = session
+            evicted += 1
+            return True
+
+        # 排定的刪除（仍有任務執行中時延後）
+        with self._lock:
+            due = [sid for sid, at in self._pending.items() if at <= now and sid not in active]
+            for sid in due:
+                del self._pending[sid]
+            pending = set(self._pending)
+        # 明確要求的刪除不受每輪數量上限限制，並一併刪除儲存後端中的檔案
+        # （依 TTL / 配額淘汰只清理本機副本，物件儲存的保留期限交給 bucket 的 lifecycle 規則）
+        for sid in due:
+            if sid in by_id and self._delete(by_id[sid], 'requested'):
+                deleted[sid] = by_id[sid]
+            self._delete_remote(sid)
+
+        candidates = sorted(
+            (s for s in by_id.values() if s['id'] not in active and s['id'] not in pending and s['id'] not in deleted),
+            key=lambda s: s['last_access']
+        )
+        if self.enabled and self.ttl:
+            for session in candidates:
+                if now - session['last_access'] > self.ttl:
+                    evict(session, 'ttl')
+
+        total = sum(s['bytes'] for sid, s in by_id.items() if sid not in deleted)
+        if self.enabled and self.max_bytes:
+            for session in candidates:
+                if total <= self.max_bytes or evicted >= self.batch:
+                    break
+                if session['id'] in deleted or now - session['last_access'] < self.min_age:
+                    continue
+                if evict(session, 'quota'):
+                    total -= session['bytes']
+
+        reclaimed = sum(s['bytes'] for s in deleted.values())
+        with self._lock:
+            self._stats.update({
+                'sessions': len(by_id) - len(deleted),
+                'bytes': total,
+                'lastSweepAt': now,
+                'lastSweepSeconds': round(time.perf_counter() - start, 3),
+            })
+        if deleted:
+            logger.log(LogLevel.INFO, f"Session 清理：刪除 {len(deleted)} 個，釋放 {reclaimed} 位元組，剩餘 {len(by_id) - len(deleted)} 個")
+        return {'sessions': len(deleted), 'bytes': reclaimed}
+
+    def stats(self) -> dict:
+        """清理狀態：目前 session 數量與大小、累計釋放的空間與刪除數量"""
+        with self._lock:
+            return {
+                **self._stats,
+                'evicted': dict(self._stats['evicted']),
+                'pending': len(self._pending),
+                'running': self._thread is not None and self._thread.is_alive(),
+            }
+
+
+_session_gc = None
+_session_gc_lock = threading.Lock()
+
+
+def get_session_gc() -> SessionGC:
+    """取得全域 session 清理器"""
+    global _session_gc
+    with _session_gc_lock:
+        if _session_gc is None:
+            _session_gc = SessionGC()
+        return _session_gc
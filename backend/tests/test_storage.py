@@ -0,0 +1,144 @@
+"""
+S3ArtifactStore 與 session 同步測試（以 moto 模擬 S3）
+
+用法（在 backend/ 目錄下）：
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import libs.storage as storage  # noqa: E402
+from libs.session_index import forget_session_index, get_session_index  # noqa: E402
+
+BUCKET = "anki-test"
+
+
+@pytest.fixture
+def s3_store(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        import boto3
+
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield storage.S3ArtifactStore(bucket=BUCKET, prefix="sessions/", region="us-east-1")
+
+
+@pytest.fixture
+def outputs_dir(tmp_path, monkeypatch, s3_store):
+    """以 tmp_path 作為 OUTPUTS_DIR，並使用 moto 的 S3 作為全域儲存後端"""
+    import helpers.session
+    import libs.session_index
+
+    for module in (storage, helpers.session, libs.session_index):
+        monkeypatch.setattr(module, "OUTPUTS_DIR", tmp_path)
+    monkeypatch.setattr(storage, "_artifact_store", s3_store)
+    yield tmp_path
+    for session_dir in tmp_path.iterdir():
+        forget_session_index(session_dir)
+
+
+def test_put_stream_multipart_and_ranges(s3_store):
+    # 超過 boto3 預設的 8 MB 分段門檻，走 multipart 上傳
+    data = os.urandom(9 * 1024 * 1024 + 123)
+    s3_store.put_stream("s1/orig/big.bin", (data[i:i + 300_000] for i in range(0, len(data), 300_000)))
+
+    assert s3_store.size("s1/orig/big.bin") == len(data)
+    assert b"".join(s3_store.iter_range("s1/orig/big.bin")) == data
+    assert b"".join(s3_store.iter_range("s1/orig/big.bin", 100, 199)) == data[100:200]
+    assert b"".join(s3_store.iter_range("s1/orig/big.bin", len(data) - 5)) == data[-5:]
+
+
+def test_missing_object(s3_store):
+    assert s3_store.size("s1/none") is None
+    with pytest.raises(storage.ArtifactNotFoundError):
+        list(s3_store.iter_range("s1/none"))
+
+
+def test_list_get_and_delete_prefix(s3_store, tmp_path):
+    s3_store.put_stream("s1/orig/a.json", [b"[]"])
+    s3_store.put_stream("s1/orig/voice/a.mp3", [b"abc", b"def"])
+    s3_store.put_stream("s2/orig/b.json", [b"{}"])
+
+    assert [(key, size) for key, size, _ in s3_store.list("s1/")] == [("s1/orig/a.json", 2), ("s1/orig/voice/a.mp3", 6)]
+    assert all(etag for _, _, etag in s3_store.list("s1/"))
+
+    dest = tmp_path / "a.mp3"
+    s3_store.get_file("s1/orig/voice/a.mp3", str(dest))
+    assert dest.read_bytes() == b"abcdef"
+    assert not list(tmp_path.glob("*.part"))
+
+    assert s3_store.delete_prefix("s1/") == 2
+    assert s3_store.list("s1/") == []
+    assert [key for key, _, _ in s3_store.list("s2/")] == ["s2/orig/b.json"]
+
+
+def test_record_artifact_publishes(outputs_dir, s3_store):
+    from libs.session_index import record_artifact
+
+    path = outputs_dir / "s1" / "orig" / "cards.json"
+    path.parent.mkdir(parents=True)
+    path.write_text("[]")
+    record_artifact(path)
+
+    [(key, size, etag)] = s3_store.list("s1/")
+    assert (key, size) == ("s1/orig/cards.json", 2)
+    # 索引記錄上傳後的物件版本
+    assert get_session_index(outputs_dir / "s1").etags() == {"orig/cards.json": etag}
+
+
+def test_sync_fills_partial_local_copy(outputs_dir, s3_store):
+    from helpers.session import find_session_dir
+
+    # 本機已有部分檔案（也已有索引），其他副本之後發布了新的語音檔
+    local = outputs_dir / "s1" / "orig" / "cards.json"
+    local.parent.mkdir(parents=True)
+    local.write_text("[]")
+    get_session_index(outputs_dir / "s1").rebuild()
+    s3_store.put_stream("s1/orig/cards.json", [b"[]"])
+    s3_store.put_stream("s1/orig/voice/hi.mp3", [b"0123456789"])
+
+    # 本機副本完整時不列出儲存後端
+    assert find_session_dir("s1") == outputs_dir / "s1"
+    assert not (outputs_dir / "s1" / "orig" / "voice").exists()
+
+    # 請求需要的檔案本機沒有時才同步
+    session_dir = find_session_dir("s1", required=["orig/voice/hi.mp3"])
+
+    assert session_dir == outputs_dir / "s1"
+    assert (session_dir / "orig" / "voice" / "hi.mp3").read_bytes() == b"0123456789"
+    indexed = [f["path"] for f in get_session_index(session_dir).list()]
+    assert indexed == ["orig/cards.json", "orig/voice/hi.mp3"]
+
+
+def test_sync_replaces_same_size_rewrite(outputs_dir, s3_store):
+    from helpers.session import find_session_dir
+    from libs.session_index import record_artifact
+
+    # 本機發布過 cards.json，之後其他副本以相同大小的內容改寫
+    local = outputs_dir / "s1" / "orig" / "cards.json"
+    local.parent.mkdir(parents=True)
+    local.write_text("[1]")
+    record_artifact(local)
+    s3_store.put_stream("s1/orig/cards.json", [b"[2]"])
+    s3_store.put_stream("s1/orig/voice/hi.mp3", [b"mp3"])
+
+    find_session_dir("s1", required=["orig/voice/hi.mp3"])
+
+    assert local.read_text() == "[2]"
+    [(_, _, etag)] = [item for item in s3_store.list("s1/") if item[0] == "s1/orig/cards.json"]
+    assert get_session_index(outputs_dir / "s1").etags()["orig/cards.json"] == etag
+
+
+def test_find_session_dir_missing_everywhere(outputs_dir):
+    from helpers.session import find_session_dir
+
+    assert find_session_dir("nope") is None
+    assert not Path(outputs_dir / "nope").exists()
@@ -1,6 +1,3 @@
-from gtts import gTTS
-
-import requests
 from pathlib import Path
 from libs.logger import LogLevel, get_logger
 from helpers.file_utils import slugify
@@ -8,6 +5,8 @@ from helpers.file_utils import slugify
 logger = get_logger()
 
 def gen_voice_for_free_tts(text: str, output_path: str = "./outputs/", lang: str = "en"):
+    from gtts import gTTS
+
     Path(output_path).mkdir(parents=True, exist_ok=True)
     tts = gTTS(text, lang=lang)
     safe_filename = slugify(text)
@@ -21,6 +20,8 @@ class DictionaryAPI:
         self.url = "https://api.dictionaryapi.dev/api/v2/entries/{lang}/{word}"
             
 def fetch_pronunciation_audio(word: str, lang: str = "en") -> str | None:
+    import requests
+
     url = f"https://api.dictionaryapi.dev/api/v2/entries/{lang}/{word}"
     r = requests.get(url, timeout=15)
     r.raise_for_status()
@@ -30,6 +31,8 @@ def fetch_pronunciation_audio(word: str, lang: str = "en") -> str | None:
     return audios[0] if audios else None
 
 def download_audio(audio_url: str, save_as: str = "voice.mp3") -> Path:
+    import requests
+
     r = requests.get(audio_url, timeout=30)
     r.raise_for_status()
     out = Path(save_as)
@@ -57,6 +57,8 @@ export default function App() {
   
   // Image Selection State
   const [extractedImages, setExtractedImages] = useState<ImageData[]>([]);
+  // 文字層 PDF 擷取出的文章 id（後端直接擷取文字，不需選擇圖片；生成時以 passageIds 傳回）
+  const [textPassageIds, setTextPassageIds] = useState<string[]>([]);
   
   const [aiTopic, setAiTopic] = useState<string>('');
   const [generatedJson, setGeneratedJson] = useState<string>('');
@@ -103,6 +105,7 @@ export default function App() {
     setAiTopic('');
     setGeneratedJson('');
     setExtractedImages([]);
+    setTextPassageIds([]);
     setUserGoal('');
     setEditViewMode('json');
     setJsonError(null);
@@ -206,6 +209,7 @@ export default function App() {
         
         try {
             const allImages: ImageData[] = [];
+            const textPassages: string[] = [];
             let currentSessionId = sessionId; // 使用現有的 sessionId 或 null
             
             for (const file of articleFiles) {
@@ -239,6 +243,11 @@ export default function App() {
                     setSessionId(data.sessionId);
                 }
                 
+                if (data.success && data.passages?.length) {
+                    textPassages.push(...data.passages.map((p: any) => p.id));
+                    addLog(`Extracted text layer from ${file.name}`, 'success');
+                }
+                
                 if (data.success && data.images) {
                     const convertedImages = data.images.map((img: any, idx: number) => ({
                         id: allImages.length + idx + 1,
@@ -253,7 +262,8 @@ export default function App() {
                 }
             }
             
-            if (allImages.length === 0) {
+            setTextPassageIds(textPassages);
+            if (allImages.length === 0 && textPassages.length === 0) {
                 addLog('Warning: No images extracted from files', 'warning');
             } else {
                 setExtractedImages(allImages);
@@ -331,6 +341,7 @@ export default function App() {
         }
         
         requestBody.images = extractedImages.filter(i => i.selected);
+        requestBody.passageIds = textPassageIds;
         requestBody.vocabList = vocabFile ? {
           content: vocabContent,
           filename: vocabFile.name
@@ -855,7 +866,7 @@ export default function App() {
                             </button>
                             <button 
                                 onClick={startGeneration}
-                                disabled={extractedImages.filter(i => i.selected).length === 0}
+                                disabled={extractedImages.filter(i => i.selected).length === 0 && textPassageIds.length === 0}
                                 className="flex-1 bg-blue-600 hover:bg-blue-500 disabled:opacity-50 disabled:cursor-not-allowed text-white font-bold py-3 rounded-xl shadow-lg shadow-blue-500/20 active:scale-[0.99] transition-all flex items-center justify-center gap-2"
                             >
                                 <Bot size={20} />